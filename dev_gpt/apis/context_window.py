@@ -0,0 +1,110 @@
+import os
+import re
+import threading
+from typing import List
+
+from langchain.schema import BaseMessage, SystemMessage
+
+from dev_gpt.apis.tokens import count_message_tokens, count_tokens
+from dev_gpt.constants import MODEL_CONTEXT_WINDOWS, CONTEXT_WINDOW_USAGE_FRACTION, MAX_CODE_BLOCK_TOKENS_IN_HISTORY
+
+CODE_BLOCK_PATTERN = re.compile(r'(```[^\n]*\n)([\s\S]*?)(\n```)')
+
+
+class ContextWindowExceededException(Exception):
+    pass
+
+
+def shorten_text(text: str, max_tokens: int, model: str) -> str:
+    """Keeps the first and the last lines of the text and omits the middle part so that it fits into max_tokens."""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    lines = text.split('\n')
+    head, tail = [], []
+    tokens_used = 0
+    while lines:
+        # alternate between the start and the end since both are relevant for code (imports) and logs (errors)
+        take_from_start = len(head) <= len(tail)
+        line_tokens = count_tokens(lines[0] if take_from_start else lines[-1], model) + 1
+        if tokens_used + line_tokens > max_tokens:
+            break
+        tokens_used += line_tokens
+        if take_from_start:
+            head.append(lines.pop(0))
+        else:
+            tail.insert(0, lines.pop())
+    if not lines:
+        return text
+    return '\n'.join(head + [f'... ({len(lines)} lines omitted) ...'] + tail)
+
+
+def shorten_code_blocks(text: str, max_tokens_per_block: int, model: str) -> str:
+    return CODE_BLOCK_PATTERN.sub(
+        lambda match: match.group(1) + shorten_text(match.group(2), max_tokens_per_block, model) + match.group(3),
+        text
+    )
+
+
+class ContextWindowManager:
+    """
+    Keeps the prompt of a conversation below a fraction of the context window of the model.
+    The remaining part of the window is left for the completion.
+    If the prompt is too large, the following steps are applied until it fits:
+    1. oversized code blocks (e.g. complete files) in older messages are shortened
+    2. the oldest turns are dropped
+    3. the code blocks (e.g. files) and finally the remaining text (e.g. error logs) of the latest message are
+       shortened to their first and last lines
+    The system messages are never shortened or dropped and the latest message is never dropped.
+    If they still do not fit, ContextWindowExceededException is raised.
+    """
+    def __init__(self, model: str, max_fraction: float = CONTEXT_WINDOW_USAGE_FRACTION):
+        self.model = model
+        self.max_prompt_tokens = int(MODEL_CONTEXT_WINDOWS.get(model, MODEL_CONTEXT_WINDOWS['gpt-3.5-turbo']) * max_fraction)
+        self.tokens_saved = 0
+        self._lock = threading.Lock()
+
+    def _count(self, messages: List[BaseMessage]) -> int:
+        return count_message_tokens(messages, self.model)
+
+    def fit(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """Returns the messages which are sent to the model. The given list is not modified."""
+        tokens_before = self._count(messages)
+        if tokens_before <= self.max_prompt_tokens:
+            return messages
+        messages = list(messages)
+
+        for i, message in enumerate(messages[:-1]):
+            if not isinstance(message, SystemMessage):
+                messages[i] = message.__class__(
+                    content=shorten_code_blocks(message.content, MAX_CODE_BLOCK_TOKENS_IN_HISTORY, self.model)
+                )
+        while self._count(messages) > self.max_prompt_tokens:
+            oldest_turn_index = next(
+                (i for i, message in enumerate(messages[:-1]) if not isinstance(message, SystemMessage)), None
+            )
+            if oldest_turn_index is None:
+                break
+            messages.pop(oldest_turn_index)
+
+        last_message = messages[-1]
+        if self._count(messages) > self.max_prompt_tokens and not isinstance(last_message, SystemMessage):
+            tokens_for_last_message = self.max_prompt_tokens - self._count(messages[:-1]) - 8  # 8 for the message overhead
+            if tokens_for_last_message > 0:
+                num_code_blocks = len(CODE_BLOCK_PATTERN.findall(last_message.content))
+                content = shorten_code_blocks(
+                    last_message.content, tokens_for_last_message // (num_code_blocks + 1), self.model
+                )
+                content = shorten_text(content, tokens_for_last_message, self.model)
+                messages[-1] = last_message.__class__(content=content)
+        if self._count(messages) > self.max_prompt_tokens:
+            raise ContextWindowExceededException(
+                f'The system messages and the last message need {self._count(messages)} tokens, '
+                f'but only {self.max_prompt_tokens} tokens of the context window of {self.model} are available.'
+            )
+
+        tokens_saved = tokens_before - self._count(messages)
+        with self._lock:
+            self.tokens_saved += tokens_saved
+        if os.environ.get('VERBOSE', 'false').lower() == 'true':
+            print(f'The conversation was shortened by {tokens_saved} tokens to fit into the context window of {self.model}.')
+        return messages
@@ -1,26 +1,42 @@
+import asyncio
+import hashlib
 import json
 import os
+import threading
+import weakref
 from copy import deepcopy
 from time import sleep
-from typing import List, Any
+from typing import List, Any, Optional
 
 import openai
+import requests
 from langchain import PromptTemplate
 from langchain.callbacks import CallbackManager
 from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 from langchain.chat_models import ChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage, BaseMessage, AIMessage
+from openai.api_requestor import MAX_CONNECTION_RETRIES
 from openai.error import RateLimitError, APIError
 from requests.exceptions import ConnectionError, ChunkedEncodingError
 from urllib3.exceptions import InvalidChunkLength
 
+from dev_gpt.apis.context_window import ContextWindowManager
+from dev_gpt.apis.rate_limiter import get_rate_limiter, RateLimiter, update_rate_limits_from_response
+from dev_gpt.apis.tokens import count_message_tokens, count_tokens
 from dev_gpt.constants import PRICING_GPT4_PROMPT, PRICING_GPT4_GENERATION, PRICING_GPT3_5_TURBO_PROMPT, \
-    PRICING_GPT3_5_TURBO_GENERATION, CHARS_PER_TOKEN
+    PRICING_GPT3_5_TURBO_GENERATION, LLM_CACHE_MAX_SIZE_BYTES, MAX_CONCURRENT_LLM_REQUESTS, \
+    CONTEXT_WINDOW_USAGE_FRACTION
 from dev_gpt.options.generate.conversation_logger import ConversationLogger, Timer
 from dev_gpt.options.generate.parser import identity_parser
 from dev_gpt.options.generate.templates_system import template_system_message_base
+from dev_gpt.utils.io import get_cache_dir
 from dev_gpt.utils.string_tools import print_colored, get_template_parameters
 
+RETRYABLE_ERRORS = (
+    RateLimitError, openai.error.APIError, ConnectionError, InvalidChunkLength, ChunkedEncodingError, APIError,
+    openai.error.Timeout
+)
+
 
 def configure_openai_api_key():
     if 'OPENAI_API_KEY' not in os.environ:
@@ -34,6 +50,117 @@ If you have updated it already, please restart your terminal.
     openai.api_key = os.environ['OPENAI_API_KEY']
 
 
+def create_openai_requests_session() -> requests.Session:
+    """
+    Creates the requests session of the openai package (one per thread), configured like the default session.
+    Its response hook keeps the rate limiters up to date with the limits OpenAI reports in every response.
+    """
+    session = requests.Session()
+    if isinstance(openai.proxy, str):
+        session.proxies = {'http': openai.proxy, 'https': openai.proxy}
+    elif isinstance(openai.proxy, dict):
+        session.proxies = openai.proxy.copy()
+    session.mount('https://', requests.adapters.HTTPAdapter(max_retries=MAX_CONNECTION_RETRIES))
+    session.hooks['response'].append(update_rate_limits_from_response)
+    return session
+
+
+class LLMCache:
+    """
+    Content-addressed on-disk cache for chat completions.
+    An entry is keyed on the model name plus the full message list, so a cache hit is only possible
+    for exactly the same conversation. Since all completions are requested with temperature=0,
+    the cached response is what the model would most likely have answered anyway.
+    The least recently used entries are evicted as soon as the cache exceeds max_size_bytes.
+    """
+    def __init__(self, cache_dir: str = None, max_size_bytes: int = LLM_CACHE_MAX_SIZE_BYTES):
+        self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir)) if cache_dir else get_cache_dir('llm')
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_size_bytes = max_size_bytes
+
+    @staticmethod
+    def get_key(model: str, messages: List[BaseMessage]) -> str:
+        serialized_messages = json.dumps(
+            [{'role': message.type, 'content': message.content} for message in messages],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(f'{model}\n{serialized_messages}'.encode('utf-8')).hexdigest()
+
+    def _get_entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def get(self, model: str, messages: List[BaseMessage]) -> Optional[str]:
+        entry_path = self._get_entry_path(self.get_key(model, messages))
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(entry_path)  # the modification time is used as the last access time for the LRU eviction
+        except (OSError, ValueError):
+            return None
+        return entry['response']
+
+    def put(self, model: str, messages: List[BaseMessage], response: str):
+        key = self.get_key(model, messages)
+        entry_path = self._get_entry_path(key)
+        tmp_path = f'{entry_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'model': model, 'response': response}, f)
+        os.replace(tmp_path, entry_path)  # atomic, so concurrent runs never read half-written entries
+        self._evict_least_recently_used()
+
+    def _evict_least_recently_used(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith('.json'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+class BudgetExceededException(Exception):
+    """
+    Raised before a request to OpenAI which would exceed the token or cost budget of the generation.
+    It must stop the whole generation, so code which handles any Exception (e.g. the parallel approaches)
+    has to let it through explicitly.
+    """
+    pass
+
+
+class ConcurrencyLimiter:
+    """
+    Bounds the number of requests to OpenAI that are in flight at the same time.
+    Used as a context manager by threads calling chat and via get_async_semaphore by tasks awaiting achat.
+    """
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._thread_semaphore = threading.BoundedSemaphore(max_concurrency)
+        # asyncio primitives are bound to the event loop they are used in, therefore one semaphore per loop
+        self._async_semaphores = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._thread_semaphore.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._thread_semaphore.release()
+
+    def get_async_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._async_semaphores:
+                self._async_semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+            return self._async_semaphores[loop]
+
+
 class GPTSession:
     _instance = None
     _initialized = False
@@ -43,10 +170,19 @@ class GPTSession:
             cls._instance = super(GPTSession, cls).__new__(cls)
         return cls._instance
 
-    def __init__(self, log_file_path: str, model: str = 'gpt-4', ):
+    def __init__(
+            self, log_file_path: str, model: str = 'gpt-4', llm_cache: bool = True, llm_cache_dir: str = None,
+            max_concurrency: int = MAX_CONCURRENT_LLM_REQUESTS, max_tokens_budget: int = None, max_cost: float = None,
+            context_window_fraction: float = CONTEXT_WINDOW_USAGE_FRACTION
+    ):
         if GPTSession._initialized:
             return
+        if openai.requestssession is None:
+            openai.requestssession = create_openai_requests_session
         self.conversation_logger = ConversationLogger(log_file_path)
+        self.llm_cache = LLMCache(llm_cache_dir) if llm_cache else None
+        self.concurrency_limiter = ConcurrencyLimiter(max_concurrency)
+        self._cost_lock = threading.Lock()
         if model == 'gpt-4' and self.is_gpt4_available():
             self.pricing_prompt = PRICING_GPT4_PROMPT
             self.pricing_generation = PRICING_GPT4_GENERATION
@@ -57,23 +193,29 @@ class GPTSession:
             self.pricing_prompt = PRICING_GPT3_5_TURBO_PROMPT
             self.pricing_generation = PRICING_GPT3_5_TURBO_GENERATION
         self.model_name = model
-        self.chars_prompt_so_far = 0
-        self.chars_generation_so_far = 0
+        self.context_window_manager = ContextWindowManager(model, context_window_fraction)
+        self.max_tokens_budget = max_tokens_budget
+        self.max_cost = max_cost
+        self.prompt_tokens_so_far = 0
+        self.completion_tokens_so_far = 0
+        self.cache_hits = 0
+        self.prompt_tokens_saved = 0
+        self.completion_tokens_saved = 0
         GPTSession._initialized = True
 
-
-
-
     def get_conversation(self, messages: List[BaseMessage] = [], print_stream: bool = True, print_costs: bool = True):
         messages = deepcopy(messages)
         return _GPTConversation(
-            self.model_name, self.cost_callback, messages, print_stream, print_costs, self.conversation_logger
+            self.model_name, self.cost_callback, messages, print_stream, print_costs, self.conversation_logger,
+            self.llm_cache, self.concurrency_limiter, self.budget_callback, self.context_window_manager
         )
 
     @staticmethod
     def is_gpt4_available():
+        rate_limiter = get_rate_limiter('gpt-4')
         try:
             for i in range(5):
+                rate_limiter.acquire()
                 try:
                     openai.ChatCompletion.create(
                         model="gpt-4",
@@ -83,27 +225,61 @@ class GPTSession:
                         }]
                     )
                     break
-                except (RateLimitError, openai.error.APIError, ConnectionError, InvalidChunkLength, ChunkedEncodingError, APIError, openai.error.Timeout):
-                    sleep(1)
+                except RETRYABLE_ERRORS as e:
+                    sleep(rate_limiter.get_backoff_seconds(i, e))
                     continue
             return True
         except openai.error.InvalidRequestError:
             return False
 
-    def cost_callback(self, chars_prompt, chars_generation, print_costs: bool = True):
-        self.chars_prompt_so_far += chars_prompt
-        self.chars_generation_so_far += chars_generation
+    def budget_callback(self, prompt_tokens):
+        """Checks the budget before a request is sent. The completion is not known yet, so only the prompt is considered."""
+        with self._cost_lock:
+            tokens_after_request = self.prompt_tokens_so_far + self.completion_tokens_so_far + prompt_tokens
+            if self.max_tokens_budget is not None and tokens_after_request > self.max_tokens_budget:
+                raise BudgetExceededException(
+                    f'The next request would exceed the token budget of {self.max_tokens_budget} tokens '
+                    f'({self.prompt_tokens_so_far + self.completion_tokens_so_far} tokens used so far).'
+                )
+            cost_after_request = self.get_money_spent() + self._calculate_money_spent(prompt_tokens, self.pricing_prompt)
+            if self.max_cost is not None and cost_after_request > self.max_cost:
+                raise BudgetExceededException(
+                    f'The next request would exceed the cost budget of ${self.max_cost:.3f} '
+                    f'(${self.get_money_spent():.3f} spent so far).'
+                )
+
+    def get_money_spent(self):
+        return self._calculate_money_spent(self.prompt_tokens_so_far, self.pricing_prompt) \
+            + self._calculate_money_spent(self.completion_tokens_so_far, self.pricing_generation)
+
+    def cost_callback(self, prompt_tokens, completion_tokens, print_costs: bool = True, cached: bool = False):
+        with self._cost_lock:
+            self._update_costs(prompt_tokens, completion_tokens, print_costs, cached)
+
+    def _update_costs(self, prompt_tokens, completion_tokens, print_costs: bool, cached: bool):
+        if cached:
+            self.cache_hits += 1
+            self.prompt_tokens_saved += prompt_tokens
+            self.completion_tokens_saved += completion_tokens
+        else:
+            self.prompt_tokens_so_far += prompt_tokens
+            self.completion_tokens_so_far += completion_tokens
         if print_costs:
             if os.environ['VERBOSE'].lower() == 'true':
                 print('\n')
-                money_prompt = self._calculate_money_spent(self.chars_prompt_so_far, self.pricing_prompt)
-                money_generation = self._calculate_money_spent(self.chars_generation_so_far, self.pricing_generation)
-                print('Total money spent so far on openai.com:', f'${money_prompt + money_generation:.3f}')
+                print('Total money spent so far on openai.com:', f'${self.get_money_spent():.3f}',
+                      f'({self.prompt_tokens_so_far} prompt tokens, {self.completion_tokens_so_far} completion tokens)')
+                if self.cache_hits:
+                    money_saved = self._calculate_money_spent(self.prompt_tokens_saved, self.pricing_prompt) \
+                                  + self._calculate_money_spent(self.completion_tokens_saved, self.pricing_generation)
+                    print('Responses served from the LLM cache:', self.cache_hits, f'(saved ${money_saved:.3f})')
+                if self.context_window_manager.tokens_saved:
+                    print('Tokens saved by shortening long conversations:', self.context_window_manager.tokens_saved)
                 print('\n')
 
     @staticmethod
-    def _calculate_money_spent(num_chars, price):
-        return round(num_chars / CHARS_PER_TOKEN * price / 1000, 3)
+    def _calculate_money_spent(num_tokens, price):
+        return num_tokens * price / 1000
 
 
 class AssistantStreamingStdOutCallbackHandler(StreamingStdOutCallbackHandler):
@@ -113,7 +289,13 @@ class AssistantStreamingStdOutCallbackHandler(StreamingStdOutCallbackHandler):
 
 
 class _GPTConversation:
-    def __init__(self, model: str, cost_callback, messages: List[BaseMessage], print_stream, print_costs, conversation_logger: ConversationLogger = None):
+    def __init__(
+            self, model: str, cost_callback, messages: List[BaseMessage], print_stream, print_costs,
+            conversation_logger: ConversationLogger = None, llm_cache: LLMCache = None,
+            concurrency_limiter: ConcurrencyLimiter = None, budget_callback=None,
+            context_window_manager: ContextWindowManager = None
+    ):
+        self.model = model
         self._chat = ChatOpenAI(
             model_name=model,
             streaming=True,
@@ -121,12 +303,18 @@ class _GPTConversation:
             request_timeout=10,
             verbose=True,
             temperature=0,
+            max_retries=1,  # retries are handled by chat/achat using the shared rate limiter
         )
         self.cost_callback = cost_callback
         self.messages = messages
         self.print_stream = print_stream
         self.print_costs = print_costs
         self.conversation_logger = conversation_logger
+        self.llm_cache = llm_cache
+        self.concurrency_limiter = concurrency_limiter or ConcurrencyLimiter(MAX_CONCURRENT_LLM_REQUESTS)
+        self.rate_limiter: RateLimiter = get_rate_limiter(model)
+        self.budget_callback = budget_callback
+        self.context_window_manager = context_window_manager or ContextWindowManager(model)
 
     def print_messages(self, messages):
         t = Timer().get_time_since_start()
@@ -139,31 +327,92 @@ class _GPTConversation:
                 elif isinstance(message, AIMessage):
                     print_colored(f'{t} - ({i}) assistant - prompt', message.content, 'green')
 
-    def chat(self, prompt: str, role: str = 'user'):
+    def _add_prompt(self, prompt: str, role: str):
         MassageClass = HumanMessage if role == 'user' else SystemMessage
         chat_message = MassageClass(content=prompt)
         self.messages.append(chat_message)
+        self.messages = self.context_window_manager.fit(self.messages)
         self.print_messages(self.messages)
         if self.print_stream:
             print_colored(f'{Timer().get_time_since_start()} - assistant', '', 'green', end='')
         print('thinking...')
-        for i in range(10):
-            try:
-                response = self._chat(self.messages)
-                self.conversation_logger.log(self.messages, response)
-                break
-            except (RateLimitError, openai.error.APIError, ConnectionError, InvalidChunkLength, ChunkedEncodingError, APIError, openai.error.Timeout) as e:
-                print('There was a connection error. Retrying...')
-                if i == 9:
-                    raise e
-                sleep(10)
 
+    def _count_prompt_tokens(self) -> int:
+        return count_message_tokens(self.messages, self.model)
+
+    def _get_cached_response(self) -> Optional[AIMessage]:
+        cached_content = self.llm_cache.get(self.model, self.messages) if self.llm_cache else None
+        if cached_content is None:
+            return None
+        response = AIMessage(content=cached_content)
+        if self.print_stream:
+            print_colored('', cached_content, 'green', end='')
+        self.conversation_logger.log(self.messages, response)
+        return response
+
+    def _add_response(self, response: AIMessage, cached: bool):
+        if not cached:
+            self.conversation_logger.log(self.messages, response)
+            if self.llm_cache:
+                self.llm_cache.put(self.model, self.messages, response.content)
         if os.environ['VERBOSE'].lower() == 'true':
             print()
-        self.cost_callback(sum([len(m.content) for m in self.messages]), len(response.content), self.print_costs)
+        self.cost_callback(
+            self._count_prompt_tokens(), count_tokens(response.content, self.model), self.print_costs,
+            cached=cached
+        )
         self.messages.append(response)
         return response.content
 
+    def chat(self, prompt: str, role: str = 'user'):
+        self._add_prompt(prompt, role)
+        response = self._get_cached_response()
+        if response is not None:
+            return self._add_response(response, cached=True)
+        prompt_tokens = self._count_prompt_tokens()
+        if self.budget_callback:
+            self.budget_callback(prompt_tokens)
+        with self.concurrency_limiter:
+            for i in range(10):
+                self.rate_limiter.acquire(prompt_tokens)
+                try:
+                    response = self._chat(self.messages)
+                    break
+                except RETRYABLE_ERRORS as e:
+                    if i == 9:
+                        raise e
+                    backoff_seconds = self.rate_limiter.get_backoff_seconds(i, e)
+                    print(f'There was a connection error. Retrying in {backoff_seconds:.1f} seconds...')
+                    sleep(backoff_seconds)
+        return self._add_response(response, cached=False)
+
+    async def achat(self, prompt: str, role: str = 'user'):
+        """Same as chat, but does not block the event loop while waiting for the model.
+        Different conversations can be awaited concurrently, one conversation must not be used by two tasks at once.
+        The requests are sent via aiohttp, so the rate limits are only learned from the headers of failed requests.
+        """
+        self._add_prompt(prompt, role)
+        response = self._get_cached_response()
+        if response is not None:
+            return self._add_response(response, cached=True)
+        prompt_tokens = self._count_prompt_tokens()
+        if self.budget_callback:
+            self.budget_callback(prompt_tokens)
+        async with self.concurrency_limiter.get_async_semaphore():
+            for i in range(10):
+                await self.rate_limiter.acquire_async(prompt_tokens)
+                try:
+                    result = await self._chat.agenerate([self.messages])
+                    response = result.generations[0][0].message
+                    break
+                except RETRYABLE_ERRORS as e:
+                    if i == 9:
+                        raise e
+                    backoff_seconds = self.rate_limiter.get_backoff_seconds(i, e)
+                    print(f'There was a connection error. Retrying in {backoff_seconds:.1f} seconds...')
+                    await asyncio.sleep(backoff_seconds)
+        return self._add_response(response, cached=False)
+
     @staticmethod
     def _create_system_message(task_description, test_description) -> SystemMessage:
         system_message = PromptTemplate.from_template(template_system_message_base).format(
@@ -173,7 +422,7 @@ class _GPTConversation:
         return SystemMessage(content=system_message)
 
 
-def ask_gpt(prompt_template: str, parser=identity_parser, **kwargs):
+def _get_ask_gpt_conversation_and_prompt(prompt_template: str, **kwargs):
     template_parameters = get_template_parameters(prompt_template)
     if set(template_parameters) != set(kwargs.keys()):
         raise ValueError(
@@ -188,6 +437,19 @@ def ask_gpt(prompt_template: str, parser=identity_parser, **kwargs):
         print_stream=os.environ['VERBOSE'].lower() == 'true',
         print_costs=False
     )
+    return conversation, prompt
+
+
+def ask_gpt(prompt_template: str, parser=identity_parser, **kwargs):
+    conversation, prompt = _get_ask_gpt_conversation_and_prompt(prompt_template, **kwargs)
     agent_response_raw = conversation.chat(prompt, role='user')
     agent_response = parser(agent_response_raw)
     return agent_response
+
+
+async def ask_gpt_async(prompt_template: str, parser=identity_parser, **kwargs):
+    """Async version of ask_gpt. Independent questions can be asked concurrently via asyncio.gather."""
+    conversation, prompt = _get_ask_gpt_conversation_and_prompt(prompt_template, **kwargs)
+    agent_response_raw = await conversation.achat(prompt, role='user')
+    agent_response = parser(agent_response_raw)
+    return agent_response
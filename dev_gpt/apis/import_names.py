@@ -0,0 +1,115 @@
+import ast
+import functools
+import os
+import re
+import sys
+
+from dev_gpt.apis.pypi import canonicalize_name
+from dev_gpt.constants import REQUIREMENTS_FILE_NAME, IMPLEMENTATION_FILE_NAME, TEST_EXECUTOR_FILE_NAME
+from dev_gpt.utils.io import persist_file
+
+IMPORT_NAME_INDEX_PATH = os.path.join(
+    os.path.dirname(__file__), '..', 'options', 'generate', 'static_files', 'import_name_to_distribution.txt'
+)
+STDLIB_MODULE_NAMES_PATH = os.path.join(
+    os.path.dirname(__file__), '..', 'options', 'generate', 'static_files', 'stdlib_module_names.txt'
+)
+# part of the docker base image, adding them to requirements.txt could change their versions
+PREINSTALLED_DISTRIBUTIONS = {'jina', 'docarray', 'pytest'}
+
+
+@functools.lru_cache(maxsize=None)
+def get_import_name_index():
+    """
+    Returns the mapping from top-level import names to the distributions which provide them, e.g. cv2 -> opencv-python.
+    The index is built from the top_level.txt of wheels by scripts/build_import_name_index.py.
+    """
+    index = {}
+    with open(IMPORT_NAME_INDEX_PATH, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('#') or not line.strip():
+                continue
+            import_name, distribution = line.split()
+            index[import_name] = distribution
+    return index
+
+
+@functools.lru_cache(maxsize=None)
+def get_stdlib_module_names():
+    """
+    Returns the top-level modules of the standard library.
+    Python < 3.10 has no sys.stdlib_module_names, the list built by scripts/build_stdlib_module_names.py is used instead.
+    """
+    if hasattr(sys, 'stdlib_module_names'):
+        return frozenset(sys.stdlib_module_names)
+    with open(STDLIB_MODULE_NAMES_PATH, 'r', encoding='utf-8') as f:
+        return frozenset(line.strip() for line in f if line.strip() and not line.startswith('#'))
+
+
+def get_distribution_name(import_name):
+    return get_import_name_index().get(import_name)
+
+
+def get_imported_top_level_names(code):
+    """Returns the top-level names of all absolute imports, e.g. PIL for `from PIL import Image`."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return set()
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names.add(node.module.split('.')[0])
+    return names
+
+
+def _get_requirement_name(line):
+    line = re.sub(r'#.*', '', line).strip()
+    if not line:
+        return None
+    return re.split(r'==|>=|<=|>|<|~=|!=|\[|;|\s', line)[0]
+
+
+def reconcile_requirements_txt(microservice_path):
+    """
+    Makes sure that the distributions of all imports in microservice.py and test_microservice.py are in requirements.txt,
+    e.g. `import cv2` needs opencv-python and `import yaml` needs pyyaml.
+    Requirements which use the import name instead of the distribution name are replaced.
+    Without this, the mismatch is only found by a failing build.
+    Returns a list of the changes.
+    """
+    requirements_path = os.path.join(microservice_path, REQUIREMENTS_FILE_NAME)
+    with open(requirements_path, 'r', encoding='utf-8') as f:
+        requirement_lines = f.read().split('\n')
+
+    imported_names = set()
+    for file_name in [IMPLEMENTATION_FILE_NAME, TEST_EXECUTOR_FILE_NAME]:
+        file_path = os.path.join(microservice_path, file_name)
+        if os.path.exists(file_path):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                imported_names.update(get_imported_top_level_names(f.read()))
+    local_modules = {os.path.splitext(file_name)[0] for file_name in os.listdir(microservice_path)}
+
+    changes = []
+    for import_name in sorted(imported_names - local_modules - get_stdlib_module_names()):
+        distribution = get_distribution_name(import_name)
+        if distribution is None or distribution in PREINSTALLED_DISTRIBUTIONS:
+            continue
+        required = {
+            canonicalize_name(name): i for i, name in enumerate(map(_get_requirement_name, requirement_lines)) if name
+        }
+        if canonicalize_name(distribution) in required:
+            continue
+        if canonicalize_name(import_name) in required:
+            # the version belongs to another distribution, the right one is set when requirements.txt is cleaned
+            requirement_lines[required[canonicalize_name(import_name)]] = distribution
+            changes.append(f'replaced {import_name} with {distribution}')
+        else:
+            requirement_lines.append(distribution)
+            changes.append(f'added {distribution} for import {import_name}')
+
+    if changes:
+        persist_file('\n'.join(line for line in requirement_lines if line.strip()), requirements_path)
+    return changes
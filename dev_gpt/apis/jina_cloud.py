@@ -16,8 +16,8 @@ from hubble.executor.helper import upload_file, archive_package, get_full_versio
 from jcloud.flow import CloudFlow
 from jina import Flow
 
-from dev_gpt.constants import DEMO_TOKEN
-from dev_gpt.utils.io import suppress_stdout, is_docker_running
+from dev_gpt.constants import DEMO_TOKEN, HUBBLE_API_URL
+from dev_gpt.utils.io import suppress_stdout, is_docker_running, persist_file
 from dev_gpt.utils.string_tools import print_colored, clean_large_words
 
 
@@ -110,7 +110,7 @@ def _push_executor(dir_path):
     headers['jinameta-processor'] = 'i386'
 
     resp = upload_file(
-        'https://api.hubble.jina.ai/v2/rpc/executor.push',
+        f'{HUBBLE_API_URL}/v2/rpc/executor.push',
         'filename',
         content,
         dict_data=form_data,
@@ -137,7 +137,7 @@ def _push_executor(dir_path):
     return '\n'.join(responses)
 
 def is_executor_in_hub(microservice_name):
-    url = f'https://api.hubble.jina.ai/v2/rpc/executor.list?search={microservice_name}&withAnonymous=true'
+    url = f'{HUBBLE_API_URL}/v2/rpc/executor.list?search={microservice_name}&withAnonymous=true'
     resp = requests.get(url)
     executor_list = resp.json()['data']
     for executor in executor_list:
@@ -266,8 +266,7 @@ executors:
 '''
     full_flow_path = os.path.join(dest_folder,
                                   'flow.yml')
-    with open(full_flow_path, 'w', encoding='utf-8') as f:
-        f.write(flow)
+    persist_file(flow, full_flow_path)
     return full_flow_path
 
 
@@ -286,8 +285,7 @@ def update_client_line_in_file(file_path, host):
 
     replaced_content = replace_client_line(content, f"client = Client(host='{host}')")
 
-    with open(file_path, 'w', encoding='utf-8') as file:
-        file.write(replaced_content)
+    persist_file(replaced_content, file_path)
 
 
 def shorten_logs(relevant_lines):
@@ -0,0 +1,145 @@
+import hashlib
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+from dev_gpt.constants import DOCKER_FILE_NAME, REQUIREMENTS_FILE_NAME, TEST_EXECUTOR_FILE_NAME, \
+    LOCAL_BUILD_TIMEOUT_SECONDS
+from dev_gpt.utils.io import is_docker_running, get_cache_dir
+
+BUILD_ENV_VARIABLES = ['OPENAI_API_KEY', 'GOOGLE_API_KEY', 'GOOGLE_CSE_ID']
+LOCAL_BUILD_IMAGE_TAG = 'dev-gpt-local-build'
+BUILD_ENV_SECRET_ID = 'build_env'
+TEST_STEP_PATTERN = re.compile(r'^RUN (?!--mount)(.*\bpytest\b.*)$', re.MULTILINE)
+VIRTUALENV_READY_FILE_NAME = '.installed'
+
+_virtualenv_locks = {}
+_virtualenv_locks_lock = threading.Lock()
+
+
+def build_locally(microservice_path):
+    """
+    Builds the microservice and runs its tests on this machine instead of Jina Cloud.
+    Uses the local docker daemon if available, otherwise a virtualenv (apt-get packages are not installed in that case).
+    Returns an empty string on success and otherwise a log in the format of the Jina Cloud build log,
+    so that it can be processed by process_error_message.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # build a copy, so that no caches or build artifacts end up in the pushed microservice
+        # the files of the version store are read-only, copyfile leaves the copies writable
+        build_path = os.path.join(tmp_dir, 'microservice')
+        shutil.copytree(microservice_path, build_path, copy_function=shutil.copyfile)
+        if is_docker_running():
+            return _build_with_docker(build_path)
+        return _build_in_virtualenv(build_path)
+
+
+def _run(command, cwd=None, env=None):
+    try:
+        process = subprocess.run(
+            command, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            timeout=LOCAL_BUILD_TIMEOUT_SECONDS
+        )
+        return process.returncode, process.stdout.decode('utf-8', errors='replace')
+    except subprocess.TimeoutExpired as e:
+        output = e.output.decode('utf-8', errors='replace') if e.output else ''
+        return 1, f'{output}\nerror: the command {" ".join(command)} timed out after {LOCAL_BUILD_TIMEOUT_SECONDS} seconds'
+
+
+def _write_build_env_secret(secret_path):
+    """Writes the environment variables for the tests as a shell script which is only readable by the current user."""
+    fd = os.open(secret_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        for name in BUILD_ENV_VARIABLES:
+            f.write(f'export {name}={shlex.quote(os.environ.get(name, ""))}\n')
+
+
+def _build_with_docker(build_path):
+    docker_file_path = os.path.join(build_path, DOCKER_FILE_NAME)
+    with open(docker_file_path, 'r', encoding='utf-8') as f:
+        docker_file_content = f.read()
+    # the tests need the same environment variables as the Jina Cloud build which passes them via buildEnv
+    # they are mounted as a BuildKit secret, so that they do not end up in the image history like build args
+    docker_file_content = TEST_STEP_PATTERN.sub(
+        lambda match: f'RUN --mount=type=secret,id={BUILD_ENV_SECRET_ID} '
+                      f'. /run/secrets/{BUILD_ENV_SECRET_ID} && {match.group(1)}',
+        docker_file_content
+    )
+    with open(docker_file_path, 'w', encoding='utf-8') as f:
+        f.write(docker_file_content)
+    # the secret is written next to the build context, not into it
+    secret_path = os.path.join(os.path.dirname(build_path), BUILD_ENV_SECRET_ID)
+    _write_build_env_secret(secret_path)
+
+    # plain progress output has the same format as the Jina Cloud build log, e.g. "#11 [7/8] RUN pytest ..."
+    return_code, output = _run(
+        [
+            'docker', 'build', '--progress=plain', '--secret', f'id={BUILD_ENV_SECRET_ID},src={secret_path}',
+            '-t', LOCAL_BUILD_IMAGE_TAG, build_path
+        ],
+        env={**os.environ, 'DOCKER_BUILDKIT': '1'},
+    )
+    _run(['docker', 'image', 'rm', '-f', LOCAL_BUILD_IMAGE_TAG])
+    return '' if return_code == 0 else output
+
+
+def _get_virtualenv_python(requirements_path):
+    """Virtualenvs are cached per requirements.txt, so that unchanged requirements are not installed again."""
+    with open(requirements_path, 'rb') as f:
+        requirements_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+    virtualenv_path = os.path.join(get_cache_dir('virtualenvs'), requirements_hash)
+    bin_dir = 'Scripts' if sys.platform.startswith('win') else 'bin'
+    return virtualenv_path, os.path.join(virtualenv_path, bin_dir, 'python')
+
+
+def _get_virtualenv_lock(virtualenv_path):
+    with _virtualenv_locks_lock:
+        return _virtualenv_locks.setdefault(virtualenv_path, threading.Lock())
+
+
+def _install_virtualenv(virtualenv_path, python, requirements_path):
+    """
+    Creates the virtualenv and installs the requirements unless this was done before.
+    Parallel approaches with the same requirements share the virtualenv, so they wait for each other's installation.
+    """
+    with _get_virtualenv_lock(virtualenv_path):
+        ready_file_path = os.path.join(virtualenv_path, VIRTUALENV_READY_FILE_NAME)
+        if os.path.exists(ready_file_path):
+            return 0, ''
+        # an earlier installation was interrupted
+        shutil.rmtree(virtualenv_path, ignore_errors=True)
+        return_code, output = _run([sys.executable, '-m', 'venv', virtualenv_path])
+        if return_code == 0:
+            return_code, output = _run([python, '-m', 'pip', 'install', '-r', requirements_path])
+        if return_code != 0:
+            shutil.rmtree(virtualenv_path, ignore_errors=True)
+            return return_code, output
+        os.makedirs(virtualenv_path, exist_ok=True)
+        open(ready_file_path, 'w').close()
+        return return_code, output
+
+
+def _build_in_virtualenv(build_path):
+    requirements_path = os.path.join(build_path, REQUIREMENTS_FILE_NAME)
+    virtualenv_path, python = _get_virtualenv_python(requirements_path)
+    steps = [
+        (f'RUN pip install -r {REQUIREMENTS_FILE_NAME}', None),
+        (f'RUN pytest {TEST_EXECUTOR_FILE_NAME}', [python, '-m', 'pytest', TEST_EXECUTOR_FILE_NAME]),
+    ]
+    log_lines = []
+    for step_number, (step_name, command) in enumerate(steps, start=1):
+        log_lines.append(f'#{step_number} [{step_number}/{len(steps)}] {step_name}')
+        if command is None:
+            return_code, output = _install_virtualenv(virtualenv_path, python, requirements_path)
+        else:
+            return_code, output = _run(command, cwd=build_path)
+        log_lines.append(output)
+        if return_code != 0:
+            log_lines.append(f'exited on non-zero code: {return_code}')
+            return '\n'.join(log_lines)
+    return ''
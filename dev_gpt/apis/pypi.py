@@ -1,42 +1,261 @@
+import bisect
+import json
 import os
 import re
-from datetime import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 from packaging import version
+from requests.adapters import HTTPAdapter
 
-def is_package_on_pypi(package_name, version=None):
+from dev_gpt.constants import PYPI_URL, PYPI_MAX_CONCURRENT_REQUESTS, PYPI_REQUEST_TIMEOUT_SECONDS, \
+    PYPI_RELEASE_DATE_CUTOFF, PYPI_MAX_RETRIES, PYPI_RETRY_STATUS_CODES
+from dev_gpt.utils.io import get_cache_dir, persist_file
+
+
+def canonicalize_name(package_name):
+    return re.sub(r'[-_.]+', '-', package_name).lower()
+
+
+class PyPIClient:
     """
-    Returns True if the package is on PyPI, False if it is not, and None if the status code is not 200 or 404.
+    Fetches the project metadata from the PyPI JSON API.
+    - all requests share one pooled session
+    - each project is fetched at most once per process, concurrent lookups of the same project wait for each other
+    - only a 404 marks a project as not on PyPI, rate limits and server errors are retried
+    - if PyPI is still unavailable, is_package_on_pypi and get_release_index answer as if the project was not found,
+      so that a PyPI outage does not abort the generation
+    - the metadata is cached on disk and revalidated via ETag/If-None-Match, so unchanged projects are not downloaded again
     """
-    optional_version = f"/{version}" if version else ""
-    url = f"https://pypi.org/pypi/{package_name}{optional_version}/json"
-    response = requests.get(url)
-    return response.status_code == 200 and len(response.json()['urls']) > 0
+    def __init__(self, cache_dir=None, max_concurrency=PYPI_MAX_CONCURRENT_REQUESTS):
+        self.cache_dir = cache_dir or get_cache_dir('pypi')
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_concurrency = max_concurrency
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._projects = {}
+        self._etags = {}
+        self._release_indices = {}
+        self._project_locks = {}
+        self._lock = threading.Lock()
+
+    def _get_cache_path(self, name):
+        return os.path.join(self.cache_dir, f'{name}.json')
+
+    def _read_cache(self, name):
+        try:
+            with open(self._get_cache_path(name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, name, etag, project):
+        cache_path = self._get_cache_path(name)
+        tmp_path = f'{cache_path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'etag': etag, 'project': project}, f)
+        os.replace(tmp_path, cache_path)
+
+    def _get(self, url, headers):
+        for attempt in range(PYPI_MAX_RETRIES + 1):
+            response = self.session.get(url, headers=headers, timeout=PYPI_REQUEST_TIMEOUT_SECONDS)
+            if response.status_code not in PYPI_RETRY_STATUS_CODES or attempt == PYPI_MAX_RETRIES:
+                return response
+            retry_after = response.headers.get('Retry-After', '')
+            time.sleep(min(float(retry_after), 30) if retry_after.isdigit() else 0.5 * 2 ** attempt)
+
+    def _fetch_project(self, name):
+        """Returns the metadata and its ETag or (None, None) if the project does not exist. Raises on other errors."""
+        cached = self._read_cache(name)
+        headers = {'If-None-Match': cached['etag']} if cached and cached.get('etag') else {}
+        try:
+            response = self._get(f'{PYPI_URL}/pypi/{name}/json', headers)
+            if response.status_code == 404:
+                return None, None
+            if response.status_code == 304 and cached:
+                return cached['project'], cached.get('etag')
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            if cached:
+                # better outdated metadata than none
+                return cached['project'], cached.get('etag')
+            raise
+        project = response.json()
+        etag = response.headers.get('ETag')
+        self._write_cache(name, etag, project)
+        return project, etag
 
+    def get_project(self, package_name):
+        """
+        Returns the metadata of the project or None if it is not on PyPI.
+        Errors are raised and not remembered, so that the next lookup tries again.
+        """
+        name = canonicalize_name(package_name)
+        with self._lock:
+            if name in self._projects:
+                return self._projects[name]
+            project_lock = self._project_locks.setdefault(name, threading.Lock())
+        with project_lock:
+            with self._lock:
+                if name in self._projects:
+                    return self._projects[name]
+            project, etag = self._fetch_project(name)
+            with self._lock:
+                self._projects[name] = project
+                self._etags[name] = etag
+            return project
 
-def get_latest_package_version(package_name):
+    def get_release_index(self, package_name):
+        """
+        Returns the ReleaseIndex of the project or None if it is not on PyPI.
+        The index is cached next to the metadata and rebuilt only if the metadata changed.
+        """
+        try:
+            project = self.get_project(package_name)
+        except requests.exceptions.RequestException:
+            return None
+        if project is None:
+            return None
+        name = canonicalize_name(package_name)
+        with self._lock:
+            if name in self._release_indices:
+                return self._release_indices[name]
+            etag = self._etags.get(name)
+        index_path = os.path.join(self.cache_dir, f'{name}.index.json')
+        release_index = None
+        if etag:
+            try:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                if cached['etag'] == etag:
+                    release_index = ReleaseIndex(**cached['index'])
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+        if release_index is None:
+            release_index = ReleaseIndex.from_releases(project['releases'])
+            if etag:
+                tmp_path = f'{index_path}.{threading.get_ident()}.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'etag': etag, 'index': release_index.to_dict()}, f)
+                os.replace(tmp_path, index_path)
+        with self._lock:
+            self._release_indices[name] = release_index
+        return release_index
+
+    def _prefetch_project(self, package_name):
+        try:
+            self.get_project(package_name)
+        except requests.exceptions.RequestException:
+            # the error is not remembered, the lookup of the package tries again
+            pass
+
+    def prefetch(self, package_names):
+        """Fetches the metadata of several projects concurrently. Errors are left to the lookups of the packages."""
+        package_names = set(package_names)
+        if len(package_names) <= 1:
+            for package_name in package_names:
+                self._prefetch_project(package_name)
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(package_names))) as executor:
+            list(executor.map(self._prefetch_project, package_names))
+
+    def is_package_on_pypi(self, package_name, version_string=None):
+        try:
+            project = self.get_project(package_name)
+        except requests.exceptions.RequestException:
+            return False
+        if project is None:
+            return False
+        if version_string is None:
+            return len(project['urls']) > 0
+        releases = project['releases']
+        if version_string in releases:
+            return len(releases[version_string]) > 0
+        parsed_version = parse_version(version_string)
+        return any(
+            len(files) > 0 and parse_version(release_version) == parsed_version
+            for release_version, files in releases.items()
+        )
+
+
+class ReleaseIndex:
     """
-    Returns the latest version of a package that is not older than 2021.
+    Compact index of the releases of a project to answer "latest version released before a date" with a binary search.
+    - versions: the version strings sorted by their parsed version
+    - upload_times: the upload times in ISO format, sorted, ISO strings compare like the times they represent
+    - latest_version_positions: for each upload time, the position in versions of the latest version uploaded until then
     """
-    url = f'https://pypi.org/pypi/{package_name}/json'
-    response = requests.get(url)
-    if response.status_code != 200:
-        return None
-    data = response.json()
-    releases = data['releases']
+    def __init__(self, versions, upload_times, latest_version_positions):
+        self.versions = versions
+        self.upload_times = upload_times
+        self.latest_version_positions = latest_version_positions
 
-    # Get package versions not older than 2021
-    valid_versions = []
-    for v, release_info in releases.items():
-        if not release_info:
-            continue
-        upload_time = datetime.strptime(release_info[0]['upload_time'], '%Y-%m-%dT%H:%M:%S')
-        if upload_time.year <= 2020 or (upload_time.year == 2021 and upload_time.month <= 9):  # knowledge cutoff 2021-09 (including september)
-            valid_versions.append(v)
+    @classmethod
+    def from_releases(cls, releases):
+        # releases without files can not be installed
+        versions = sorted((v for v, files in releases.items() if files), key=parse_version)
+        version_position = {v: position for position, v in enumerate(versions)}
+        uploads = sorted((releases[v][0]['upload_time'], version_position[v]) for v in versions)
+        latest_version_positions = []
+        for _, position in uploads:
+            latest_version_positions.append(max(position, latest_version_positions[-1]) if latest_version_positions else position)
+        return cls(versions, [upload_time for upload_time, _ in uploads], latest_version_positions)
+
+    def get_latest_version(self, cutoff):
+        num_releases_before_cutoff = bisect.bisect_left(self.upload_times, cutoff)
+        if num_releases_before_cutoff == 0:
+            return None
+        return self.versions[self.latest_version_positions[num_releases_before_cutoff - 1]]
+
+    def to_dict(self):
+        return {
+            'versions': self.versions,
+            'upload_times': self.upload_times,
+            'latest_version_positions': self.latest_version_positions,
+        }
 
-    v = max(valid_versions, key=parse_version) if valid_versions else None
-    return v
+
+_pypi_client = None
+_pypi_client_lock = threading.Lock()
+
+
+def use_pypi_snapshot(snapshot_path):
+    """From now on, all lookups are answered from the snapshot file only (see dev-gpt pypi-snapshot)."""
+    global _pypi_client
+    from dev_gpt.apis.pypi_snapshot import PyPISnapshot
+    with _pypi_client_lock:
+        _pypi_client = PyPISnapshot(snapshot_path)
+
+
+def get_pypi_client():
+    """Returns the PyPI client (or snapshot) which is shared across the whole process."""
+    global _pypi_client
+    with _pypi_client_lock:
+        if _pypi_client is None:
+            _pypi_client = PyPIClient()
+        return _pypi_client
+
+
+def is_package_on_pypi(package_name, version=None):
+    """
+    Returns True if the package (in the given version) is on PyPI and has files to install, otherwise False.
+    """
+    return get_pypi_client().is_package_on_pypi(package_name, version)
+
+
+def get_latest_package_version(package_name, cutoff=PYPI_RELEASE_DATE_CUTOFF):
+    """
+    Returns the latest version of a package that was released before the cutoff date (e.g. '2021-10-01').
+    The cutoff corresponds to the knowledge cutoff of the model, newer versions are unknown to it.
+    """
+    release_index = get_pypi_client().get_release_index(package_name)
+    if release_index is None:
+        return None
+    return release_index.get_latest_version(cutoff)
 
 def parse_version(version_string):
     """
@@ -47,18 +266,17 @@ def parse_version(version_string):
     except version.InvalidVersion:
         return version.parse("0.0.0")
 
-def clean_requirements_txt(previous_microservice_path):
+def clean_requirements_txt(previous_microservice_path, cutoff=PYPI_RELEASE_DATE_CUTOFF):
     """
     It can happen that the generated requirements.txt contains packages that are not on PyPI (like base64).
     In this case, we remove the requirement from requirements.txt.
-    In case the package is on PyPI, but the version is not, we update the version to the latest version that is still not older than 2021.
+    In case the package is on PyPI, but the version is not, we update the version to the latest version that was released before the cutoff.
     """
     requirements_txt_path = os.path.join(previous_microservice_path, 'requirements.txt')
     with open(requirements_txt_path, 'r', encoding='utf-8') as f:
         requirements_txt = f.read()
 
-    updated_requirements = []
-
+    requirements = []
     for line in requirements_txt.split('\n'):
         # replace comment at the end of the line
         pattern = r'#.+'
@@ -73,20 +291,27 @@ def clean_requirements_txt(previous_microservice_path):
             package_name = split[0]
         else:
             package_name, version = split
+        requirements.append((line, package_name, version))
 
+    # Keep lines with jina, docarray, openai, pytest unchanged
+    unchecked_packages = {'jina', 'docarray', 'openai', 'pytest'}
+    # the metadata of all packages is fetched concurrently instead of line by line
+    get_pypi_client().prefetch(
+        package_name for _, package_name, _ in requirements if package_name not in unchecked_packages
+    )
 
-        # Keep lines with jina, docarray, openai, pytest unchanged
-        if package_name in {'jina', 'docarray', 'openai', 'pytest'}:
+    updated_requirements = []
+    for line, package_name, version in requirements:
+        if package_name in unchecked_packages:
             updated_requirements.append(line)
             continue
         if is_package_on_pypi(package_name):
             if version is None or not is_package_on_pypi(package_name, version):
-                latest_version = get_latest_package_version(package_name)
+                latest_version = get_latest_package_version(package_name, cutoff)
                 if latest_version is None:
                     continue
                 updated_requirements.append(f'{package_name}~={latest_version}')
             else:
                 updated_requirements.append(line)
 
-    with open(requirements_txt_path, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(updated_requirements))
+    persist_file('\n'.join(updated_requirements), requirements_txt_path)
@@ -0,0 +1,179 @@
+import hashlib
+import mmap
+import os
+import struct
+import threading
+
+from dev_gpt.apis.pypi import ReleaseIndex, PyPIClient, canonicalize_name, parse_version
+
+# File layout (little endian):
+# header:  magic, format version, number of slots, number of packages
+# slots:   open addressing hash table with linear probing, each slot is (name hash, record offset), (0, 0) is empty
+# records: name, whether the latest release has files, releases sorted by parsed version with
+#          version, upload time of the first file (ISO format, empty without files) and flags
+MAGIC = b'DGPS'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sIII')
+SLOT = struct.Struct('<QQ')
+RECORD_HEADER = struct.Struct('<HBI')
+RELEASE_HEADER = struct.Struct('<H')
+RELEASE_DATA = struct.Struct('<19sB')
+FLAG_HAS_FILES = 1
+FLAG_YANKED = 2
+
+
+def _hash_name(name):
+    # never 0, which marks empty slots
+    return int.from_bytes(hashlib.blake2b(name.encode('utf-8'), digest_size=8).digest(), 'little') | 1
+
+
+def _encode_record(name, project):
+    name_bytes = name.encode('utf-8')
+    releases = project['releases']
+    versions = sorted(releases, key=parse_version)
+    parts = [RECORD_HEADER.pack(len(name_bytes), int(len(project['urls']) > 0), len(versions)), name_bytes]
+    for version in versions:
+        files = releases[version]
+        version_bytes = version.encode('utf-8')
+        flags = 0
+        if files:
+            flags |= FLAG_HAS_FILES
+            if all(file.get('yanked', False) for file in files):
+                flags |= FLAG_YANKED
+        upload_time = files[0]['upload_time'].encode('ascii') if files else b''
+        parts.append(RELEASE_HEADER.pack(len(version_bytes)))
+        parts.append(version_bytes)
+        parts.append(RELEASE_DATA.pack(upload_time, flags))
+    return b''.join(parts)
+
+
+def write_snapshot(snapshot_path, projects):
+    """
+    Writes the metadata of the given projects into a snapshot file.
+    :param projects: dict from package name to the project metadata of the PyPI JSON API
+    """
+    projects = {canonicalize_name(name): project for name, project in projects.items() if project is not None}
+    num_slots = 1
+    while num_slots < 2 * max(len(projects), 1):  # the load factor stays below 0.5, so that probing sequences are short
+        num_slots *= 2
+    slots = [(0, 0)] * num_slots
+    records = []
+    offset = HEADER.size + num_slots * SLOT.size
+    for name, project in sorted(projects.items()):
+        name_hash = _hash_name(name)
+        slot = name_hash % num_slots
+        while slots[slot] != (0, 0):
+            slot = (slot + 1) % num_slots
+        slots[slot] = (name_hash, offset)
+        record = _encode_record(name, project)
+        records.append(record)
+        offset += len(record)
+
+    tmp_path = f'{snapshot_path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, num_slots, len(projects)))
+        for slot in slots:
+            f.write(SLOT.pack(*slot))
+        for record in records:
+            f.write(record)
+    os.replace(tmp_path, snapshot_path)
+
+
+class PyPISnapshot:
+    """
+    Answers PyPI lookups only from a snapshot file, without any network access.
+    Packages which are not in the snapshot are treated as not being on PyPI.
+    The file is memory-mapped and a package is found with a single hash lookup.
+    Offers the same lookups as PyPIClient, so it can be used in its place.
+    """
+    def __init__(self, snapshot_path):
+        self.snapshot_path = snapshot_path
+        with open(snapshot_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, format_version, self.num_slots, self.num_packages = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f'{snapshot_path} is not a PyPI snapshot of dev-gpt')
+        self._release_indices = {}
+        self._lock = threading.Lock()
+
+    def _find_record(self, name):
+        name_hash = _hash_name(name)
+        slot = name_hash % self.num_slots
+        while True:
+            slot_hash, offset = SLOT.unpack_from(self._mmap, HEADER.size + slot * SLOT.size)
+            if slot_hash == 0 and offset == 0:
+                return None
+            if slot_hash == name_hash:
+                name_length, has_files, num_releases = RECORD_HEADER.unpack_from(self._mmap, offset)
+                name_start = offset + RECORD_HEADER.size
+                if self._mmap[name_start:name_start + name_length].decode('utf-8') == name:
+                    return bool(has_files), num_releases, name_start + name_length
+            slot = (slot + 1) % self.num_slots
+
+    def get_releases(self, package_name):
+        """Returns the releases of the package as (version, upload time, has files, yanked) or None if it is not in the snapshot."""
+        record = self._find_record(canonicalize_name(package_name))
+        if record is None:
+            return None
+        _, num_releases, offset = record
+        releases = []
+        for _ in range(num_releases):
+            (version_length,) = RELEASE_HEADER.unpack_from(self._mmap, offset)
+            offset += RELEASE_HEADER.size
+            version = self._mmap[offset:offset + version_length].decode('utf-8')
+            offset += version_length
+            upload_time, flags = RELEASE_DATA.unpack_from(self._mmap, offset)
+            offset += RELEASE_DATA.size
+            releases.append((version, upload_time.rstrip(b'\0').decode('ascii'), bool(flags & FLAG_HAS_FILES), bool(flags & FLAG_YANKED)))
+        return releases
+
+    def prefetch(self, package_names):
+        pass
+
+    def is_package_on_pypi(self, package_name, version_string=None):
+        if version_string is None:
+            record = self._find_record(canonicalize_name(package_name))
+            return record is not None and record[0]
+        releases = self.get_releases(package_name)
+        if releases is None:
+            return False
+        parsed_version = parse_version(version_string)
+        return any(
+            has_files and (version == version_string or parse_version(version) == parsed_version)
+            for version, _, has_files, _ in releases
+        )
+
+    def get_release_index(self, package_name):
+        name = canonicalize_name(package_name)
+        with self._lock:
+            if name in self._release_indices:
+                return self._release_indices[name]
+        releases = self.get_releases(name)
+        release_index = None
+        if releases is not None:
+            release_index = ReleaseIndex.from_releases({
+                version: [{'upload_time': upload_time}] if has_files else []
+                for version, upload_time, has_files, _ in releases
+            })
+        with self._lock:
+            self._release_indices[name] = release_index
+        return release_index
+
+
+def create_pypi_snapshot(snapshot_path, package_names, include_cached=True):
+    """
+    Fetches the metadata of the packages from PyPI and writes it into a snapshot file.
+    With include_cached, all packages of the local metadata cache are exported as well.
+    Returns the number of exported packages.
+    """
+    client = PyPIClient()
+    package_names = set(package_names)
+    if include_cached:
+        package_names.update(
+            file_name[:-len('.json')] for file_name in os.listdir(client.cache_dir)
+            if file_name.endswith('.json') and not file_name.endswith('.index.json')
+        )
+    client.prefetch(package_names)
+    projects = {name: client.get_project(name) for name in package_names}
+    write_snapshot(snapshot_path, projects)
+    return sum(project is not None for project in projects.values())
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from typing import Optional, Mapping
+
+from dev_gpt.constants import OPENAI_RATE_LIMITS, RATE_LIMIT_BACKOFF_BASE_SECONDS, RATE_LIMIT_BACKOFF_MAX_SECONDS
+
+
+class _TokenBucket:
+    """Bucket which refills continuously so that `capacity` units are available per minute."""
+    def __init__(self, capacity_per_minute: float):
+        self.capacity = capacity_per_minute
+        self.level = capacity_per_minute
+        self.last_refill = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.last_refill) * self.capacity / 60)
+        self.last_refill = now
+
+    def seconds_until_available(self, amount: float) -> float:
+        # a single request which is larger than the whole bucket must still be possible
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0
+        return (amount - self.level) * 60 / self.capacity
+
+    def set_capacity(self, capacity_per_minute: float):
+        self.capacity = capacity_per_minute
+        self.level = min(self.level, capacity_per_minute)
+
+
+class RateLimiter:
+    """
+    Limits the requests and the estimated tokens sent to the OpenAI API per minute.
+    One limiter per model is shared by all conversations of the process (see get_rate_limiter).
+    The limits start with the defaults from OPENAI_RATE_LIMITS and are updated from the x-ratelimit-* headers
+    of every response of OpenAI (see update_rate_limits_from_response).
+    """
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self._lock = threading.Lock()
+        self._request_bucket = _TokenBucket(requests_per_minute)
+        self._token_bucket = _TokenBucket(tokens_per_minute)
+        self._blocked_until = 0
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        """Takes a request and the estimated tokens from the buckets or returns the seconds to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            self._request_bucket.refill(now)
+            self._token_bucket.refill(now)
+            wait_seconds = max(
+                self._blocked_until - now,
+                self._request_bucket.seconds_until_available(1),
+                self._token_bucket.seconds_until_available(estimated_tokens),
+            )
+            if wait_seconds <= 0:
+                self._request_bucket.level -= 1
+                self._token_bucket.level -= min(estimated_tokens, self._token_bucket.capacity)
+            return wait_seconds
+
+    def acquire(self, estimated_tokens: int = 0):
+        while True:
+            wait_seconds = self._reserve(estimated_tokens)
+            if wait_seconds <= 0:
+                return
+            time.sleep(wait_seconds)
+
+    async def acquire_async(self, estimated_tokens: int = 0):
+        while True:
+            wait_seconds = self._reserve(estimated_tokens)
+            if wait_seconds <= 0:
+                return
+            await asyncio.sleep(wait_seconds)
+
+    def update_from_headers(self, headers: Optional[Mapping[str, str]]):
+        """Adopts the limits reported by OpenAI, e.g. x-ratelimit-limit-tokens: 40000, x-ratelimit-remaining-tokens: 39000."""
+        if not headers:
+            return
+        headers = {k.lower(): v for k, v in headers.items()}
+        with self._lock:
+            now = time.monotonic()
+            for name, bucket in [('requests', self._request_bucket), ('tokens', self._token_bucket)]:
+                bucket.refill(now)
+                limit = _parse_number(headers.get(f'x-ratelimit-limit-{name}'))
+                if limit:
+                    bucket.set_capacity(limit)
+                remaining = _parse_number(headers.get(f'x-ratelimit-remaining-{name}'))
+                if remaining is not None:
+                    bucket.level = min(bucket.level, remaining)
+
+    def get_backoff_seconds(self, attempt: int, error: Exception = None) -> float:
+        """
+        Returns how long to wait before retrying a failed request.
+        If OpenAI tells us when to retry (Retry-After or x-ratelimit-reset-*), the hint is used and all
+        other requests of the process are held back until then as well.
+        Otherwise, exponential backoff with jitter is used.
+        """
+        headers = getattr(error, 'headers', None)
+        self.update_from_headers(headers)
+        retry_after = get_retry_after_seconds(headers)
+        if retry_after is not None:
+            with self._lock:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            return retry_after
+        max_backoff = min(RATE_LIMIT_BACKOFF_MAX_SECONDS, RATE_LIMIT_BACKOFF_BASE_SECONDS * 2 ** attempt)
+        return max_backoff / 2 + random.uniform(0, max_backoff / 2)
+
+
+def _parse_number(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parses durations like '20ms', '1s', '6m0s' or '1h2m3.5s' as used by the x-ratelimit-reset-* headers."""
+    if not value:
+        return None
+    matches = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value)
+    if not matches or ''.join(number + unit for number, unit in matches) != value.strip():
+        return _parse_number(value)
+    factors = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+    return sum(float(number) * factors[unit] for number, unit in matches)
+
+
+def get_retry_after_seconds(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    if not headers:
+        return None
+    headers = {k.lower(): v for k, v in headers.items()}
+    retry_after_ms = _parse_number(headers.get('retry-after-ms'))
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000
+    retry_after = _parse_number(headers.get('retry-after'))
+    if retry_after is not None:
+        return retry_after
+    resets = [
+        parse_duration(headers.get(f'x-ratelimit-reset-{name}'))
+        for name in ['requests', 'tokens']
+        if _parse_number(headers.get(f'x-ratelimit-remaining-{name}')) == 0
+    ]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model: str) -> RateLimiter:
+    """Returns the rate limiter of the model which is shared across the whole process."""
+    with _rate_limiters_lock:
+        if model not in _rate_limiters:
+            requests_per_minute, tokens_per_minute = OPENAI_RATE_LIMITS.get(model, OPENAI_RATE_LIMITS['gpt-4'])
+            _rate_limiters[model] = RateLimiter(requests_per_minute, tokens_per_minute)
+        return _rate_limiters[model]
+
+
+def update_rate_limits_from_response(response, *args, **kwargs):
+    """
+    requests response hook which passes the x-ratelimit-* headers of successful and failed responses
+    to the rate limiter of the requested model. Responses of other requests than completions are ignored.
+    """
+    try:
+        model = json.loads(response.request.body)['model']
+    except (TypeError, ValueError, KeyError):
+        return
+    get_rate_limiter(model).update_from_headers(response.headers)
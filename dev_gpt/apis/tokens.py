@@ -0,0 +1,57 @@
+import functools
+import math
+from typing import List
+
+from langchain.schema import BaseMessage
+
+from dev_gpt.constants import CHARS_PER_TOKEN
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+ROLE_NAMES = {'human': 'user', 'ai': 'assistant', 'system': 'system'}
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    """
+    Returns the BPE encoding of the model or None if tiktoken is not available.
+    In that case, token counts fall back to an estimation based on CHARS_PER_TOKEN.
+    """
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('cl100k_base')
+    except Exception:  # the encoding is downloaded on first use which fails without internet access
+        return None
+
+
+def is_exact_token_counting_available(model: str) -> bool:
+    return _get_encoding(model) is not None
+
+
+@functools.lru_cache(maxsize=4096)  # the same history is counted again for every turn of a conversation
+def count_tokens(text: str, model: str) -> int:
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: List[BaseMessage], model: str) -> int:
+    """
+    Counts the prompt tokens of a chat completion request.
+    Follows https://github.com/openai/openai-cookbook/blob/main/examples/How_to_count_tokens_with_tiktoken.ipynb
+    """
+    tokens_per_message = 4 if model == 'gpt-3.5-turbo-0301' else 3
+    num_tokens = 3  # every reply is primed with <|start|>assistant<|message|>
+    for message in messages:
+        num_tokens += tokens_per_message
+        num_tokens += count_tokens(ROLE_NAMES.get(message.type, message.type), model)
+        num_tokens += count_tokens(message.content, model)
+    return num_tokens
@@ -1,11 +1,13 @@
 from dev_gpt import env  # noqa: F401 to make sure certain environment variables are set
 import functools
 import os
+import re
 
 import click
 
 from dev_gpt.apis.gpt import configure_openai_api_key
 from dev_gpt.apis.jina_cloud import jina_auth_login
+from dev_gpt.constants import CHECKPOINT_FILE_NAME, PYPI_RELEASE_DATE_CUTOFF
 from dev_gpt.options.configure.key_handling import set_api_key
 from dev_gpt.options.generate.conversation_logger import Timer
 
@@ -56,25 +58,79 @@ def main(ctx):
 @click.option('--description', required=False, help='Description of the microservice.')
 @click.option('--model', default='gpt-4', help='GPT model to use (default: gpt-4).')
 @click.option('--verbose', default=False, is_flag=True, help='Verbose mode.')   # only for development
+@click.option('--no-llm-cache', default=False, is_flag=True, help='Do not reuse cached responses of previous runs for identical prompts.')
+@click.option('--llm-cache-dir', default=None, help='Directory of the LLM response cache (default: ~/.cache/dev-gpt/llm).')
+@click.option('--max-tokens-budget', default=None, type=int, help='Abort the generation before it uses more tokens than this.')
+@click.option('--max-cost', default=None, type=float, help='Abort the generation before it costs more than this amount of USD.')
+@click.option('--parallel-approaches', default=1, type=int, help='Number of implementation approaches which are tried at the same time (default: 1).')
+@click.option('--local-build', default=False, is_flag=True, help='Build and test the microservice locally (docker or virtualenv) and only push it once the tests pass.')
+@click.option('--resume', default=False, is_flag=True, help='Continue an interrupted generation in --path from its last checkpoint.')
+@click.option('--no-fix-knowledge-base', default=False, is_flag=True, help='Do not reuse fixes of dependency errors from previous runs.')
+@click.option('--no-patch-mode', default=False, is_flag=True, help='Let GPT rewrite the complete files in each debugging iteration instead of patching them.')
+@click.option('--pypi-snapshot', default=None, envvar='DEV_GPT_PYPI_SNAPSHOT', help='Answer all PyPI lookups from this snapshot file instead of pypi.org (see dev-gpt pypi-snapshot).')
+@click.option('--pypi-cutoff', default=PYPI_RELEASE_DATE_CUTOFF, type=click.DateTime(formats=['%Y-%m-%d']), envvar='DEV_GPT_PYPI_CUTOFF', help=f'Only use package versions released before this date in requirements.txt (default: {PYPI_RELEASE_DATE_CUTOFF}).')
 @path_param
 def generate(
         description,
         model,
         verbose,
+        no_llm_cache,
+        llm_cache_dir,
+        max_tokens_budget,
+        max_cost,
+        parallel_approaches,
+        local_build,
+        resume,
+        no_fix_knowledge_base,
+        no_patch_mode,
+        pypi_snapshot,
+        pypi_cutoff,
         path,
 ):
     os.environ['VERBOSE'] = str(verbose)
     path = os.path.expanduser(path)
     path = os.path.abspath(path)
-    if os.path.exists(path):
+    if resume:
+        if not os.path.exists(os.path.join(path, CHECKPOINT_FILE_NAME)):
+            click.echo(f"Error: The path {path} you provided via --path does not contain a generation that can be resumed.")
+            return
+    elif os.path.exists(path):
         if os.listdir(path):
-            click.echo(f"Error: The path {path} you provided via --path is not empty. Please choose a directory that does not exist or is empty.")
+            click.echo(f"Error: The path {path} you provided via --path is not empty. Please choose a directory that does not exist or is empty or use --resume to continue an interrupted generation.")
             return
 
+    if pypi_snapshot:
+        from dev_gpt.apis.pypi import use_pypi_snapshot
+        use_pypi_snapshot(os.path.abspath(os.path.expanduser(pypi_snapshot)))
+
     from dev_gpt.options.generate.generator import Generator
-    generator = Generator(description, path=path, model=model)
+    generator = Generator(
+        description, path=path, model=model, llm_cache=not no_llm_cache, llm_cache_dir=llm_cache_dir,
+        max_tokens_budget=max_tokens_budget, max_cost=max_cost, parallel_approaches=parallel_approaches,
+        local_build=local_build, resume=resume, fix_knowledge_base=not no_fix_knowledge_base,
+        patch_mode=not no_patch_mode, pypi_cutoff=pypi_cutoff.strftime('%Y-%m-%d')
+    )
     generator.generate()
 
+@main.command()
+@click.option('--output', required=True, help='Path of the snapshot file.')
+@click.option('--packages-file', default=None, help='File with one package per line, e.g. a requirements.txt.')
+@click.option('--no-cached', default=False, is_flag=True, help='Do not export the packages which are in the local PyPI metadata cache.')
+@click.argument('packages', nargs=-1)
+def pypi_snapshot(output, packages_file, no_cached, packages):
+    """Export the PyPI metadata of packages into a snapshot file for generations without internet access."""
+    from dev_gpt.apis.pypi_snapshot import create_pypi_snapshot
+    package_names = list(packages)
+    if packages_file:
+        with open(packages_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = re.sub(r'#.*', '', line).strip()
+                if line:
+                    package_names.append(re.split(r'==|>=|<=|>|<|~=|\[|;', line)[0].strip())
+    output = os.path.abspath(os.path.expanduser(output))
+    num_packages = create_pypi_snapshot(output, package_names, include_cached=not no_cached)
+    click.echo(f'Exported {num_packages} packages to {output}')
+
 @openai_api_key_needed
 @main.command()
 @path_param
@@ -26,11 +26,40 @@ FILE_AND_TAG_PAIRS = [
     (STREAMLIT_FILE_NAME, STREAMLIT_FILE_TAG)
 ]
 
-INDICATOR_TO_IMPORT_STATEMENT = {
+# names which are commonly used in generated code without importing them
+# stdlib modules and packages of the import name index are resolved without an entry here
+SYMBOL_TO_IMPORT_STATEMENT = {
     'io.BytesIO': 'import io',
-    'BeautifulSoup': 'from bs4 import BeautifulSoup',
-    'BytesIO': 'from io import BytesIO',
     'base64': 'import base64',
+    'BytesIO': 'from io import BytesIO',
+    'StringIO': 'from io import StringIO',
+    'Path': 'from pathlib import Path',
+    'datetime': 'from datetime import datetime',
+    'timedelta': 'from datetime import timedelta',
+    'dataclass': 'from dataclasses import dataclass',
+    'defaultdict': 'from collections import defaultdict',
+    'Counter': 'from collections import Counter',
+    'OrderedDict': 'from collections import OrderedDict',
+    'namedtuple': 'from collections import namedtuple',
+    'deque': 'from collections import deque',
+    'Any': 'from typing import Any',
+    'Dict': 'from typing import Dict',
+    'List': 'from typing import List',
+    'Optional': 'from typing import Optional',
+    'Tuple': 'from typing import Tuple',
+    'Union': 'from typing import Union',
+    'BeautifulSoup': 'from bs4 import BeautifulSoup',
+    'Image': 'from PIL import Image',
+    'np': 'import numpy as np',
+    'pd': 'import pandas as pd',
+    'plt': 'import matplotlib.pyplot as plt',
+    'st': 'import streamlit as st',
+    'Client': 'from jina import Client',
+    'Document': 'from docarray import Document',
+    'DocumentArray': 'from docarray import DocumentArray',
+    'GPT_3_5_Turbo': 'from .gpt_3_5_turbo import GPT_3_5_Turbo',
+    'search_web': 'from .google_custom_search import search_web',
+    'search_images': 'from .google_custom_search import search_images',
 }
 
 FLOW_URL_PLACEHOLDER = 'jcloud.jina.ai'
@@ -42,6 +71,53 @@ PRICING_GPT3_5_TURBO_GENERATION = 0.002
 
 CHARS_PER_TOKEN = 3.4
 
+LLM_CACHE_MAX_SIZE_BYTES = 500 * 1024 * 1024
+MAX_CONCURRENT_LLM_REQUESTS = 4
+
+# (requests per minute, tokens per minute) until OpenAI reports the actual limits of the account
+OPENAI_RATE_LIMITS = {
+    'gpt-4': (200, 40_000),
+    'gpt-3.5-turbo': (3_500, 90_000),
+}
+MODEL_CONTEXT_WINDOWS = {
+    'gpt-4': 8192,
+    'gpt-4-32k': 32768,
+    'gpt-3.5-turbo': 4096,
+    'gpt-3.5-turbo-16k': 16384,
+}
+# the rest of the context window is left for the completion
+CONTEXT_WINDOW_USAGE_FRACTION = 0.75
+MAX_CODE_BLOCK_TOKENS_IN_HISTORY = 600
+
+RATE_LIMIT_BACKOFF_BASE_SECONDS = 1
+RATE_LIMIT_BACKOFF_MAX_SECONDS = 60
+
+LOCAL_BUILD_TIMEOUT_SECONDS = 30 * 60
+
+# hidden, so that it is ignored when the generated microservice folder is read
+CHECKPOINT_FILE_NAME = '.checkpoint.json'
+
+HUBBLE_API_URL = 'https://api.hubble.jina.ai'
+PYPI_URL = 'https://pypi.org'
+PYPI_MAX_CONCURRENT_REQUESTS = 8
+PYPI_REQUEST_TIMEOUT_SECONDS = 30
+# rate limits and server errors are retried, all other errors except 404 are raised
+PYPI_MAX_RETRIES = 3
+PYPI_RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# only versions released before the knowledge cutoff of the model (2021-09) are used in requirements.txt
+PYPI_RELEASE_DATE_CUTOFF = '2021-10-01'
+
+LOG_FSYNC_EVERY_N_ENTRIES = 20
+LOG_FSYNC_INTERVAL_SECONDS = 5
+
+# (similar, different) thresholds of the TF-IDF cosine similarity to the previous errors and solutions
+# scores in between are borderline and decided by the LLM
+ERROR_SIMILARITY_THRESHOLDS = (0.75, 0.35)
+SOLUTION_SIMILARITY_THRESHOLDS = (0.8, 0.4)
+
+# how similar the lines of a search/replace block must be to the lines of the file if they do not match exactly
+PATCH_FUZZY_MATCH_THRESHOLD = 0.85
+
 NUM_IMPLEMENTATION_STRATEGIES = 5
 MAX_DEBUGGING_ITERATIONS = 10
 
@@ -1,6 +1,8 @@
 import os
+import re
 
 from dev_gpt.constants import REQUIREMENTS_FILE_NAME, DOCKER_FILE_NAME, IMPLEMENTATION_FILE_NAME, TEST_EXECUTOR_FILE_NAME
+from dev_gpt.utils.version_store import get_latest_version_from_store
 
 
 def list_dirs_no_hidden(path):
@@ -25,12 +27,27 @@ def version_max_fn(path_list):
     return path_list[max_index]
 
 def get_latest_version_path(microservice_path):
+    latest_version_path = get_latest_version_from_store(microservice_path)
+    if latest_version_path is not None:
+        return latest_version_path
+    # microservices which were generated before the version store existed
     executor_name_path = get_latest_folder(microservice_path)
     latest_approach_path = get_latest_folder(executor_name_path)
     latest_version_path = get_latest_folder(latest_approach_path, max_fn=version_max_fn)
     return latest_version_path
 
 def get_executor_name(microservice_path):
+    latest_version_path = get_latest_version_from_store(microservice_path)
+    if latest_version_path is not None:
+        # parallel approaches push their executors under their own names, which are only recorded in config.yml
+        try:
+            with open(os.path.join(latest_version_path, 'config.yml'), 'r', encoding='utf-8') as f:
+                match = re.search(r'^jtype: (\S+)$', f.read(), re.MULTILINE)
+            if match:
+                return match.group(1)
+        except OSError:
+            pass
+        return os.path.relpath(latest_version_path, microservice_path).split(os.sep)[0]
     latest_folder = get_latest_folder(microservice_path)
     return os.path.split(latest_folder)[-1]
 
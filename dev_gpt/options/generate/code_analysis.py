@@ -0,0 +1,234 @@
+import ast
+import builtins
+import importlib
+
+from dev_gpt.apis.import_names import get_import_name_index, get_stdlib_module_names
+from dev_gpt.constants import SYMBOL_TO_IMPORT_STATEMENT
+
+MODULE_ATTRIBUTES = {'__file__', '__name__', '__doc__', '__spec__', '__loader__', '__package__', '__builtins__',
+                     '__annotations__', '__path__'}
+
+
+class UnboundName:
+    def __init__(self, name):
+        self.name = name
+        self.line_numbers = []
+        # attributes which are accessed on the name, e.g. now for datetime.now()
+        self.attributes = set()
+
+
+class _Scope:
+    def __init__(self, parent, kind='module'):
+        self.parent = parent
+        self.kind = kind
+        self.bindings = set()
+
+
+class _NameCollector(ast.NodeVisitor):
+    """
+    Collects the bindings of all scopes and the names which are loaded.
+    Like in Python, a name is bound in a scope if it is assigned anywhere in that scope, the order does not matter.
+    """
+    def __init__(self):
+        self.module_scope = _Scope(None)
+        self.scope = self.module_scope
+        self.loads = []
+        self.attributes = {}
+        self.has_star_import = False
+
+    def bind(self, name):
+        self.scope.bindings.add(name)
+
+    def visit_in_new_scope(self, nodes, kind, bindings=()):
+        self.scope = _Scope(self.scope, kind)
+        self.scope.bindings.update(bindings)
+        for node in nodes:
+            self.visit(node)
+        self.scope = self.scope.parent
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.loads.append((self.scope, node))
+        else:
+            self.bind(node.id)
+
+    def visit_Attribute(self, node):
+        if isinstance(node.value, ast.Name):
+            self.attributes.setdefault(id(node.value), set()).add(node.attr)
+        self.generic_visit(node)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.bind(alias.asname or alias.name.split('.')[0])
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            if alias.name == '*':
+                self.has_star_import = True
+            else:
+                self.bind(alias.asname or alias.name)
+
+    def visit_Global(self, node):
+        for name in node.names:
+            self.bind(name)
+            self.module_scope.bindings.add(name)
+
+    visit_Nonlocal = visit_Global
+
+    def visit_ExceptHandler(self, node):
+        if node.name:
+            self.bind(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchAs(self, node):
+        if node.name:
+            self.bind(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchStar(self, node):
+        if node.name:
+            self.bind(node.name)
+
+    def visit_MatchMapping(self, node):
+        if node.rest:
+            self.bind(node.rest)
+        self.generic_visit(node)
+
+    def _get_arguments(self, arguments):
+        all_args = arguments.posonlyargs + arguments.args + arguments.kwonlyargs
+        all_args += [arg for arg in [arguments.vararg, arguments.kwarg] if arg is not None]
+        return all_args
+
+    def visit_FunctionDef(self, node):
+        self.bind(node.name)
+        # decorators, defaults and annotations are evaluated in the enclosing scope
+        for child in node.decorator_list + node.args.defaults + [d for d in node.args.kw_defaults if d is not None]:
+            self.visit(child)
+        for arg in self._get_arguments(node.args):
+            if arg.annotation is not None:
+                self.visit(arg.annotation)
+        if node.returns is not None:
+            self.visit(node.returns)
+        self.visit_in_new_scope(node.body, 'function', [arg.arg for arg in self._get_arguments(node.args)] + ['__class__'])
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        for child in node.args.defaults + [d for d in node.args.kw_defaults if d is not None]:
+            self.visit(child)
+        self.visit_in_new_scope([node.body], 'function', [arg.arg for arg in self._get_arguments(node.args)])
+
+    def visit_ClassDef(self, node):
+        self.bind(node.name)
+        for child in node.decorator_list + node.bases + node.keywords:
+            self.visit(child)
+        self.visit_in_new_scope(node.body, 'class')
+
+    def visit_comprehension_node(self, node):
+        elements = [node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]
+        self.visit_in_new_scope(node.generators + elements, 'comprehension')
+
+    visit_ListComp = visit_SetComp = visit_GeneratorExp = visit_DictComp = visit_comprehension_node
+
+    def visit_NamedExpr(self, node):
+        # the target of := inside a comprehension is bound in the enclosing function or module
+        scope = self.scope
+        while scope.kind == 'comprehension':
+            scope = scope.parent
+        scope.bindings.add(node.target.id)
+        self.visit(node.value)
+
+
+def _is_bound(scope, name):
+    use_scope = scope
+    while scope is not None:
+        # class bodies are not visible from the functions and comprehensions inside them
+        if (scope is use_scope or scope.kind != 'class') and name in scope.bindings:
+            return True
+        scope = scope.parent
+    return False
+
+
+def get_unbound_names(code):
+    """
+    Returns the names which are used in the code, but neither defined in it nor builtins, sorted by name.
+    Like pyflakes, no names are reported for code with syntax errors or with star imports.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    collector = _NameCollector()
+    collector.visit(tree)
+    if collector.has_star_import:
+        return []
+    unbound_names = {}
+    for scope, node in collector.loads:
+        if hasattr(builtins, node.id) or node.id in MODULE_ATTRIBUTES or _is_bound(scope, node.id):
+            continue
+        unbound_name = unbound_names.setdefault(node.id, UnboundName(node.id))
+        unbound_name.line_numbers.append(node.lineno)
+        unbound_name.attributes.update(collector.attributes.get(id(node), set()))
+    return [unbound_names[name] for name in sorted(unbound_names)]
+
+
+def _is_stdlib_module(name):
+    return name in get_stdlib_module_names() and not name.startswith('_')
+
+
+def _has_attributes(module_name, attributes):
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError:
+        return False
+    return all(hasattr(module, attribute) for attribute in attributes)
+
+
+def get_import_statement(unbound_name):
+    """
+    Returns the import statement which binds the name or None if it is unknown.
+    For names which are a module and a symbol (e.g. datetime), the accessed attributes decide.
+    """
+    name = unbound_name.name
+    if name in SYMBOL_TO_IMPORT_STATEMENT:
+        if _is_stdlib_module(name) and unbound_name.attributes and _has_attributes(name, unbound_name.attributes):
+            return f'import {name}'
+        return SYMBOL_TO_IMPORT_STATEMENT[name]
+    for attribute in sorted(unbound_name.attributes):
+        # e.g. io.BytesIO
+        if f'{name}.{attribute}' in SYMBOL_TO_IMPORT_STATEMENT:
+            return SYMBOL_TO_IMPORT_STATEMENT[f'{name}.{attribute}']
+    if _is_stdlib_module(name) or name in get_import_name_index():
+        return f'import {name}'
+    return None
+
+
+def _get_import_insert_line(tree):
+    """Returns the index of the line before which the imports are inserted: after the module docstring and __future__ imports."""
+    for i, node in enumerate(tree.body):
+        is_docstring = i == 0 and isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) \
+            and isinstance(node.value.value, str)
+        is_future_import = isinstance(node, ast.ImportFrom) and node.module == '__future__'
+        if not is_docstring and not is_future_import:
+            # the line of a decorated function or class is the line of the def, not of the first decorator
+            decorators = getattr(node, 'decorator_list', [])
+            return (decorators[0].lineno if decorators else node.lineno) - 1
+    return tree.body[-1].end_lineno if tree.body else 0
+
+
+def add_missing_imports(code):
+    """
+    Adds the imports for all unbound names which can be resolved against the stdlib and the known packages.
+    The imports are sorted and inserted after the module docstring and __future__ imports, before the first statement,
+    so that the result only depends on the code.
+    """
+    import_statements = sorted({
+        import_statement for import_statement in map(get_import_statement, get_unbound_names(code))
+        if import_statement is not None
+    })
+    if not import_statements:
+        return code
+    tree = ast.parse(code)
+    lines = code.split('\n')
+    insert_line = _get_import_insert_line(tree)
+    return '\n'.join(lines[:insert_line] + import_statements + lines[insert_line:])
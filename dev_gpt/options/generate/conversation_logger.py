@@ -1,15 +1,51 @@
+import atexit
+import hashlib
 import json
+import os
+import textwrap
+import threading
+import time
 from typing import List
 
 from langchain.schema import BaseMessage
 
+from dev_gpt.constants import LOG_FSYNC_EVERY_N_ENTRIES, LOG_FSYNC_INTERVAL_SECONDS
+
+
+def _get_prefix_hash(parent_hash, message_json):
+    return hashlib.sha256(
+        f'{parent_hash}{json.dumps(message_json, sort_keys=True)}'.encode('utf-8')
+    ).hexdigest()[:16]
+
 
 class ConversationLogger:
+    """
+    Appends one compact JSON line per request to a JSONL log.
+    Conversations resend their whole history with every request. Therefore, each line only contains the messages
+    which are not part of an already logged prefix and refers to that prefix by its hash:
+    {"parent": "<hash of the known prefix or null>", "messages": [...new messages], "response": "..."}
+    The file is flushed after every line and synced to disk in batches.
+    Use write_legacy_log to get the complete prompts as in the former log.json.
+    """
     def __init__(self, log_file_path):
         self.log_file_path = log_file_path
-        self.log_file = []
+        self._known_prefix_hashes = set()
+        if os.path.exists(log_file_path):
+            # a resumed generation continues the existing log
+            for entry in read_log(log_file_path):
+                self._known_prefix_hashes.update(entry['prefix_hashes'])
+        self._lock = threading.Lock()
+        self._file = None
+        self._entries_since_sync = 0
+        self._last_sync = time.monotonic()
+        atexit.register(self.close)
 
     def log(self, prompt_message_list: List[BaseMessage], response: str):
+        # conversations can run concurrently, the lock keeps the entries and the file consistent
+        with self._lock:
+            self._log(prompt_message_list, response)
+
+    def _log(self, prompt_message_list: List[BaseMessage], response: str):
         prompt_list_json = [
             {
                 'role': f'{message.type}',
@@ -17,12 +53,100 @@ class ConversationLogger:
             }
             for message in prompt_message_list
         ]
-        self.log_file.append({
-            'prompt': prompt_list_json,
+        parent_hash = None
+        num_known_messages = 0
+        prefix_hash = None
+        for i, message_json in enumerate(prompt_list_json):
+            prefix_hash = _get_prefix_hash(prefix_hash, message_json)
+            if prefix_hash in self._known_prefix_hashes:
+                parent_hash = prefix_hash
+                num_known_messages = i + 1
+            else:
+                self._known_prefix_hashes.add(prefix_hash)
+        line = json.dumps({
+            'parent': parent_hash,
+            'messages': prompt_list_json[num_known_messages:],
             'response': f'{response}'
-        })
-        with open(self.log_file_path, 'w') as f:
-            f.write(json.dumps(self.log_file, indent=2))
+        }, separators=(',', ':'))
+        if self._file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.log_file_path)), exist_ok=True)
+            self._file = open(self.log_file_path, 'a', encoding='utf-8')
+        self._file.write(line + '\n')
+        self._file.flush()
+        self._entries_since_sync += 1
+        if self._entries_since_sync >= LOG_FSYNC_EVERY_N_ENTRIES \
+                or time.monotonic() - self._last_sync >= LOG_FSYNC_INTERVAL_SECONDS:
+            self._sync()
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._entries_since_sync = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def write_legacy_log(self, legacy_log_file_path=None):
+        """Writes the log in the former log.json format next to the JSONL log."""
+        if legacy_log_file_path is None:
+            legacy_log_file_path = os.path.splitext(self.log_file_path)[0] + '.json'
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+        convert_to_legacy_log(self.log_file_path, legacy_log_file_path)
+
+
+def read_log(log_file_path):
+    """
+    Yields the entries of a JSONL conversation log with their complete prompts.
+    Corrupt lines are skipped, together with the entries which continue the conversation of a skipped line.
+    """
+    prefix_to_parent_and_message = {}
+    with open(log_file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # the last line can be incomplete if the process was killed while writing it
+                continue
+            prefix_hash = entry['parent']
+            if prefix_hash is not None and prefix_hash not in prefix_to_parent_and_message:
+                # the prefix was logged in a skipped line, the prompt of this entry and its descendants is incomplete
+                continue
+            prefix_hashes = []
+            for message_json in entry['messages']:
+                new_prefix_hash = _get_prefix_hash(prefix_hash, message_json)
+                prefix_to_parent_and_message[new_prefix_hash] = (prefix_hash, message_json)
+                prefix_hashes.append(new_prefix_hash)
+                prefix_hash = new_prefix_hash
+            prompt = []
+            while prefix_hash is not None:
+                prefix_hash, message_json = prefix_to_parent_and_message[prefix_hash]
+                prompt.append(message_json)
+            prompt.reverse()
+            yield {'prompt': prompt, 'response': entry['response'], 'prefix_hashes': prefix_hashes}
+
+
+def convert_to_legacy_log(log_file_path, legacy_log_file_path):
+    """Converts a JSONL conversation log into the former log.json format which contains a list of all prompts and responses."""
+    tmp_path = f'{legacy_log_file_path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        # the entries are written one by one, the result is the same as json.dumps(entries, indent=2)
+        is_first = True
+        for entry in read_log(log_file_path):
+            f.write('[\n' if is_first else ',\n')
+            is_first = False
+            f.write(textwrap.indent(
+                json.dumps({'prompt': entry['prompt'], 'response': entry['response']}, indent=2), '  '
+            ))
+        f.write('[]' if is_first else '\n]')
+    os.replace(tmp_path, legacy_log_file_path)
 
 
 import datetime
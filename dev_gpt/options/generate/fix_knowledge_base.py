@@ -0,0 +1,166 @@
+import difflib
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from dev_gpt.apis.pypi import canonicalize_name
+from dev_gpt.constants import DOCKER_FILE_NAME, REQUIREMENTS_FILE_NAME, IMPLEMENTATION_FILE_NAME, \
+    TEST_EXECUTOR_FILE_NAME
+from dev_gpt.options.generate.similarity import normalize_text
+from dev_gpt.utils.io import get_cache_dir, persist_file
+
+# lines of a build log which name the error, e.g. "ModuleNotFoundError: No module named 'cv2'" or "E: Unable to locate package x"
+ERROR_LINE_PATTERN = re.compile(r'\w*(Error|Exception)\b|^E: |^ERROR: |^error: ', re.IGNORECASE)
+APT_GET_INSTALL_PATTERN = re.compile(r'^(RUN apt-get install --no-install-recommends -y)(.*)$', re.MULTILINE)
+REQUIREMENT_NAME_PATTERN = re.compile(r'==|>=|<=|>|<|~=|!=|\[|;|\s')
+
+
+def get_error_fingerprint(error):
+    """
+    Returns a hash of the lines which name the error, normalized so that the same error in another
+    microservice, e.g. with other paths, line numbers or versions, has the same fingerprint.
+    """
+    lines = [line.strip() for line in error.split('\n') if line.strip()]
+    error_lines = [line for line in lines if ERROR_LINE_PATTERN.search(line)] or lines[-3:]
+    normalized_lines = sorted({' '.join(normalize_text(line).replace('"', "'").split()) for line in error_lines})
+    return hashlib.sha256('\n'.join(normalized_lines).encode('utf-8')).hexdigest()[:32]
+
+
+def _read(path):
+    if not os.path.exists(path):
+        return ''
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _get_apt_get_packages(dockerfile):
+    match = APT_GET_INSTALL_PATTERN.search(dockerfile)
+    return match.group(2).split() if match else []
+
+
+def _get_requirement_name(line):
+    return canonicalize_name(REQUIREMENT_NAME_PATTERN.split(line.strip())[0])
+
+
+def get_dependency_diff(previous_microservice_path, microservice_path):
+    """
+    Returns the changes of the apt-get packages and requirements between two versions of a microservice
+    or None if the code changed as well or nothing changed.
+    Fixes of the code are specific to the microservice, only fixes of the dependencies are worth remembering.
+    """
+    for file_name in [IMPLEMENTATION_FILE_NAME, TEST_EXECUTOR_FILE_NAME]:
+        if _read(os.path.join(previous_microservice_path, file_name)) != _read(os.path.join(microservice_path, file_name)):
+            return None
+    previous_packages = _get_apt_get_packages(_read(os.path.join(previous_microservice_path, DOCKER_FILE_NAME)))
+    packages = _get_apt_get_packages(_read(os.path.join(microservice_path, DOCKER_FILE_NAME)))
+    previous_requirements = _read(os.path.join(previous_microservice_path, REQUIREMENTS_FILE_NAME)).split('\n')
+    requirements = _read(os.path.join(microservice_path, REQUIREMENTS_FILE_NAME)).split('\n')
+    diff = {
+        'apt_get_packages': [package for package in packages if package not in previous_packages],
+        'added_requirements': [],
+        'removed_requirements': [],
+    }
+    for line in difflib.ndiff(previous_requirements, requirements):
+        requirement = line[2:].strip()
+        if not requirement or requirement.startswith('#'):
+            continue
+        if line.startswith('+ '):
+            diff['added_requirements'].append(requirement)
+        elif line.startswith('- '):
+            diff['removed_requirements'].append(_get_requirement_name(requirement))
+    added_names = {_get_requirement_name(requirement) for requirement in diff['added_requirements']}
+    # a changed version is a replacement, not a removal
+    diff['removed_requirements'] = [name for name in diff['removed_requirements'] if name not in added_names]
+    if not any(diff.values()):
+        return None
+    return diff
+
+
+def apply_dependency_diff(diff, microservice_path):
+    dockerfile_path = os.path.join(microservice_path, DOCKER_FILE_NAME)
+    dockerfile = _read(dockerfile_path)
+    missing_packages = [package for package in diff['apt_get_packages'] if package not in _get_apt_get_packages(dockerfile)]
+    if missing_packages:
+        dockerfile = APT_GET_INSTALL_PATTERN.sub(
+            lambda match: ' '.join([match.group(1)] + match.group(2).split() + missing_packages), dockerfile, count=1
+        )
+        persist_file(dockerfile, dockerfile_path)
+
+    requirements_path = os.path.join(microservice_path, REQUIREMENTS_FILE_NAME)
+    requirements = [line for line in _read(requirements_path).split('\n') if line.strip()]
+    removed_names = set(diff['removed_requirements'])
+    requirements = [line for line in requirements if _get_requirement_name(line) not in removed_names]
+    for added_requirement in diff['added_requirements']:
+        name = _get_requirement_name(added_requirement)
+        positions = [i for i, line in enumerate(requirements) if _get_requirement_name(line) == name]
+        if positions:
+            requirements[positions[0]] = added_requirement
+        else:
+            requirements.append(added_requirement)
+    persist_file('\n'.join(requirements), requirements_path)
+
+
+class FixKnowledgeBase:
+    """
+    Remembers across runs which change of the dependencies resolved an error.
+    A fix is keyed by the fingerprint of the error and used as long as it succeeded more often than it failed.
+    Also counts how many errors of the current run were resolved from the knowledge base and the time this saved.
+    """
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(get_cache_dir(), 'fix_knowledge_base.sqlite')
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS fixes (
+                    fingerprint TEXT PRIMARY KEY,
+                    diff TEXT NOT NULL,
+                    seconds_to_find REAL NOT NULL,
+                    successes INTEGER NOT NULL DEFAULT 1,
+                    failures INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+        self.num_lookups = 0
+        self.num_hits = 0
+        self.seconds_saved = 0.0
+
+    def lookup(self, fingerprint):
+        """Returns the proven fix for the error or None."""
+        with self._lock:
+            self.num_lookups += 1
+            row = self._connection.execute(
+                'SELECT diff, seconds_to_find FROM fixes WHERE fingerprint = ? AND successes > failures',
+                (fingerprint,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.num_hits += 1
+            self.seconds_saved += row[1]
+            return json.loads(row[0])
+
+    def add_fix(self, fingerprint, diff, seconds_to_find):
+        with self._lock, self._connection:
+            self._connection.execute('''
+                INSERT INTO fixes (fingerprint, diff, seconds_to_find, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (fingerprint) DO UPDATE SET
+                    diff = excluded.diff, seconds_to_find = excluded.seconds_to_find,
+                    successes = 1, failures = 0, updated_at = excluded.updated_at
+            ''', (fingerprint, json.dumps(diff), seconds_to_find, time.time()))
+
+    def record_outcome(self, fingerprint, resolved):
+        column = 'successes' if resolved else 'failures'
+        with self._lock, self._connection:
+            self._connection.execute(
+                f'UPDATE fixes SET {column} = {column} + 1, updated_at = ? WHERE fingerprint = ?',
+                (time.time(), fingerprint)
+            )
+
+    def get_report(self):
+        hit_rate = self.num_hits / self.num_lookups if self.num_lookups else 0
+        return f'Fix knowledge base: {self.num_hits} of {self.num_lookups} errors resolved with proven fixes ' \
+               f'({hit_rate:.0%}), saved about {self.seconds_saved:.0f}s'
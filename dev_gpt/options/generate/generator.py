@@ -1,9 +1,13 @@
+import copy
 import json
 import os
+import queue
 import random
 import re
 import shutil
 import sys
+import threading
+import time
 from typing import Callable
 from typing import List, Text, Optional
 
@@ -13,19 +17,29 @@ from pydantic.dataclasses import dataclass
 
 from dev_gpt.apis import gpt
 from dev_gpt.apis.gpt import _GPTConversation, ask_gpt
+from dev_gpt.apis.import_names import reconcile_requirements_txt
+from dev_gpt.apis.local_build import build_locally
 from dev_gpt.apis.jina_cloud import process_error_message, push_executor, is_executor_in_hub
-from dev_gpt.apis.pypi import is_package_on_pypi, clean_requirements_txt
+from dev_gpt.apis.pypi import is_package_on_pypi, clean_requirements_txt, get_pypi_client
 from dev_gpt.constants import FILE_AND_TAG_PAIRS, NUM_IMPLEMENTATION_STRATEGIES, MAX_DEBUGGING_ITERATIONS, \
     BLACKLISTED_PACKAGES, EXECUTOR_FILE_NAME, TEST_EXECUTOR_FILE_NAME, TEST_EXECUTOR_FILE_TAG, \
     REQUIREMENTS_FILE_NAME, REQUIREMENTS_FILE_TAG, DOCKER_FILE_NAME, IMPLEMENTATION_FILE_NAME, \
     IMPLEMENTATION_FILE_TAG, LANGUAGE_PACKAGES, UNNECESSARY_PACKAGES, DOCKER_BASE_IMAGE_VERSION, SEARCH_PACKAGES, \
-    INDICATOR_TO_IMPORT_STATEMENT
+    CHECKPOINT_FILE_NAME, ERROR_SIMILARITY_THRESHOLDS, SOLUTION_SIMILARITY_THRESHOLDS, \
+    PYPI_RELEASE_DATE_CUTOFF
+from dev_gpt.options import list_dirs_no_hidden
+from dev_gpt.options.generate.code_analysis import add_missing_imports
 from dev_gpt.options.generate.conversation_logger import Timer
+from dev_gpt.options.generate.fix_knowledge_base import FixKnowledgeBase, get_error_fingerprint, \
+    get_dependency_diff, apply_dependency_diff
+from dev_gpt.options.generate.patching import PatchFailedException, parse_search_replace_blocks, apply_patches
 from dev_gpt.options.generate.parser import json_parser, self_healing_json_parser
 from dev_gpt.options.generate.pm.pm import PM
+from dev_gpt.options.generate.preflight import run_preflight_checks
+from dev_gpt.options.generate.similarity import SimilarityIndex
 from dev_gpt.options.generate.templates_user import template_generate_microservice_name, \
     template_generate_possible_packages, \
-    template_implement_solution_code_issue, \
+    template_implement_solution_code_issue, template_implement_solution_code_issue_patch, \
     template_solve_pip_dependency_issue, template_is_dependency_issue, template_generate_playground, \
     template_generate_function_constructor, template_generate_test, template_generate_requirements, \
     template_chain_of_thought, template_summarize_error, \
@@ -35,6 +49,7 @@ from dev_gpt.options.generate.templates_user import template_generate_microservi
     response_format_was_solution_tried_before, response_format_suggest_solutions
 from dev_gpt.utils.io import persist_file, get_all_microservice_files_with_content, get_microservice_path
 from dev_gpt.utils.string_tools import print_colored
+from dev_gpt.utils.version_store import VersionStore
 
 
 @dataclass
@@ -44,8 +59,15 @@ class TaskSpecification:
 
 
 class Generator:
-    def __init__(self, task_description, path, model='gpt-4', self_healing=True):
-        self.gpt_session = gpt.GPTSession(os.path.join(path, 'log.json'), model=model)
+    def __init__(
+            self, task_description, path, model='gpt-4', self_healing=True, llm_cache=True, llm_cache_dir=None,
+            max_tokens_budget=None, max_cost=None, parallel_approaches=1, local_build=False, resume=False,
+            fix_knowledge_base=True, patch_mode=True, pypi_cutoff=PYPI_RELEASE_DATE_CUTOFF
+    ):
+        self.gpt_session = gpt.GPTSession(
+            os.path.join(path, 'log.jsonl'), model=model, llm_cache=llm_cache, llm_cache_dir=llm_cache_dir,
+            max_tokens_budget=max_tokens_budget, max_cost=max_cost
+        )
         self.microservice_specification = TaskSpecification(task=task_description, test=None)
         self.self_healing = self_healing
         self.microservice_root_path = path
@@ -54,6 +76,22 @@ class Generator:
         self.cur_microservice_path = None
         self.previous_errors = []
         self.previous_solutions = []
+        self.parallel_approaches = parallel_approaches
+        self.local_build = local_build
+        self.patch_mode = patch_mode
+        self.pypi_cutoff = pypi_cutoff
+        self.cancel_event = None
+        # the name of the executor in the hub, only differs from the microservice name for parallel approaches
+        self.push_name = None
+        self.resume = resume
+        self.checkpoint_path = os.path.join(path, CHECKPOINT_FILE_NAME)
+        self.version_store = VersionStore(path)
+        self.stage = None
+        self.packages_list = None
+        self.num_approach = None
+        self.fix_knowledge_base = FixKnowledgeBase() if fix_knowledge_base else None
+        # (error fingerprint, seconds it took to fix, whether the fix is from the knowledge base) of the last debug iteration
+        self.last_fix = None
 
     @staticmethod
     def extract_content_from_result(plain_text, file_name, match_single_block=False, can_contain_code_block=True):
@@ -70,15 +108,14 @@ class Generator:
                 return single_code_block_match[0].strip()
         return ''
 
-    def write_config_yml(self, class_name, dest_folder, python_file=EXECUTOR_FILE_NAME):
+    def write_config_yml(self, class_name, dest_folder, python_file=EXECUTOR_FILE_NAME, with_args=''):
         config_content = f'''jtype: {class_name}
-py_modules:
+{with_args}py_modules:
   - {python_file}
 metas:
   name: {class_name}
 '''
-        with open(os.path.join(dest_folder, 'config.yml'), 'w', encoding='utf-8') as f:
-            f.write(config_content)
+        persist_file(config_content, os.path.join(dest_folder, 'config.yml'))
 
     def files_to_string(self, file_name_to_content, restrict_keys=None):
         all_microservice_files_string = ''
@@ -131,6 +168,7 @@ metas:
         if parse_result_fn is None:
             parse_result_fn = self.get_default_parse_result_fn(file_name_s)
 
+        self.raise_if_cancelled()
         print_colored('', f'\n\n############# {section_title} #############', 'blue')
         if use_custom_system_message:
             system_introduction_message = _GPTConversation._create_system_message(
@@ -199,12 +237,14 @@ metas:
         with open(os.path.join(os.path.dirname(__file__), 'static_files', 'microservice', 'jina_wrapper.py'), 'r', encoding='utf-8') as f:
             microservice_executor_boilerplate = f.read()
         microservice_executor_code = microservice_executor_boilerplate \
-            .replace('class DevGPTExecutor(Executor):', f'class {self.microservice_name}(Executor):')
+            .replace('class DevGPTExecutor(Executor):', f'class {self.get_push_name()}(Executor):')
         persist_file(microservice_executor_code, os.path.join(self.cur_microservice_path, EXECUTOR_FILE_NAME))
 
         for additional_file in ['google_custom_search.py', 'gpt_3_5_turbo.py']:
-            with open(os.path.join(os.path.dirname(__file__), 'static_files', 'microservice', additional_file), 'r', encoding='utf-8') as f:
-                persist_file(f.read(), os.path.join(self.cur_microservice_path, additional_file))
+            self.version_store.link_file(
+                os.path.join(os.path.dirname(__file__), 'static_files', 'microservice', additional_file),
+                os.path.join(self.cur_microservice_path, additional_file)
+            )
 
         is_using_gpt_3_5_turbo = 'gpt_3_5_turbo' in packages or 'gpt-3-5-turbo' in packages
         is_using_google_custom_search = 'google_custom_search' in packages or 'google-custom-search' in packages
@@ -256,23 +296,24 @@ metas:
         docker_file_content = ''.join(docker_file_template_lines)
         persist_file(docker_file_content, os.path.join(self.cur_microservice_path, 'Dockerfile'))
 
-        self.write_config_yml(self.microservice_name, self.cur_microservice_path)
+        self.write_config_yml(self.get_push_name(), self.cur_microservice_path, with_args='''with:
+  # set cache to true if the microservice always returns the same output for the same input
+  cache: false
+  cache_size: 1024
+  cache_ttl_seconds: null
+  # share the cache between the replicas on one node, e.g. /dev/shm/dev-gpt-cache
+  cache_dir: null
+''')
 
         print('\nFirst version of the microservice generated. Start iterating on it to make the tests pass...')
 
 
     def add_missing_imports_post_process_fn(self, content_dict: dict):
         for file_name, file_content in content_dict.items():
-            file_content = self.add_missing_imports_for_file(file_content)
-            content_dict[file_name] = file_content
+            if file_name.endswith('.py'):
+                content_dict[file_name] = add_missing_imports(file_content)
         return content_dict
 
-    def add_missing_imports_for_file(self, file_content):
-        for indicator, import_statement in INDICATOR_TO_IMPORT_STATEMENT.items():
-            if indicator in file_content and import_statement not in file_content:
-                file_content = f'{import_statement}\n{file_content}'
-        return file_content
-
     @staticmethod
     def read_docker_template():
         with open(os.path.join(os.path.dirname(__file__), 'static_files', 'microservice', 'Dockerfile'), 'r', encoding='utf-8') as f:
@@ -300,7 +341,7 @@ metas:
                  not any([pkg in line for pkg in ['jina', 'docarray', 'openai', 'pytest', 'gpt_3_5_turbo']])]
         content_modified = f'''jina==3.15.1.dev14
 docarray==0.21.0
-openai==0.27.5
+openai==0.27.6
 pytest
 {os.linesep.join(lines)}'''
         return {REQUIREMENTS_FILE_NAME: content_modified}
@@ -332,14 +373,14 @@ pytest
             playground_content = self.extract_content_from_result(
                 content_raw, 'app.py', match_single_block=True
             )
-        playground_content = self.add_missing_imports_for_file(playground_content)
+        playground_content = add_missing_imports(playground_content)
 
         gateway_path = os.path.join(self.cur_microservice_path, 'gateway')
         shutil.copytree(os.path.join(os.path.dirname(__file__), 'static_files', 'gateway'), gateway_path)
         persist_file(playground_content, os.path.join(gateway_path, 'app.py'))
 
         # fill-in name of microservice
-        gateway_name = f'Gateway{self.microservice_name}'
+        gateway_name = f'Gateway{self.get_push_name()}'
         custom_gateway_path = os.path.join(gateway_path, 'custom_gateway.py')
         with open(custom_gateway_path, 'r', encoding='utf-8') as f:
             custom_gateway_content = f.read()
@@ -347,28 +388,52 @@ pytest
             'class CustomGateway(CompositeGateway):',
             f'class {gateway_name}(CompositeGateway):'
         )
-        with open(custom_gateway_path, 'w', encoding='utf-8') as f:
-            f.write(custom_gateway_content)
+        persist_file(custom_gateway_content, custom_gateway_path)
 
         # write config.yml
         self.write_config_yml(gateway_name, gateway_path, 'custom_gateway.py')
+        self.version_store.set_latest_version(self.cur_microservice_path)
 
         # push the gateway
         print('Final step...')
         hubble_log = push_executor(gateway_path)
         if not is_executor_in_hub(gateway_name):
-            raise Exception(f'{self.microservice_name} not in hub. Hubble logs: {hubble_log}')
+            raise Exception(f'{gateway_name} not in hub. Hubble logs: {hubble_log}')
 
-    def debug_microservice(self, num_approach, packages, self_healing):
-        for i in range(1, MAX_DEBUGGING_ITERATIONS):
+    def build_and_push_executor(self):
+        """
+        With local_build, the microservice is only pushed to Jina Cloud once it builds and passes its tests locally.
+        A failing remote build is still returned, so that it is fed back into the next debugging iteration.
+        """
+        if self.local_build:
+            print(f'{Timer().get_time_since_start()} - Build and test locally...')
+            log = build_locally(self.cur_microservice_path)
+            if log:
+                return log
+            print(f'{Timer().get_time_since_start()} - Local build succeeded. Push executor...')
+        return push_executor(self.cur_microservice_path)
+
+    def debug_microservice(self, num_approach, packages, self_healing, start_iteration=1):
+        for i in range(start_iteration, MAX_DEBUGGING_ITERATIONS):
+            self.raise_if_cancelled()
             print('Debugging iteration', i)
             print('Trying to debug the microservice. Might take a while...')
+            print(f'{Timer().get_time_since_start()} - Reconcile imports with requirements.txt...')
+            for change in reconcile_requirements_txt(self.cur_microservice_path):
+                print(f'requirements.txt: {change}')
             print(f'{Timer().get_time_since_start()} - Clean requirements.txt...')
-            clean_requirements_txt(self.cur_microservice_path)
-            print(f'{Timer().get_time_since_start()} - Build executor...')
-            log_hubble = push_executor(self.cur_microservice_path)
+            clean_requirements_txt(self.cur_microservice_path, self.pypi_cutoff)
+            print(f'{Timer().get_time_since_start()} - Run preflight checks...')
+            log_hubble = run_preflight_checks(self.cur_microservice_path)
+            if log_hubble:
+                print('Preflight checks failed, skipping the build.')
+            else:
+                print(f'{Timer().get_time_since_start()} - Build executor...')
+                log_hubble = self.build_and_push_executor()
             print(f'{Timer().get_time_since_start()} - Analyze logs...')
             error = process_error_message(log_hubble)
+            self.learn_from_last_fix(error)
+            self.raise_if_cancelled()
             if error:
                 print('Handling error...')
                 if not self_healing:
@@ -380,22 +445,54 @@ pytest
                     self.microservice_root_path, self.microservice_name, packages, num_approach, i + 1
                 )
                 os.makedirs(self.cur_microservice_path)
-                self.do_debug_iteration(error)
+                if not self.apply_known_fix(error):
+                    start = time.time()
+                    self.do_debug_iteration(error)
+                    if self.fix_knowledge_base is not None:
+                        self.last_fix = (get_error_fingerprint(error), time.time() - start, False)
+                self.save_checkpoint('debugging')
                 if i == MAX_DEBUGGING_ITERATIONS - 1:
                     raise self.MaxDebugTimeReachedException('Could not debug the microservice.')
             else:
                 # at the moment, there can be cases where no error log is extracted but the executor is still not published
                 # it leads to problems later on when someone tries a run or deployment
-                if is_executor_in_hub(self.microservice_name):
+                if is_executor_in_hub(self.get_push_name()):
                     print('Successfully build microservice.')
                     break
                 else:
-                    raise Exception(f'{self.microservice_name} not in hub. Hubble logs: {log_hubble}')
+                    raise Exception(f'{self.get_push_name()} not in hub. Hubble logs: {log_hubble}')
+
+    def apply_known_fix(self, error):
+        """Applies the fix of the knowledge base for the error, if there is one, instead of asking the LLM."""
+        if self.fix_knowledge_base is None:
+            return False
+        fingerprint = get_error_fingerprint(error)
+        fix = self.fix_knowledge_base.lookup(fingerprint)
+        if fix is None:
+            return False
+        print_colored('', f'Applying a fix which resolved this error before: {fix}', 'green')
+        self.version_store.create_version(self.previous_microservice_path, self.cur_microservice_path)
+        apply_dependency_diff(fix, self.cur_microservice_path)
+        self.last_fix = (fingerprint, 0, True)
+        return True
+
+    def learn_from_last_fix(self, error):
+        """Remembers the fix of the last debug iteration if it resolved its error."""
+        if self.last_fix is None:
+            return
+        fingerprint, seconds_to_find, is_known_fix = self.last_fix
+        self.last_fix = None
+        resolved = not error or get_error_fingerprint(error) != fingerprint
+        if is_known_fix:
+            self.fix_knowledge_base.record_outcome(fingerprint, resolved)
+        elif resolved:
+            diff = get_dependency_diff(self.previous_microservice_path, self.cur_microservice_path)
+            if diff is not None:
+                self.fix_knowledge_base.add_fix(fingerprint, diff, seconds_to_find)
 
     def do_debug_iteration(self, error):
+        self.version_store.create_version(self.previous_microservice_path, self.cur_microservice_path)
         file_name_to_content = get_all_microservice_files_with_content(self.previous_microservice_path)
-        for file_name, content in file_name_to_content.items():
-            persist_file(content, os.path.join(self.cur_microservice_path, file_name))
 
         summarized_error = self.summarize_error(error)
         dock_req_string = self.files_to_string({
@@ -431,20 +528,60 @@ pytest
 
                 suggested_solution = self.generate_solution_suggestion(summarized_error, all_files_string)
 
-                self.generate_and_persist_file(
-                    section_title='Implementing suggestion solution for code issue',
-                    template=template_implement_solution_code_issue,
-                    file_name_s=[IMPLEMENTATION_FILE_NAME, TEST_EXECUTOR_FILE_NAME, REQUIREMENTS_FILE_NAME],
-                    summarized_error=summarized_error,
-                    task_description=self.microservice_specification.task,
-                    test_description=self.microservice_specification.test,
-                    all_files_string=all_files_string,
-                    suggested_solution=suggested_solution,
+                is_patched = self.patch_mode and self.implement_solution_as_patch(
+                    file_name_to_content, summarized_error, all_files_string, suggested_solution
                 )
+                if not is_patched:
+                    self.generate_and_persist_file(
+                        section_title='Implementing suggestion solution for code issue',
+                        template=template_implement_solution_code_issue,
+                        file_name_s=[IMPLEMENTATION_FILE_NAME, TEST_EXECUTOR_FILE_NAME, REQUIREMENTS_FILE_NAME],
+                        post_process_fn=self.add_missing_imports_post_process_fn,
+                        summarized_error=summarized_error,
+                        task_description=self.microservice_specification.task,
+                        test_description=self.microservice_specification.test,
+                        all_files_string=all_files_string,
+                        suggested_solution=suggested_solution,
+                    )
 
                 self.previous_errors.append(summarized_error)
                 self.previous_solutions.append(suggested_solution)
 
+    def implement_solution_as_patch(self, file_name_to_content, summarized_error, all_files_string, suggested_solution):
+        """
+        Asks for search/replace blocks instead of the complete files, which needs far fewer completion tokens.
+        Returns False if the blocks could not be applied, then the complete files have to be generated.
+        """
+        patchable_file_name_to_content = {
+            file_name: file_name_to_content[file_name]
+            for file_name in [IMPLEMENTATION_FILE_NAME, TEST_EXECUTOR_FILE_NAME, REQUIREMENTS_FILE_NAME]
+            if file_name in file_name_to_content
+        }
+
+        def parse_result_fn_patch(content_raw: str):
+            file_name_to_blocks = parse_search_replace_blocks(content_raw)
+            if not file_name_to_blocks:
+                raise PatchFailedException('no search/replace blocks in the response')
+            return apply_patches(patchable_file_name_to_content, file_name_to_blocks)
+
+        try:
+            self.generate_and_persist_file(
+                section_title='Implementing suggestion solution for code issue as patch',
+                template=template_implement_solution_code_issue_patch,
+                file_name_s=list(patchable_file_name_to_content),
+                parse_result_fn=parse_result_fn_patch,
+                post_process_fn=self.add_missing_imports_post_process_fn,
+                summarized_error=summarized_error,
+                task_description=self.microservice_specification.task,
+                test_description=self.microservice_specification.test,
+                all_files_string=all_files_string,
+                suggested_solution=suggested_solution,
+            )
+        except PatchFailedException as e:
+            print_colored('', f'Could not apply the patch ({e}). Generating the complete files instead.', 'red')
+            return False
+        return True
+
     def generate_solution_suggestion(self, summarized_error, all_files_string):
         suggested_solutions = ask_gpt(
             template_suggest_solutions_code_issue,
@@ -456,33 +593,20 @@ pytest
         )
 
         if len(self.previous_errors) > 0:
-            was_error_seen_before = json.loads(
-                self.generate_and_persist_file(
-                    section_title='Check if error was seen before',
-                    template=template_was_error_seen_before,
-                    file_name_s=['was_error_seen_before.json'],
-                    summarized_error=summarized_error,
-                    previous_errors='- "' + f'"{os.linesep}- "'.join(self.previous_errors) + '"',
-                    use_custom_system_message=False,
-                    response_format_example=response_format_was_error_seen_before,
-                )['was_error_seen_before.json']
-            )['was_error_seen_before'].lower() == 'yes'
+            was_error_seen_before = SimilarityIndex(
+                self.previous_errors, *ERROR_SIMILARITY_THRESHOLDS
+            ).is_similar(summarized_error)
+            if was_error_seen_before is None:
+                was_error_seen_before = self.ask_was_error_seen_before(summarized_error)
 
             suggested_solution = None
             if was_error_seen_before:
+                solution_index = SimilarityIndex(self.previous_solutions, *SOLUTION_SIMILARITY_THRESHOLDS)
                 for _num_solution in range(1, len(suggested_solutions) + 1):
                     _suggested_solution = suggested_solutions[str(_num_solution)]
-                    was_solution_tried_before = json.loads(
-                        self.generate_and_persist_file(
-                            section_title='Check if solution was tried before',
-                            template=template_was_solution_tried_before,
-                            file_name_s=['will_lead_to_different_actions.json'],
-                            tried_solutions='- "' + f'"{os.linesep}- "'.join(self.previous_solutions) + '"',
-                            suggested_solution=_suggested_solution,
-                            use_custom_system_message=False,
-                            response_format_example=response_format_was_solution_tried_before,
-                        )['will_lead_to_different_actions.json']
-                    )['will_lead_to_different_actions'].lower() == 'no'
+                    was_solution_tried_before = solution_index.is_similar(_suggested_solution)
+                    if was_solution_tried_before is None:
+                        was_solution_tried_before = self.ask_was_solution_tried_before(_suggested_solution)
                     if not was_solution_tried_before:
                         suggested_solution = _suggested_solution
                         break
@@ -496,9 +620,45 @@ pytest
 
         return suggested_solution
 
+    def ask_was_error_seen_before(self, summarized_error):
+        return json.loads(
+            self.generate_and_persist_file(
+                section_title='Check if error was seen before',
+                template=template_was_error_seen_before,
+                file_name_s=['was_error_seen_before.json'],
+                summarized_error=summarized_error,
+                previous_errors='- "' + f'"{os.linesep}- "'.join(self.previous_errors) + '"',
+                use_custom_system_message=False,
+                response_format_example=response_format_was_error_seen_before,
+            )['was_error_seen_before.json']
+        )['was_error_seen_before'].lower() == 'yes'
+
+    def ask_was_solution_tried_before(self, suggested_solution):
+        return json.loads(
+            self.generate_and_persist_file(
+                section_title='Check if solution was tried before',
+                template=template_was_solution_tried_before,
+                file_name_s=['will_lead_to_different_actions.json'],
+                tried_solutions='- "' + f'"{os.linesep}- "'.join(self.previous_solutions) + '"',
+                suggested_solution=suggested_solution,
+                use_custom_system_message=False,
+                response_format_example=response_format_was_solution_tried_before,
+            )['will_lead_to_different_actions.json']
+        )['will_lead_to_different_actions'].lower() == 'no'
+
     class MaxDebugTimeReachedException(BaseException):
         pass
 
+    class ApproachCancelledException(BaseException):
+        pass
+
+    def get_push_name(self):
+        return self.push_name or self.microservice_name
+
+    def raise_if_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise self.ApproachCancelledException()
+
     def is_dependency_issue(self, summarized_error, dock_req_string: str, package_manager: str):
         # a few heuristics to quickly jump ahead
         if any([error_message in summarized_error for error_message in
@@ -541,16 +701,48 @@ pytest
         return packages_list
 
     def generate(self):
-        os.makedirs(self.microservice_root_path)
-        self.microservice_specification.task, self.microservice_specification.test = PM().refine_specification(self.microservice_specification.task)
-        generated_name = self.generate_microservice_name(self.microservice_specification.task)
-        self.microservice_name = f'{generated_name}{random.randint(0, 10_000_000)}'
-        packages_list = self.get_possible_packages()
+        try:
+            return self._generate()
+        except gpt.BudgetExceededException as e:
+            print_colored('', f'Aborting the generation. {e}', 'red')
+            return -1
+        finally:
+            if self.fix_knowledge_base is not None and self.fix_knowledge_base.num_lookups > 0:
+                print(self.fix_knowledge_base.get_report())
+            if os.path.exists(self.gpt_session.conversation_logger.log_file_path):
+                self.gpt_session.conversation_logger.write_legacy_log()
+
+    def _generate(self):
+        os.makedirs(self.microservice_root_path, exist_ok=self.resume)
+        if self.resume:
+            self.load_checkpoint()
+        if self.stage == 'completed':
+            print('The microservice was already generated.')
+            self.print_next_steps()
+            return 0
+        if self.stage is None:
+            self.save_checkpoint('started')
+        if self.stage == 'started':
+            self.microservice_specification.task, self.microservice_specification.test = PM().refine_specification(self.microservice_specification.task)
+            self.save_checkpoint('specification')
+        if self.stage == 'specification':
+            generated_name = self.generate_microservice_name(self.microservice_specification.task)
+            self.microservice_name = f'{generated_name}{random.randint(0, 10_000_000)}'
+            self.save_checkpoint('name')
+        if self.stage == 'name':
+            self.packages_list = self.get_possible_packages()
+            self.num_approach = 0
+            self.save_checkpoint('packages')
+        packages_list = self.packages_list
+        if self.parallel_approaches > 1:
+            # the progress of parallel approaches is not checkpointed, a resumed run starts them again
+            shutil.rmtree(os.path.join(self.microservice_root_path, self.microservice_name), ignore_errors=True)
+            return self.generate_approaches_in_parallel(packages_list)
         for num_approach, packages in enumerate(packages_list):
+            if num_approach < self.num_approach:
+                continue
             try:
-                self.generate_microservice(packages, num_approach)
-                self.debug_microservice(num_approach, packages, self.self_healing)
-                self.generate_playground()
+                self.run_approach_with_checkpoints(num_approach, packages)
             except self.MaxDebugTimeReachedException:
                 print('Could not debug the Microservice with the approach:', packages)
                 if num_approach == len(packages_list) - 1:
@@ -558,15 +750,172 @@ pytest
                                   f'Could not debug the Microservice with any of the approaches: {packages} giving up.',
                                   'red')
                     return -1
+                self.num_approach = num_approach + 1
+                self.save_checkpoint('packages')
                 continue
-            command = 'dev-gpt' if any(['main.py' in arg for arg in sys.argv]) else 'dev-gpt'
-            print(f'''
+            self.print_next_steps()
+            return 0
+
+    def run_approach_with_checkpoints(self, num_approach, packages):
+        if self.stage == 'packages':
+            self.generate_microservice(packages, num_approach)
+            self.save_checkpoint('debugging')
+        if self.stage == 'debugging':
+            current_version = int(os.path.basename(self.cur_microservice_path).replace('v', ''))
+            self.debug_microservice(num_approach, packages, self.self_healing, start_iteration=current_version)
+            self.save_checkpoint('built')
+        self.generate_playground()
+        self.save_checkpoint('completed')
+
+    def save_checkpoint(self, stage):
+        """
+        Persists the state of the pipeline after a stage is completed, so that `dev-gpt generate --resume`
+        can continue from there without paying again for the completed stages.
+        """
+        self.stage = stage
+        if self.cancel_event is not None:
+            # approaches which run in parallel are not checkpointed
+            return
+        checkpoint = {
+            'stage': stage,
+            'task': self.microservice_specification.task,
+            'test': self.microservice_specification.test,
+            'microservice_name': self.microservice_name,
+            'packages_list': self.packages_list,
+            'num_approach': self.num_approach,
+            'cur_microservice_path': self.cur_microservice_path,
+            'previous_microservice_path': self.previous_microservice_path,
+            'previous_errors': self.previous_errors,
+            'previous_solutions': self.previous_solutions,
+            'prompt_tokens_so_far': self.gpt_session.prompt_tokens_so_far,
+            'completion_tokens_so_far': self.gpt_session.completion_tokens_so_far,
+        }
+        tmp_path = f'{self.checkpoint_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def load_checkpoint(self):
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        self.stage = checkpoint['stage']
+        self.microservice_specification = TaskSpecification(task=checkpoint['task'], test=checkpoint['test'])
+        self.microservice_name = checkpoint['microservice_name']
+        self.packages_list = checkpoint['packages_list']
+        self.num_approach = checkpoint['num_approach']
+        self.cur_microservice_path = checkpoint['cur_microservice_path']
+        self.previous_microservice_path = checkpoint['previous_microservice_path']
+        self.previous_errors = checkpoint['previous_errors']
+        self.previous_solutions = checkpoint['previous_solutions']
+        # budgets apply to the whole generation and not only to the resumed part
+        self.gpt_session.prompt_tokens_so_far = checkpoint['prompt_tokens_so_far']
+        self.gpt_session.completion_tokens_so_far = checkpoint['completion_tokens_so_far']
+        self.remove_incomplete_versions()
+        print(f'Resuming the generation after the stage "{self.stage}".')
+
+    def remove_incomplete_versions(self):
+        """Removes the folders which were written by the interrupted run after the last checkpoint."""
+        if self.packages_list is None or self.num_approach is None or self.num_approach >= len(self.packages_list):
+            return
+        approach_path = os.path.dirname(get_microservice_path(
+            self.microservice_root_path, self.microservice_name, self.packages_list[self.num_approach],
+            self.num_approach, 1
+        ))
+        if not os.path.exists(approach_path):
+            return
+        last_complete_version = 0
+        if self.stage in ['debugging', 'built']:
+            last_complete_version = int(os.path.basename(self.cur_microservice_path).replace('v', ''))
+        for folder in list_dirs_no_hidden(approach_path):
+            if re.fullmatch(r'v\d+', folder) and int(folder[1:]) > last_complete_version:
+                shutil.rmtree(os.path.join(approach_path, folder))
+        if self.stage == 'built':
+            shutil.rmtree(os.path.join(self.cur_microservice_path, 'gateway'), ignore_errors=True)
+
+    def print_next_steps(self):
+        command = 'dev-gpt' if any(['main.py' in arg for arg in sys.argv]) else 'dev-gpt'
+        print(f'''
 You can now run or deploy your microservice:
 {command} run --path {self.microservice_root_path}
 {command} deploy --path {self.microservice_root_path}
 '''
-                  )
-            return 0
+              )
+
+    def create_approach(self, cancel_event, num_approach):
+        """
+        Creates a copy of the generator with its own paths and debugging history for one approach.
+        Each approach pushes its executor under its own name, so that the approaches do not replace each other's build.
+        """
+        approach = copy.copy(self)
+        approach.previous_microservice_path = None
+        approach.cur_microservice_path = None
+        approach.previous_errors = []
+        approach.previous_solutions = []
+        approach.cancel_event = cancel_event
+        approach.push_name = f'{self.microservice_name}Approach{num_approach}'
+        approach.last_fix = None
+        return approach
+
+    def run_approach(self, num_approach, packages):
+        self.generate_microservice(packages, num_approach)
+        self.debug_microservice(num_approach, packages, self.self_healing)
+        return self
+
+    def generate_approaches_in_parallel(self, packages_list):
+        """
+        Generates and debugs up to parallel_approaches approaches at the same time - each in its own directory.
+        As soon as the first approach builds successfully, all other approaches are cancelled at their next
+        checkpoint (before each LLM call and each build) and the playground is only generated for the winner.
+        The approaches run in daemon threads, so that the generation does not wait for the builds of the losers.
+        An approach which fails with an error is given up, the other approaches continue.
+        """
+        cancel_event = threading.Event()
+        slots = threading.Semaphore(self.parallel_approaches)
+        results = queue.Queue()
+
+        def run(approach, num_approach, packages):
+            with slots:
+                try:
+                    approach.raise_if_cancelled()
+                    results.put((packages, approach.run_approach(num_approach, packages), None))
+                except BaseException as e:
+                    results.put((packages, None, e))
+
+        for num_approach, packages in enumerate(packages_list):
+            approach = self.create_approach(cancel_event, num_approach)
+            threading.Thread(target=run, args=(approach, num_approach, packages), daemon=True).start()
+        winner = None
+        try:
+            for _ in packages_list:
+                packages, approach, error = results.get()
+                if error is None:
+                    winner = approach
+                    break
+                if isinstance(error, gpt.BudgetExceededException):
+                    # the budget is shared by all approaches, the other approaches would fail as well
+                    raise error
+                if isinstance(error, self.MaxDebugTimeReachedException):
+                    print('Could not debug the Microservice with the approach:', packages)
+                elif isinstance(error, Exception):
+                    print_colored('', f'The approach {packages} failed: {type(error).__name__}: {error}', 'red')
+                else:
+                    raise error
+        finally:
+            cancel_event.set()
+
+        if winner is None:
+            print_colored('', 'Could not debug the Microservice with any of the approaches. Giving up.', 'red')
+            return -1
+        print(f'Approach {winner.cur_microservice_path} succeeded. Cancelled all other approaches.')
+        self.cur_microservice_path = winner.cur_microservice_path
+        self.previous_microservice_path = winner.previous_microservice_path
+        self.previous_errors = winner.previous_errors
+        self.previous_solutions = winner.previous_solutions
+        self.push_name = winner.push_name
+        self.generate_playground()
+        self.save_checkpoint('completed')
+        self.print_next_steps()
+        return 0
 
     def summarize_error(self, error):
         conversation = self.gpt_session.get_conversation()
@@ -591,6 +940,7 @@ You can now run or deploy your microservice:
                 for pkg in packages
             ])
         ]
+        get_pypi_client().prefetch(package for packages in packages_list for package in packages)
         # filter out single packages
         packages_list = [
             [
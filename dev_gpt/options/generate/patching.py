@@ -0,0 +1,107 @@
+import difflib
+import re
+
+from dev_gpt.constants import PATCH_FUZZY_MATCH_THRESHOLD
+
+FILE_NAME_PATTERN = re.compile(r'^\*\*([^*\n]+)\*\*\s*$')
+BLOCK_PATTERN = re.compile(r'<<<<<<< SEARCH\n(.*?)^=======\n(.*?)^>>>>>>> REPLACE', re.DOTALL | re.MULTILINE)
+
+
+class PatchFailedException(Exception):
+    pass
+
+
+def parse_search_replace_blocks(text):
+    """
+    Returns the search/replace blocks of a response per file name, e.g.
+    {'microservice.py': [('old lines\n', 'new lines\n')]}
+    The blocks belong to the last **file name** before them.
+    """
+    file_name_to_blocks = {}
+    file_name = None
+    position = 0
+    for match in BLOCK_PATTERN.finditer(text):
+        for line in text[position:match.start()].split('\n'):
+            file_name_match = FILE_NAME_PATTERN.match(line.strip())
+            if file_name_match:
+                file_name = file_name_match.group(1).strip()
+        position = match.end()
+        if file_name is None:
+            raise PatchFailedException('search/replace block without file name')
+        file_name_to_blocks.setdefault(file_name, []).append((match.group(1), match.group(2)))
+    return file_name_to_blocks
+
+
+def _get_indentation(lines):
+    for line in lines:
+        if line.strip():
+            return line[:len(line) - len(line.lstrip())]
+    return ''
+
+
+def _reindent(lines, from_indentation, to_indentation):
+    if from_indentation == to_indentation:
+        return lines
+    return [
+        to_indentation + line[len(from_indentation):] if line.startswith(from_indentation) and line.strip() else line
+        for line in lines
+    ]
+
+
+def _find_lines(lines, search_lines):
+    """Returns the start of the lines which match the search lines best or None if none are similar enough."""
+    num_search_lines = len(search_lines)
+    stripped_search_lines = [line.strip() for line in search_lines]
+    candidates = range(len(lines) - num_search_lines + 1)
+    # the same lines with other indentation or trailing whitespace
+    for start in candidates:
+        if [line.strip() for line in lines[start:start + num_search_lines]] == stripped_search_lines:
+            return start
+    # the model copied the lines with small mistakes
+    best_start, best_ratio = None, PATCH_FUZZY_MATCH_THRESHOLD
+    search_text = '\n'.join(stripped_search_lines)
+    for start in candidates:
+        window_text = '\n'.join(line.strip() for line in lines[start:start + num_search_lines])
+        matcher = difflib.SequenceMatcher(None, window_text, search_text, autojunk=False)
+        if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+            continue
+        ratio = matcher.ratio()
+        if ratio >= best_ratio:
+            best_start, best_ratio = start, ratio
+    return best_start
+
+
+def apply_search_replace(content, search, replace):
+    """
+    Replaces the first occurrence of search in content with replace.
+    If search is not in content exactly, the lines are matched ignoring whitespace and then fuzzily.
+    An empty search appends replace to the content.
+    """
+    if not search.strip():
+        return content.rstrip('\n') + '\n' + replace if content.strip() else replace
+    if search in content:
+        return content.replace(search, replace, 1)
+    lines = content.split('\n')
+    search_lines = search.rstrip('\n').split('\n')
+    start = _find_lines(lines, search_lines)
+    if start is None:
+        raise PatchFailedException(f'could not find the lines:\n{search}')
+    matched_lines = lines[start:start + len(search_lines)]
+    replace_lines = _reindent(
+        replace.rstrip('\n').split('\n') if replace.strip() else [],
+        _get_indentation(search_lines), _get_indentation(matched_lines)
+    )
+    return '\n'.join(lines[:start] + replace_lines + lines[start + len(search_lines):])
+
+
+def apply_patches(file_name_to_content, file_name_to_blocks):
+    """Returns the new content of all patched files. Fails if any block can not be applied."""
+    patched_file_name_to_content = {}
+    for file_name, blocks in file_name_to_blocks.items():
+        if file_name not in file_name_to_content:
+            raise PatchFailedException(f'{file_name} does not exist')
+        content = file_name_to_content[file_name]
+        for search, replace in blocks:
+            content = apply_search_replace(content, search, replace)
+        patched_file_name_to_content[file_name] = content
+    return patched_file_name_to_content
@@ -0,0 +1,92 @@
+import ast
+import os
+
+from dev_gpt.constants import IMPLEMENTATION_FILE_NAME, TEST_EXECUTOR_FILE_NAME
+from dev_gpt.options.generate.code_analysis import get_unbound_names
+
+FUNC_SIGNATURE = 'def func(input_json_dict_string: str) -> str'
+
+
+def _check_compiles(file_name, code):
+    try:
+        compile(code, file_name, 'exec')
+    except SyntaxError as e:
+        line = (e.text or '').rstrip('\n')
+        return [f'  File "{file_name}", line {e.lineno}', f'    {line.strip()}', f'{type(e).__name__}: {e.msg}']
+    return []
+
+
+def _check_names(file_name, code):
+    return [
+        f"{file_name}:{line_number}: undefined name '{unbound_name.name}'"
+        for unbound_name in get_unbound_names(code)
+        for line_number in unbound_name.line_numbers
+    ]
+
+
+def _is_str_annotation(annotation):
+    return annotation is None or (isinstance(annotation, ast.Name) and annotation.id == 'str') \
+        or (isinstance(annotation, ast.Constant) and annotation.value == 'str')
+
+
+def _check_func_signature(code):
+    tree = ast.parse(code)
+    # the jina wrapper also supports async func
+    functions = [
+        node for node in tree.body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == 'func'
+    ]
+    if not functions:
+        return [f'{IMPLEMENTATION_FILE_NAME}: func is not defined, it must be defined as `{FUNC_SIGNATURE}`']
+    args = functions[-1].args
+    positional_args = args.posonlyargs + args.args
+    num_required_args = len(positional_args) - len(args.defaults)
+    has_required_keyword_args = any(default is None for default in args.kw_defaults)
+    if not positional_args or num_required_args > 1 or has_required_keyword_args \
+            or not _is_str_annotation(positional_args[0].annotation) or not _is_str_annotation(functions[-1].returns):
+        return [
+            f'{IMPLEMENTATION_FILE_NAME}:{functions[-1].lineno}: func has the wrong signature, '
+            f'it must be defined as `{FUNC_SIGNATURE}`'
+        ]
+    return []
+
+
+def _check_test_imports_func(code):
+    tree = ast.parse(code)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module == os.path.splitext(IMPLEMENTATION_FILE_NAME)[0] \
+                and node.level <= 1 and any(alias.name == 'func' for alias in node.names):
+            return []
+    return [f'{TEST_EXECUTOR_FILE_NAME}: func is not imported, the test must contain `from .microservice import func`']
+
+
+def run_preflight_checks(microservice_path):
+    """
+    Runs cheap local checks on the generated code, so that obvious errors do not need a remote build to be found:
+    - each file compiles
+    - no undefined names
+    - microservice.py defines func(input_json_dict_string: str) -> str, optionally async
+    - test_microservice.py imports func
+    Returns the errors in the format of a build log or '' if all checks passed.
+    """
+    file_name_to_check = {
+        IMPLEMENTATION_FILE_NAME: _check_func_signature,
+        TEST_EXECUTOR_FILE_NAME: _check_test_imports_func,
+    }
+    errors = []
+    for file_name, check in file_name_to_check.items():
+        with open(os.path.join(microservice_path, file_name), 'r', encoding='utf-8') as f:
+            code = f.read()
+        compile_errors = _check_compiles(file_name, code)
+        if compile_errors:
+            errors.extend(compile_errors)
+        else:
+            errors.extend(_check_names(file_name, code))
+            errors.extend(check(code))
+    if not errors:
+        return ''
+    return '\n'.join(
+        [f'#1 [1/1] RUN preflight checks on {IMPLEMENTATION_FILE_NAME} {TEST_EXECUTOR_FILE_NAME}']
+        + errors
+        + ['exited on non-zero code: 1']
+    )
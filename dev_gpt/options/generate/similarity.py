@@ -0,0 +1,65 @@
+import math
+import re
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r'[a-z_][a-z0-9_]*|<num>|<path>|<hex>')
+
+
+def normalize_text(text):
+    """Removes the parts of error messages and solutions which differ between otherwise equal texts."""
+    text = text.lower()
+    text = re.sub(r'0x[0-9a-f]+', ' <hex> ', text)
+    text = re.sub(r'(?:[\w.-]*/)+([\w.-]+)', r' <path> \1 ', text)
+    text = re.sub(r'\d+(?:\.\d+)*', ' <num> ', text)
+    return text
+
+
+def get_terms(text):
+    """Words and word bigrams of the normalized text."""
+    tokens = TOKEN_PATTERN.findall(normalize_text(text))
+    return tokens + [f'{first} {second}' for first, second in zip(tokens, tokens[1:])]
+
+
+class SimilarityIndex:
+    """
+    TF-IDF cosine similarity of a text to a small set of previous texts, e.g. the errors of the previous debug iterations.
+    is_similar answers with True or False if the score is clearly above the similar threshold
+    or below the different threshold and with None for borderline scores, which need a closer look.
+    """
+    def __init__(self, texts, similar_threshold, different_threshold):
+        self.texts = list(texts)
+        self.similar_threshold = similar_threshold
+        self.different_threshold = different_threshold
+        self.term_counts = [Counter(get_terms(text)) for text in self.texts]
+
+    def _get_vector(self, term_counts, idf):
+        vector = {term: count * idf[term] for term, count in term_counts.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        return {term: value / norm for term, value in vector.items()} if norm else {}
+
+    def get_similarities(self, text):
+        query_term_counts = Counter(get_terms(text))
+        all_term_counts = self.term_counts + [query_term_counts]
+        document_frequency = Counter(term for term_counts in all_term_counts for term in term_counts)
+        # smoothed, so that terms which are in every text still count a little
+        idf = {
+            term: math.log((1 + len(all_term_counts)) / (1 + frequency)) + 1
+            for term, frequency in document_frequency.items()
+        }
+        query_vector = self._get_vector(query_term_counts, idf)
+        similarities = []
+        for term_counts in self.term_counts:
+            vector = self._get_vector(term_counts, idf)
+            similarities.append(sum(value * vector.get(term, 0) for term, value in query_vector.items()))
+        return similarities
+
+    def get_max_similarity(self, text):
+        return max(self.get_similarities(text), default=0.0)
+
+    def is_similar(self, text):
+        score = self.get_max_similarity(text)
+        if score >= self.similar_threshold:
+            return True
+        if score <= self.different_threshold:
+            return False
+        return None
@@ -1,9 +1,14 @@
+import asyncio
+import http.client
 import os
 import shutil
+import socket
 import subprocess
-from time import sleep
-from typing import List, Tuple
+import urllib.request
+from time import monotonic, sleep
+from typing import Callable, List, Tuple
 
+import streamlit.config
 import streamlit.web.bootstrap
 from jina import Gateway
 from jina.serve.runtimes.gateway.composite import CompositeGateway
@@ -13,6 +18,10 @@ from streamlit.web.server import Server as StreamlitServer
 
 cur_dir = os.path.dirname(__file__)
 
+NGINX_PORT = 8080
+PLAYGROUND_PORT = 8501
+READINESS_TIMEOUT_SECONDS = 30
+
 
 def cmd(command, std_output=False, wait=True):
     if isinstance(command, str):
@@ -28,6 +37,35 @@ def cmd(command, std_output=False, wait=True):
         return output, error
 
 
+def wait_for(condition: Callable[[], bool], timeout: float = READINESS_TIMEOUT_SECONDS) -> bool:
+    """Polls the condition with a short, growing backoff. Returns False if it is not met before the timeout."""
+    deadline = monotonic() + timeout
+    delay = 0.01
+    while not condition():
+        remaining = deadline - monotonic()
+        if remaining <= 0:
+            return False
+        sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.5)
+    return True
+
+
+def is_port_open(port: int, host: str = 'localhost') -> bool:
+    try:
+        with socket.create_connection((host, port), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+
+def is_healthy(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=0.5) as response:
+            return response.status == 200
+    except (OSError, http.client.HTTPException):
+        return False
+
+
 class PlaygroundGateway(Gateway):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -55,6 +93,13 @@ class PlaygroundGateway(Gateway):
         await self.streamlit_server.start()
         streamlit.web.bootstrap._on_server_start(self.streamlit_server)
         streamlit.web.bootstrap._set_up_signal_handler(self.streamlit_server)
+        base_url_path = streamlit.config.get_option('server.baseUrlPath').strip('/')
+        healthz_url = f'http://localhost:{PLAYGROUND_PORT}/{base_url_path + "/" if base_url_path else ""}healthz'
+        # the server runs on this event loop, so the blocking polling must happen in another thread
+        if await asyncio.get_running_loop().run_in_executor(None, wait_for, lambda: is_healthy(healthz_url)):
+            self.logger.info('Playground is ready')
+        else:
+            self.logger.warning(f'Playground did not become healthy within {READINESS_TIMEOUT_SECONDS}s')
 
     async def shutdown(self):
         self.streamlit_server.stop()
@@ -74,7 +119,7 @@ class CustomGateway(CompositeGateway):
         # need to update port to 8082, as nginx will listen on 8080
         http_idx = 0
         http_port = kwargs['runtime_args']['port'][http_idx]
-        if kwargs['runtime_args']['port'][http_idx] != 8080:
+        if kwargs['runtime_args']['port'][http_idx] != NGINX_PORT:
             raise ValueError(
                 f'Please, let http port ({http_port}) be 8080 for nginx to work'
             )
@@ -89,7 +134,7 @@ class CustomGateway(CompositeGateway):
         # note order is important
         self._add_gateway(
             PlaygroundGateway,
-            8501,
+            PLAYGROUND_PORT,
             **kwargs,
         )
 
@@ -109,14 +154,20 @@ class CustomGateway(CompositeGateway):
             os.path.join(cur_dir, '', 'nginx.conf'),
         ]
         output, error = self._run_nginx_command(command)
-        self.logger.info('Nginx started')
+        if wait_for(lambda: is_port_open(NGINX_PORT)):
+            self.logger.info('Nginx started')
+        else:
+            self.logger.warning(f'Nginx does not listen on port {NGINX_PORT} after {READINESS_TIMEOUT_SECONDS}s')
         self.logger.info(f'nginx output: {output}')
         self.logger.info(f'nginx error: {error}')
 
     def shutdown_nginx(self):
         command = ['nginx', '-s', 'stop']
         output, error = self._run_nginx_command(command)
-        self.logger.info('Nginx stopped')
+        if wait_for(lambda: not is_port_open(NGINX_PORT)):
+            self.logger.info('Nginx stopped')
+        else:
+            self.logger.warning(f'Nginx still listens on port {NGINX_PORT} after {READINESS_TIMEOUT_SECONDS}s')
         self.logger.info(f'nginx output: {output}')
         self.logger.info(f'nginx error: {error}')
 
@@ -129,7 +180,6 @@ class CustomGateway(CompositeGateway):
             command.insert(0, 'sudo')
             self.logger.info(f'So running command: {command}')
             output, error = cmd(command)
-        sleep(10)
         return output, error
 
     def _add_gateway(self, gateway_cls, port, protocol='http', **kwargs):
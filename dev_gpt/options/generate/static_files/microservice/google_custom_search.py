@@ -1,10 +1,30 @@
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 import requests
+from requests.adapters import HTTPAdapter
+
+MAX_IMAGE_CANDIDATES = 10
+CACHE_TTL_SECONDS = int(os.environ.get('GOOGLE_SEARCH_CACHE_TTL_SECONDS', 3600))
+CACHE_MAX_ENTRIES = 256
+
+# one keep-alive session for the Custom Search API and the image checks
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=MAX_IMAGE_CANDIDATES, pool_maxsize=MAX_IMAGE_CANDIDATES))
+_session.mount('http://', HTTPAdapter(pool_connections=MAX_IMAGE_CANDIDATES, pool_maxsize=MAX_IMAGE_CANDIDATES))
+_executor = ThreadPoolExecutor(max_workers=MAX_IMAGE_CANDIDATES)
+_cache = {}
+_cache_lock = threading.Lock()
 
 
 def google_search(search_term, search_type, top_n):
+    key = (search_term, search_type, top_n)
+    with _cache_lock:
+        if key in _cache and _cache[key][0] > time.monotonic():
+            return _cache[key][1]
     google_api_key: Optional[str] = os.environ['GOOGLE_API_KEY']
     google_cse_id: Optional[str] = os.environ['GOOGLE_CSE_ID']
     url = "https://www.googleapis.com/customsearch/v1"
@@ -15,27 +35,38 @@ def google_search(search_term, search_type, top_n):
         **({'searchType': search_type} if search_type == 'image' else {}),
         'num': top_n
     }
-    response = requests.get(url, params=params)
+    response = _session.get(url, params=params, timeout=10)
     response.raise_for_status()
-    return response.json()
+    result = response.json()
+    with _cache_lock:
+        if len(_cache) >= CACHE_MAX_ENTRIES:
+            # the entry which expires first is the oldest one
+            del _cache[min(_cache, key=lambda k: _cache[k][0])]
+        _cache[key] = (time.monotonic() + CACHE_TTL_SECONDS, result)
+    return result
+
+def _is_image_reachable(url):
+    try:
+        return _session.head(url, timeout=2).status_code == 200
+    except requests.exceptions.RequestException:
+        return False
 
 def search_images(search_term, top_n):
     """
     Returns only images that have a 200 response code.
+    All links are checked at the same time, the result is returned as soon as the top_n best ranked valid links are known.
     """
-    response = google_search(search_term, search_type="image", top_n=10)
+    response = google_search(search_term, search_type="image", top_n=MAX_IMAGE_CANDIDATES)
+    links = [item["link"] for item in response.get("items", [])]
+    futures = [_executor.submit(_is_image_reachable, link) for link in links]
     image_urls = []
-    for item in response["items"]:
+    for link, future in zip(links, futures):
         if len(image_urls) >= top_n:
             break
-        try:
-            response = requests.head(item["link"], timeout=2)
-            if response.status_code == 200:
-                image_urls.append(
-                    item["link"]
-                )
-        except requests.exceptions.RequestException:
-            pass
+        if future.result():
+            image_urls.append(link)
+    for future in futures:
+        future.cancel()
     return image_urls
 
 def search_web(search_term, top_n):
@@ -1,24 +1,123 @@
+import hashlib
+import json
 import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
 import openai
+import requests
+from requests.adapters import HTTPAdapter
 
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
+# one keep-alive session for all requests (only used by openai versions which support requestssession)
+# a session which was installed by the importing application is kept
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=int(os.getenv('GPT_3_5_TURBO_MAX_CONNECTIONS', 16))))
+if getattr(openai, 'requestssession', None) is None:
+    openai.requestssession = _session
+
+RETRYABLE_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.APIConnectionError,
+    openai.error.Timeout,
+    openai.error.ServiceUnavailableError,
+    openai.error.APIError,
+)
+
+
+class _ResponseCache:
+    """LRU cache of the responses, shared by all instances. With a cache_dir, the responses survive restarts."""
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _put_in_memory(self, key, response, max_size):
+        with self.lock:
+            self.entries[key] = response
+            self.entries.move_to_end(key)
+            while len(self.entries) > max_size:
+                self.entries.popitem(last=False)
+
+    def get(self, key, max_size, cache_dir):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        if cache_dir:
+            try:
+                with open(os.path.join(cache_dir, f'{key}.json'), 'r', encoding='utf-8') as f:
+                    response = json.load(f)['response']
+            except (OSError, ValueError, KeyError):
+                return None
+            self._put_in_memory(key, response, max_size)
+            return response
+        return None
+
+    def put(self, key, response, max_size, cache_dir):
+        self._put_in_memory(key, response, max_size)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            path = os.path.join(cache_dir, f'{key}.json')
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'response': response}, f)
+            os.replace(tmp_path, path)
+
+
+_cache = _ResponseCache()
+
 
 class GPT_3_5_Turbo:
-    def __init__(self, system_string: str = ''):
+    """
+    Calls gpt-3.5-turbo with the system string and the prompt.
+    - identical system strings and prompts can be answered from a cache. It is disabled by default (cache_size=0),
+      since the answers are sampled and caching freezes the first answer for all identical prompts
+    - rate limits, timeouts and server errors are retried with jittered exponential backoff
+    The defaults can be set via environment variables, so that the code using this class does not need to change.
+    """
+    def __init__(
+            self, system_string: str = '',
+            timeout: float = float(os.getenv('GPT_3_5_TURBO_TIMEOUT_SECONDS', 60)),
+            max_retries: int = int(os.getenv('GPT_3_5_TURBO_MAX_RETRIES', 4)),
+            cache_size: int = int(os.getenv('GPT_3_5_TURBO_CACHE_SIZE', 0)),
+            cache_dir: str = os.getenv('GPT_3_5_TURBO_CACHE_DIR'),
+    ):
         self.system = system_string
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.cache_size = cache_size
+        self.cache_dir = cache_dir
 
-    def __call__(self, prompt_string: str) -> str:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{
-                "role": 'system',
-                "content": self.system
-            }, {
-                "role": 'user',
-                "content": prompt_string
-            }]
-        )
-        return response.choices[0]['message']['content']
+    def _create(self, prompt_string: str) -> str:
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = openai.ChatCompletion.create(
+                    model="gpt-3.5-turbo",
+                    messages=[{
+                        "role": 'system',
+                        "content": self.system
+                    }, {
+                        "role": 'user',
+                        "content": prompt_string
+                    }],
+                    request_timeout=self.timeout,
+                )
+                return response.choices[0]['message']['content']
+            except RETRYABLE_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(random.uniform(0, min(30, 2 ** attempt)))
 
+    def __call__(self, prompt_string: str) -> str:
+        if self.cache_size <= 0:
+            return self._create(prompt_string)
+        key = hashlib.sha256(json.dumps([self.system, prompt_string]).encode('utf-8')).hexdigest()
+        response = _cache.get(key, self.cache_size, self.cache_dir)
+        if response is None:
+            response = self._create(prompt_string)
+            _cache.put(key, response, self.cache_size, self.cache_dir)
+        return response
@@ -1,15 +1,161 @@
-from jina import Executor, requests as jina_requests, DocumentArray
+from jina import Executor, requests as jina_requests, Document, DocumentArray
+import asyncio
+import hashlib
+import inspect
 import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
 from .microservice import func
 
 
+class ResultCache:
+    """
+    LRU cache of the results of func, keyed by the hash of the input. Entries expire after ttl_seconds if given.
+    With a cache_dir, the results are also stored as files, so that the replicas on one node share them.
+    A cache_dir in /dev/shm keeps them in shared memory.
+    """
+    def __init__(self, size: int, ttl_seconds: Optional[float] = None, cache_dir: Optional[str] = None):
+        self.size = size
+        self.ttl_seconds = ttl_seconds
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _get_file_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def _read_file(self, key):
+        file_path = self._get_file_path(key)
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if entry['expires_at'] is not None and entry['expires_at'] < time.time():
+                os.remove(file_path)
+                return None
+            # the modification time is the last use of the entry for the other replicas
+            os.utime(file_path)
+            return entry['expires_at'], entry['result']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_file(self, key, entry):
+        file_path = self._get_file_path(key)
+        tmp_path = f'{file_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'expires_at': entry[0], 'result': entry[1]}, f)
+        os.replace(tmp_path, file_path)
+        file_entries = []
+        for dir_entry in os.scandir(self.cache_dir):
+            try:
+                if dir_entry.name.endswith('.json'):
+                    file_entries.append((dir_entry.stat().st_mtime, dir_entry.path))
+            except OSError:
+                pass
+        for _, path in sorted(file_entries)[:max(0, len(file_entries) - self.size)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _put_in_memory(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def get(self, text):
+        key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] < time.time():
+                del self.entries[key]
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if entry is None and self.cache_dir:
+            entry = self._read_file(key)
+            if entry is not None:
+                self._put_in_memory(key, entry)
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, text, result):
+        key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        entry = (time.time() + self.ttl_seconds if self.ttl_seconds else None, result)
+        self._put_in_memory(key, entry)
+        if self.cache_dir:
+            self._write_file(key, entry)
+
+    def get_stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries)}
+
+
 class DevGPTExecutor(Executor):
-    def __init__(self, **kwargs):
+    def __init__(
+            self,
+            max_concurrency: int = int(os.getenv('DEV_GPT_MAX_CONCURRENCY', 16)),
+            cache: bool = False,
+            cache_size: int = 1024,
+            cache_ttl_seconds: Optional[float] = None,
+            cache_dir: Optional[str] = None,
+            **kwargs
+    ):
         super().__init__(**kwargs)
+        # func usually waits for apis like gpt_3_5_turbo or google_custom_search, so the docs are processed concurrently
+        self.max_concurrency = max(1, max_concurrency)
+        self.thread_pool = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        # only enable the cache if func returns the same output for the same input
+        self.cache = ResultCache(cache_size, cache_ttl_seconds, cache_dir) if cache else None
+
+    async def _run_func(self, text, semaphore):
+        if self.cache is not None:
+            result = self.cache.get(text)
+            if result is not None:
+                return result
+        async with semaphore:
+            if inspect.iscoroutinefunction(func):
+                result = await func(text)
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(self.thread_pool, func, text)
+        if self.cache is not None:
+            self.cache.put(text, result)
+        return result
 
     @jina_requests()
-    def endpoint(self, docs: DocumentArray, **kwargs) -> DocumentArray:
-        for d in docs:
-            d.text = func(d.text)
+    async def endpoint(self, docs: DocumentArray, **kwargs) -> DocumentArray:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(*[self._run_func(d.text, semaphore) for d in docs], return_exceptions=True)
+        for d, result in zip(docs, results):
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result
+            if isinstance(result, Exception):
+                # a failing doc must not fail the other docs of the request
+                d.tags['error'] = f'{type(result).__name__}: {result}'
+                d.text = json.dumps({'error': d.tags['error']})
+            else:
+                d.text = result
         return docs
+
+    @jina_requests(on='/cache_stats')
+    def cache_stats(self, **kwargs) -> DocumentArray:
+        stats = self.cache.get_stats() if self.cache is not None else {}
+        return DocumentArray([Document(text=json.dumps({'enabled': self.cache is not None, **stats}))])
+
+    def close(self):
+        self.thread_pool.shutdown(wait=False)
+        super().close()
@@ -435,6 +435,46 @@ def func(input_json_dict_string: str) -> str:
 )
 
 
+
+template_implement_solution_code_issue_patch = PromptTemplate.from_template(
+    '''Here is the description of the task the function must solve:
+{task_description}
+
+Here is the test scenario the function must pass:
+{test_description}
+Here are all the files I use:
+{all_files_string}
+
+Implemented the suggested solution: {suggested_solution}
+
+Output the changes of all the files that need change as search/replace blocks. You must not change the Dockerfile.
+Don't output files that don't need change. Don't output the complete files.
+The SEARCH part must be a copy of the lines of the current file which are replaced, including comments and indentation.
+Keep the SEARCH part short, but make it long enough to be unique in the file.
+To add lines, search for the line before them and repeat it in the REPLACE part.
+Use the exact following syntax:
+
+**...**
+```
+<<<<<<< SEARCH
+...lines of the current file...
+=======
+...new lines...
+>>>>>>> REPLACE
+```
+
+Example:
+**microservice.py**
+```
+<<<<<<< SEARCH
+    return json.dumps({{'output_param1': input_json_dict_string['img_base64']}})
+=======
+    input_json_dict = json.loads(input_json_dict_string)
+    return json.dumps({{'output_param1': input_json_dict['img_base64']}})
+>>>>>>> REPLACE
+```'''
+)
+
 template_generate_playground = PromptTemplate.from_template(
     general_guidelines_string + '''👨‍💻
 
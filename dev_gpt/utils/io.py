@@ -3,6 +3,7 @@ import re
 
 import subprocess
 import sys
+import tempfile
 from contextlib import contextmanager
 
 
@@ -12,9 +13,30 @@ def get_microservice_path(path, microservice_name, packages, num_approach, versi
     package_path = invalid_chars_regex.sub('', package_path)
     return os.path.join(path, microservice_name, f'{num_approach}_{package_path}', f'v{version}')
 
+def get_cache_dir(*sub_dirs):
+    """
+    Returns the per-user cache directory of dev-gpt and creates it if it does not exist yet.
+    The location follows XDG_CACHE_HOME and falls back to ~/.cache.
+    """
+    cache_root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    cache_dir = os.path.join(cache_root, 'dev-gpt', *sub_dirs)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
 def persist_file(file_content, file_path):
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(file_content)
+    # the file is replaced instead of overwritten, since it can be a read-only hardlink shared with other versions
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(file_path) or '.', prefix=f'.{os.path.basename(file_path)}.', suffix='.tmp'
+    )
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(file_content)
+        # mkstemp creates the file only readable by the owner
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
 
 
 def get_all_microservice_files_with_content(folder_path):
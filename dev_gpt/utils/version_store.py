@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+
+STORE_DIR_NAME = '.store'
+LATEST_VERSION_FILE_NAME = 'latest_version.json'
+
+
+def _get_tmp_path(path):
+    """Returns a new temporary path next to path, unique across threads and processes."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    os.close(fd)
+    return tmp_path
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = _get_tmp_path(path)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _write_blob(content, blob_path):
+    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+    tmp_path = _get_tmp_path(blob_path)
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    # the blob is shared by the versions, a write to one of their files must fail instead of changing all of them
+    os.chmod(tmp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+    os.replace(tmp_path, blob_path)
+
+
+def _link_or_copy(source_path, destination_path):
+    """Hardlinks the file and copies it where hardlinks are not possible (e.g. other file systems)."""
+    tmp_path = _get_tmp_path(destination_path)
+    os.remove(tmp_path)
+    try:
+        os.link(source_path, tmp_path)
+    except OSError:
+        shutil.copyfile(source_path, tmp_path)
+    os.replace(tmp_path, destination_path)
+
+
+class VersionStore:
+    """
+    Content-addressed store for the files of all versions of a microservice, located in <microservice root>/.store
+    - blobs/<hash>: the content of each distinct file, stored only once
+    - manifests/<version path>.json: the files of a version and the hashes of their contents
+    - latest_version.json: the path of the final version
+    The blobs are read-only copies and the files in the intermediate version directories are hardlinks to them,
+    so a new version which changes one file only writes that file. Files must therefore be replaced
+    (see persist_file), writing to them in place fails.
+    The files of the final version (see set_latest_version) are regular copies which can be edited.
+    """
+    def __init__(self, root_path):
+        self.root_path = root_path
+        self.store_path = os.path.join(root_path, STORE_DIR_NAME)
+        self.blobs_path = os.path.join(self.store_path, 'blobs')
+
+    def _get_blob_path(self, digest):
+        return os.path.join(self.blobs_path, digest[:2], digest)
+
+    def _get_manifest_path(self, version_path):
+        relative_path = os.path.relpath(version_path, self.root_path)
+        return os.path.join(self.store_path, 'manifests', f'{relative_path}.json')
+
+    def _add_content(self, content):
+        digest = hashlib.sha256(content).hexdigest()
+        blob_path = self._get_blob_path(digest)
+        if not os.path.exists(blob_path):
+            _write_blob(content, blob_path)
+        return digest, blob_path
+
+    def add_file(self, file_path):
+        """Copies the content of the file into the store and replaces the file with a link to it. Returns the hash."""
+        with open(file_path, 'rb') as f:
+            digest, blob_path = self._add_content(f.read())
+        if not os.path.samefile(file_path, blob_path):
+            _link_or_copy(blob_path, file_path)
+        return digest
+
+    def link_file(self, source_path, destination_path):
+        """
+        Places a file with the content of source_path (e.g. a static file of dev-gpt) at destination_path,
+        sharing the content via the store. Unlike add_file, source_path itself is left unchanged.
+        """
+        with open(source_path, 'rb') as f:
+            _, blob_path = self._add_content(f.read())
+        _link_or_copy(blob_path, destination_path)
+
+    def commit_version(self, version_path):
+        """Adds all files of the version to the store, writes its manifest and returns the files with their hashes."""
+        files = {}
+        for directory, _, file_names in os.walk(version_path):
+            for file_name in file_names:
+                file_path = os.path.join(directory, file_name)
+                files[os.path.relpath(file_path, version_path)] = self.add_file(file_path)
+        _write_json(self._get_manifest_path(version_path), {'files': files})
+        return files
+
+    def create_version(self, previous_version_path, version_path):
+        """Creates the new version with the files of the previous version, linked instead of copied."""
+        files = self.commit_version(previous_version_path)
+        os.makedirs(version_path, exist_ok=True)
+        for relative_path, digest in files.items():
+            file_path = os.path.join(version_path, relative_path)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            _link_or_copy(self._get_blob_path(digest), file_path)
+
+    def set_latest_version(self, version_path):
+        """Records the final version and replaces its links by writable copies, so that the user can edit them."""
+        files = self.commit_version(version_path)
+        for relative_path, digest in files.items():
+            file_path = os.path.join(version_path, relative_path)
+            tmp_path = _get_tmp_path(file_path)
+            shutil.copyfile(self._get_blob_path(digest), tmp_path)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, file_path)
+        _write_json(
+            os.path.join(self.store_path, LATEST_VERSION_FILE_NAME),
+            {'path': os.path.relpath(version_path, self.root_path)}
+        )
+
+
+def get_latest_version_from_store(root_path):
+    """Returns the path of the final version of the microservice or None if it was not recorded in the store."""
+    try:
+        with open(os.path.join(root_path, STORE_DIR_NAME, LATEST_VERSION_FILE_NAME), 'r', encoding='utf-8') as f:
+            return os.path.join(root_path, json.load(f)['path'])
+    except (OSError, ValueError, KeyError):
+        return None
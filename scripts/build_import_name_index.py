@@ -0,0 +1,122 @@
+"""
+Builds dev_gpt/options/generate/static_files/import_name_to_distribution.txt from the top_level.txt of wheels on PyPI.
+Only the zip directory and the metadata files are downloaded via HTTP range requests, not the complete wheels.
+
+python scripts/build_import_name_index.py [--distributions-file scripts/import_name_index_distributions.txt]
+"""
+import argparse
+import io
+import os
+import sys
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+from dev_gpt.apis import pypi
+from dev_gpt.apis.import_names import IMPORT_NAME_INDEX_PATH
+from dev_gpt.apis.pypi import PyPIClient
+
+DEFAULT_DISTRIBUTIONS_FILE = os.path.join(os.path.dirname(__file__), 'import_name_index_distributions.txt')
+# top-level names which are shipped by accident and do not identify a distribution
+IGNORED_TOP_LEVEL_NAMES = {'test', 'tests', 'testing', 'doc', 'docs', 'example', 'examples', 'benchmarks', 'scripts', 'tools', 'src'}
+# namespace packages are shared by many distributions, the import name alone does not tell which one is needed
+NAMESPACE_PACKAGES = {'google', 'azure', 'jaraco', 'backports', 'sphinxcontrib', 'zope', 'ruamel'}
+
+
+class HttpRangeFile(io.RawIOBase):
+    """Read-only file which fetches the requested bytes of a remote file with range requests."""
+    def __init__(self, session, url):
+        self.session = session
+        self.url = url
+        self.position = 0
+        self.size = int(session.head(url, allow_redirects=True).headers['Content-Length'])
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self.position = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence] + offset
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def readinto(self, buffer):
+        end = min(self.position + len(buffer), self.size) - 1
+        if end < self.position:
+            return 0
+        response = self.session.get(self.url, headers={'Range': f'bytes={self.position}-{end}'})
+        data = response.content[:len(buffer)]
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+def get_top_level_names(client, distribution):
+    project = client.get_project(distribution)
+    if project is None:
+        return distribution, []
+    wheels = [file for file in project['urls'] if file['packagetype'] == 'bdist_wheel']
+    if not wheels:
+        return distribution, []
+    # pure python wheels are small, but any wheel has the same top-level names
+    wheel = next((file for file in wheels if file['filename'].endswith('-none-any.whl')), wheels[0])
+    # mirrors can return urls relative to the project page
+    wheel_url = urljoin(f'{pypi.PYPI_URL}/pypi/{distribution}/json', wheel['url'])
+    with zipfile.ZipFile(io.BufferedReader(HttpRangeFile(client.session, wheel_url), buffer_size=64 * 1024)) as archive:
+        names = archive.namelist()
+        top_level_files = [name for name in names if name.endswith('.dist-info/top_level.txt')]
+        if top_level_files:
+            top_level_names = archive.read(top_level_files[0]).decode('utf-8').split()
+        else:
+            # newer build backends do not write top_level.txt, the file list tells the same
+            top_level_names = {
+                name.split('/')[0] if '/' in name else name[:-len('.py')]
+                for name in names
+                if ('/' in name or name.endswith('.py')) and '.dist-info/' not in name and '.data/' not in name
+            }
+    return project['info']['name'], [name.replace('/', '.').split('.')[0] for name in top_level_names]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--distributions-file', default=DEFAULT_DISTRIBUTIONS_FILE)
+    parser.add_argument('--output', default=IMPORT_NAME_INDEX_PATH)
+    args = parser.parse_args()
+
+    with open(args.distributions_file, 'r', encoding='utf-8') as f:
+        distributions = list(dict.fromkeys(f.read().split()))
+    client = PyPIClient()
+    client.prefetch(distributions)
+
+    def get_top_level_names_or_nothing(distribution):
+        try:
+            return get_top_level_names(client, distribution)
+        except Exception as e:
+            print(f'skipping {distribution}: {e}', file=sys.stderr)
+            return distribution, []
+
+    index = {}
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        # executor.map keeps the order of the distributions file
+        for distribution, top_level_names in executor.map(get_top_level_names_or_nothing, distributions):
+            for import_name in top_level_names:
+                if import_name.isidentifier() and not import_name.startswith('_') \
+                        and import_name not in IGNORED_TOP_LEVEL_NAMES \
+                        and import_name not in NAMESPACE_PACKAGES \
+                        and import_name not in sys.stdlib_module_names:
+                    # several distributions can provide the same name (e.g. opencv-python and opencv-python-headless),
+                    # the one listed first in the distributions file is preferred
+                    index.setdefault(import_name, distribution.lower())
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(f'# import name -> distribution, built by scripts/build_import_name_index.py from {len(distributions)} distributions\n')
+        for import_name in sorted(index):
+            f.write(f'{import_name} {index[import_name]}\n')
+    print(f'wrote {len(index)} import names to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
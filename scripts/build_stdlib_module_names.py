@@ -0,0 +1,31 @@
+"""
+Builds dev_gpt/options/generate/static_files/stdlib_module_names.txt from sys.stdlib_module_names.
+Python < 3.10 has no sys.stdlib_module_names and uses this file instead.
+Modules of former Python versions are kept, so run this with the newest Python.
+
+python scripts/build_stdlib_module_names.py
+"""
+import os
+import sys
+
+from dev_gpt.apis.import_names import STDLIB_MODULE_NAMES_PATH
+
+# modules of the supported Python versions (3.8+) which were removed before 3.10
+REMOVED_MODULES = {'_dummy_thread', 'dummy_threading', 'formatter', 'parser', 'symbol', 'binhex'}
+
+
+def main():
+    if not hasattr(sys, 'stdlib_module_names'):
+        sys.exit('Python 3.10 or newer is needed to build the list of standard library modules')
+    names = set(sys.stdlib_module_names) | REMOVED_MODULES
+    if os.path.exists(STDLIB_MODULE_NAMES_PATH):
+        with open(STDLIB_MODULE_NAMES_PATH, 'r', encoding='utf-8') as f:
+            names.update(line.strip() for line in f if line.strip() and not line.startswith('#'))
+    with open(STDLIB_MODULE_NAMES_PATH, 'w', encoding='utf-8') as f:
+        f.write(f'# standard library modules, built by scripts/build_stdlib_module_names.py with Python {sys.version_info.major}.{sys.version_info.minor}\n')
+        f.write('\n'.join(sorted(names)) + '\n')
+    print(f'{len(names)} modules written to {STDLIB_MODULE_NAMES_PATH}')
+
+
+if __name__ == '__main__':
+    main()
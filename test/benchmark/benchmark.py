@@ -0,0 +1,172 @@
+"""
+Offline benchmark of the generation pipeline.
+The scenarios of the integration tests are replayed from recorded transcripts against a local stand-in
+for OpenAI, Hubble and PyPI, so that the pipeline can be measured deterministically and without API keys.
+The transcript of level_0 is synthetic: the responses were written by hand and recorded against a scripted server.
+
+Record a transcript (needs OPENAI_API_KEY and access to Jina Cloud):
+    python -m test.benchmark.benchmark --record --scenarios level_0
+Replay all recorded scenarios:
+    python -m test.benchmark.benchmark --output benchmark.json
+
+Token counts are exact if the tiktoken encodings are available and estimated otherwise.
+"""
+import argparse
+import builtins
+import contextlib
+import functools
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from unittest import mock
+
+import openai
+
+from dev_gpt.apis import gpt, jina_cloud, pypi
+from dev_gpt.options.generate import generator as generator_module, ui
+from dev_gpt.options.generate.generator import Generator
+from dev_gpt.options.generate.pm.pm import PM
+from test.benchmark.fake_services import FakeServices, is_chat_request
+from test.integration.scenarios import SCENARIOS
+
+TRANSCRIPT_DIR = os.path.join(os.path.dirname(__file__), 'transcripts')
+STAGES = [
+    (PM, 'refine_specification'),
+    (Generator, 'generate_microservice_name'),
+    (Generator, 'get_possible_packages'),
+    (Generator, 'generate_microservice'),
+    (Generator, 'debug_microservice'),
+    (Generator, 'generate_playground'),
+]
+METRICS = ['wall_time', 'llm_calls', 'prompt_tokens', 'completion_tokens', 'retries', 'remote_builds']
+
+
+def get_transcript_path(scenario_name):
+    return os.path.join(TRANSCRIPT_DIR, f'{scenario_name}.jsonl')
+
+
+class BenchmarkMetrics:
+    """Collects the metrics per stage. Requests are attributed to the stage which is running when they arrive."""
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._running_stages = []
+
+    def _get_stage(self, stage_name):
+        return self.stages.setdefault(stage_name, {metric: 0 for metric in METRICS})
+
+    def on_request(self, key, path, status):
+        with self._lock:
+            stage = self._get_stage(self._running_stages[-1] if self._running_stages else 'other')
+            if is_chat_request(key):
+                if status == 200:
+                    stage['llm_calls'] += 1
+                else:
+                    stage['retries'] += 1
+            elif path.startswith('/v2/rpc/executor.push'):
+                stage['remote_builds'] += 1
+
+    def wrap_stage(self, stage_name, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            session = gpt.GPTSession._instance
+            prompt_tokens_before = session.prompt_tokens_so_far
+            completion_tokens_before = session.completion_tokens_so_far
+            with self._lock:
+                self._running_stages.append(stage_name)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running_stages.remove(stage_name)
+                    stage = self._get_stage(stage_name)
+                    stage['wall_time'] += time.perf_counter() - start
+                    stage['prompt_tokens'] += session.prompt_tokens_so_far - prompt_tokens_before
+                    stage['completion_tokens'] += session.completion_tokens_so_far - completion_tokens_before
+        return wrapper
+
+
+def run_scenario(scenario_name, record=False):
+    """Runs the generation of a scenario against the fake services and returns the report."""
+    scenario = SCENARIOS[scenario_name]
+    metrics = BenchmarkMetrics()
+    os.makedirs(TRANSCRIPT_DIR, exist_ok=True)
+    inputs = iter(scenario['inputs'])
+    with contextlib.ExitStack() as stack:
+        services = stack.enter_context(FakeServices(get_transcript_path(scenario_name), record, metrics.on_request))
+        tmp_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        env = {'VERBOSE': 'false'}
+        if not record:
+            env['OPENAI_API_KEY'] = os.environ.get('OPENAI_API_KEY', 'benchmark')
+        stack.enter_context(mock.patch.dict(os.environ, env))
+        stack.enter_context(mock.patch.object(openai, 'api_base', f'{services.url}/v1'))
+        stack.enter_context(mock.patch.object(jina_cloud, 'HUBBLE_API_URL', services.url))
+        stack.enter_context(mock.patch.object(pypi, 'PYPI_URL', services.url))
+        # an empty metadata cache makes the PyPI requests independent of earlier runs
+        stack.enter_context(mock.patch.object(pypi, '_pypi_client', pypi.PyPIClient(cache_dir=os.path.join(tmp_dir, 'pypi'))))
+        stack.enter_context(mock.patch.object(builtins, 'input', lambda *args: next(inputs)))
+        # the microservice name and the product manager are random and can be part of later prompts
+        stack.enter_context(mock.patch.object(generator_module, 'random', random.Random(0)))
+        stack.enter_context(mock.patch.object(ui, 'random', random.Random(0)))
+        # every scenario starts a new session
+        stack.enter_context(mock.patch.object(gpt.GPTSession, '_instance', None))
+        stack.enter_context(mock.patch.object(gpt.GPTSession, '_initialized', False))
+        for cls, method_name in STAGES:
+            stack.enter_context(mock.patch.object(
+                cls, method_name, metrics.wrap_stage(method_name, getattr(cls, method_name))
+            ))
+
+        start = time.perf_counter()
+        generator = Generator(
+            scenario['description'], os.path.join(tmp_dir, 'microservice'), scenario['model'], llm_cache=False,
+            fix_knowledge_base=False,
+        )
+        result = generator.generate()
+        return {
+            'scenario': scenario_name,
+            'result': result,
+            'wall_time': time.perf_counter() - start,
+            'unmatched_chat_requests': services.unmatched_chat_requests,
+            'stages': metrics.stages,
+        }
+
+
+def format_report(reports):
+    lines = []
+    for report in reports:
+        lines.append(
+            f"{report['scenario']}: result {report['result']}, {report['wall_time']:.1f}s, "
+            f"{report['unmatched_chat_requests']} unmatched chat requests"
+        )
+        lines.append(f"  {'stage':<28}" + ''.join(f'{metric:>19}' for metric in METRICS))
+        for stage_name, stage in report['stages'].items():
+            values = ''.join(
+                f'{stage[metric]:>19.2f}' if metric == 'wall_time' else f'{stage[metric]:>19}' for metric in METRICS
+            )
+            lines.append(f'  {stage_name:<28}{values}')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the generation pipeline with recorded transcripts.')
+    parser.add_argument('--scenarios', nargs='*', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--record', action='store_true', help='record new transcripts with the real services')
+    parser.add_argument('--output', default=None, help='write the report as json to this file')
+    args = parser.parse_args()
+
+    scenario_names = args.scenarios if args.record else [
+        name for name in args.scenarios if os.path.exists(get_transcript_path(name))
+    ]
+    reports = [run_scenario(name, record=args.record) for name in scenario_names]
+    print(format_report(reports))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Local stand-in for OpenAI, Hubble and PyPI.
+In record mode, the requests are forwarded to the real services and the responses are written to a transcript.
+In replay mode, the responses are served from the transcript without any network access.
+"""
+import hashlib
+import json
+import threading
+from collections import defaultdict, deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+UPSTREAMS = {
+    '/v1/': 'https://api.openai.com',
+    '/v2/rpc/': 'https://api.hubble.jina.ai',
+    '/pypi/': 'https://pypi.org',
+}
+SKIPPED_HEADERS = {'host', 'content-length', 'content-encoding', 'transfer-encoding', 'connection', 'accept-encoding'}
+# recorded waiting times are not replayed
+REPLAYED_WAITING_HEADERS = {'retry-after': '0'}
+DROPPED_WAITING_HEADERS = {'retry-after-ms', 'x-ratelimit-reset-requests', 'x-ratelimit-reset-tokens'}
+
+
+def get_request_key(method, path, body):
+    """
+    Chat completions are identified by model and messages, all other requests by method and path.
+    The body of a push contains an archive with timestamps, therefore pushes are replayed in order.
+    """
+    if path.startswith('/v1/chat/completions'):
+        request = json.loads(body)
+        messages = [[message['role'], message['content']] for message in request['messages']]
+        return 'chat:' + hashlib.sha256(json.dumps([request['model'], messages]).encode('utf-8')).hexdigest()
+    return f'{method}:{path}'
+
+
+def is_chat_request(key):
+    return key.startswith('chat:')
+
+
+class FakeServices:
+    def __init__(self, transcript_path, record=False, on_request=None):
+        """
+        :param transcript_path: JSONL file with one recorded response per line
+        :param record: forward requests to the real services and write the transcript
+        :param on_request: called with (key, path, status) for every request, e.g. to collect metrics
+        """
+        self.transcript_path = transcript_path
+        self.record = record
+        self.on_request = on_request
+        self.unmatched_chat_requests = 0
+        self._lock = threading.Lock()
+        self._responses = defaultdict(deque)
+        self._last_responses = {}
+        self._chat_responses_in_order = deque()
+        if record:
+            open(transcript_path, 'w').close()
+        else:
+            self._load_transcript()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._create_handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _load_transcript(self):
+        with open(self.transcript_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                recorded = json.loads(line)
+                self._responses[recorded['key']].append(recorded)
+                if is_chat_request(recorded['key']):
+                    self._chat_responses_in_order.append(recorded)
+
+    def _forward(self, method, path, headers, body):
+        upstream = next(url for prefix, url in UPSTREAMS.items() if path.startswith(prefix))
+        response = requests.request(method, upstream + path, headers=headers, data=body, timeout=30 * 60)
+        return {
+            'status': response.status_code,
+            'headers': {k: v for k, v in response.headers.items() if k.lower() not in SKIPPED_HEADERS},
+            'body': response.content.decode('utf-8', errors='replace'),
+        }
+
+    def _replay(self, key):
+        with self._lock:
+            queue = self._responses.get(key)
+            if queue:
+                recorded = queue.popleft()
+                if is_chat_request(key):
+                    self._chat_responses_in_order.remove(recorded)
+            elif is_chat_request(key) and self._chat_responses_in_order:
+                # the prompt differs from the recording, e.g. because of a changed template
+                self.unmatched_chat_requests += 1
+                recorded = self._chat_responses_in_order.popleft()
+                self._responses[recorded['key']].remove(recorded)
+            elif key in self._last_responses:
+                # e.g. polling the executor list more often than during the recording
+                recorded = self._last_responses[key]
+            else:
+                return {'status': 404, 'headers': {}, 'body': f'no recorded response for {key}'}
+            self._last_responses[key] = recorded
+            return recorded
+
+    def _handle(self, method, path, headers, body):
+        key = get_request_key(method, path, body)
+        if self.record:
+            response = self._forward(method, path, headers, body)
+            with self._lock:
+                with open(self.transcript_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'key': key, 'path': path, **response}) + '\n')
+        else:
+            response = self._replay(key)
+        if self.on_request is not None:
+            self.on_request(key, path, response['status'])
+        return response
+
+    def _create_handler(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                headers = {k: v for k, v in self.headers.items() if k.lower() not in SKIPPED_HEADERS}
+                response = services._handle(self.command, self.path, headers, body)
+                response_body = response['body'].encode('utf-8')
+                self.send_response(response['status'])
+                for name, value in response['headers'].items():
+                    if name.lower() in DROPPED_WAITING_HEADERS:
+                        continue
+                    self.send_header(name, REPLAYED_WAITING_HEADERS.get(name.lower(), value))
+                self.send_header('Content-Length', str(len(response_body)))
+                self.end_headers()
+                self.wfile.write(response_body)
+
+            do_GET = _respond
+            do_POST = _respond
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
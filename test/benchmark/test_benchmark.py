@@ -0,0 +1,15 @@
+import os
+
+import pytest
+
+from test.benchmark.benchmark import run_scenario, format_report, get_transcript_path
+from test.integration.scenarios import SCENARIOS
+
+
+@pytest.mark.parametrize('scenario_name', list(SCENARIOS))
+def test_generation_benchmark(scenario_name):
+    if not os.path.exists(get_transcript_path(scenario_name)):
+        pytest.skip(f'no transcript recorded for {scenario_name}')
+    report = run_scenario(scenario_name)
+    print(format_report([report]))
+    assert report['result'] == 0
@@ -0,0 +1,50 @@
+import json
+from unittest import mock
+
+import openai
+from langchain.schema import SystemMessage
+
+from dev_gpt.apis import gpt
+from test.benchmark.benchmark import BenchmarkMetrics
+from test.benchmark.fake_services import FakeServices, get_request_key
+
+
+def get_stream_body(text):
+    chunks = [
+        {'choices': [{'index': 0, 'delta': {'content': part}, 'finish_reason': None}]}
+        for part in [text[:3], text[3:]]
+    ]
+    return ''.join(f'data: {json.dumps(chunk)}\n\n' for chunk in chunks) + 'data: [DONE]\n\n'
+
+
+def test_recorded_chat_is_replayed_including_retries(tmpdir, monkeypatch):
+    monkeypatch.setenv('VERBOSE', 'false')
+    # nothing is sent to OpenAI, but the client needs a key
+    monkeypatch.setenv('OPENAI_API_KEY', 'benchmark')
+    messages = [{'role': 'system', 'content': 'You are a helpful assistant.'}, {'role': 'user', 'content': 'hi'}]
+    key = get_request_key('POST', '/v1/chat/completions', json.dumps({'model': 'gpt-3.5-turbo', 'messages': messages}))
+    transcript_path = str(tmpdir.join('transcript.jsonl'))
+    with open(transcript_path, 'w') as f:
+        f.write(json.dumps({
+            'key': key, 'path': '/v1/chat/completions', 'status': 429,
+            'headers': {'Content-Type': 'application/json', 'retry-after': '20'},
+            'body': json.dumps({'error': {'message': 'Rate limit reached', 'type': 'requests'}}),
+        }) + '\n')
+        f.write(json.dumps({
+            'key': key, 'path': '/v1/chat/completions', 'status': 200,
+            'headers': {'Content-Type': 'text/event-stream'}, 'body': get_stream_body('hello there'),
+        }) + '\n')
+
+    metrics = BenchmarkMetrics()
+    with FakeServices(transcript_path, on_request=metrics.on_request) as services, \
+            mock.patch.object(openai, 'api_base', f'{services.url}/v1'), \
+            mock.patch.object(gpt.GPTSession, '_instance', None), \
+            mock.patch.object(gpt.GPTSession, '_initialized', False):
+        session = gpt.GPTSession(str(tmpdir.join('log.jsonl')), model='gpt-3.5-turbo', llm_cache=False)
+        conversation = session.get_conversation(
+            messages=[SystemMessage(content='You are a helpful assistant.')], print_stream=False
+        )
+        assert conversation.chat('hi') == 'hello there'
+    assert services.unmatched_chat_requests == 0
+    assert metrics.stages['other']['llm_calls'] == 1
+    assert metrics.stages['other']['retries'] == 1
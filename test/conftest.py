@@ -39,4 +39,4 @@ def microservice_dir(tmpdir) -> str:
 @pytest.fixture
 def init_gpt(tmpdir):
     os.environ['VERBOSE'] = 'true'
-    GPTSession(os.path.join(str(tmpdir), 'log.json'), model='gpt-3.5-turbo')
+    GPTSession(os.path.join(str(tmpdir), 'log.jsonl'), model='gpt-3.5-turbo')
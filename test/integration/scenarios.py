@@ -0,0 +1,57 @@
+"""
+The generation scenarios of test/integration/test_generator.py.
+They are also replayed offline from recorded transcripts by test/benchmark.
+"""
+
+SCENARIOS = {
+    'level_0': {
+        'description': "The microservice is very simple, it does not take anything as input and only outputs the word 'test'",
+        'inputs': ['y'],
+        'model': 'gpt-3.5-turbo',
+    },
+    'level_1': {
+        'description': '''Input is a tweet that contains passive aggressive language. The output is the positive version of that tweet.''',
+        'inputs': ['y'],
+        'model': 'gpt-3.5-turbo',
+    },
+    'level_2': {
+        'description': "The input is a PDF and the output the summarized text.",
+        'inputs': ['y', 'https://www.africau.edu/images/default/sample.pdf'],
+        'model': 'gpt-3.5-turbo',
+    },
+    'level_2_svg': {
+        'description': "Get a png as input and return a vectorized version as svg.",
+        'inputs': ['y', 'https://upload.wikimedia.org/wikipedia/commons/4/47/PNG_transparency_demonstration_1.png'],
+        'model': 'gpt-3.5-turbo',
+    },
+    'level_3': {
+        'description': f'''The input is a stock symbol (e.g., AAPL for Apple Inc.).
+1. Fetch stock data (open, high, low, close, volume) for the past 30 days using a financial data API Yahoo Finance.
+2. Calculate the average closing price over the 30 days.
+3. Generate a brief summary of the company's stock performance over the past 30 days, including the average closing price and the company name.
+4. Return the summary as a string.
+Example input: 'AAPL'
+''',
+        'inputs': ['y', 'ticker = yf.Ticker(symbol); data = ticker.history(start=start_date, end=end_date); [row[\'Close\'] for row in data.to_dict(\'records\')]'],
+        'model': 'gpt-3.5-turbo',
+    },
+    'level_4': {
+        'description': f'''Given an audio file (1min wav) of speech,
+1. convert it to text using the Whisper API.
+2. Summarize the text (~50 words) while still maintaining the key facts.
+3. Create an audio file of the summarized text using a tts library.
+4. Return the the audio file as base64 encoded binary.
+''',
+        'inputs': ['y', 'https://www2.cs.uic.edu/~i101/SoundFiles/taunt.wav', 'use any library'],
+        'model': 'gpt-4',
+    },
+    'level_5_company_logos': {
+        'description': '''\
+Given a list of email addresses, get all unique company names from them.
+For all companies, get the company logo.
+All logos need to be arranged on a square.
+The square is returned as png.''',
+        'inputs': ['y'],
+        'model': 'gpt-3.5-turbo',
+    },
+}
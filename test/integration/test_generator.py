@@ -3,11 +3,12 @@ import os
 import pytest
 
 from dev_gpt.options.generate.generator import Generator
+from test.integration.scenarios import SCENARIOS
 
 
 # The cognitive difficulty level is determined by the number of requirements the microservice has.
 
-@pytest.mark.parametrize('mock_input_sequence', [['y']], indirect=True)
+@pytest.mark.parametrize('mock_input_sequence', [SCENARIOS['level_0']['inputs']], indirect=True)
 def test_generation_level_0(microservice_dir, mock_input_sequence):
     """
     Requirements:
@@ -20,15 +21,15 @@ def test_generation_level_0(microservice_dir, mock_input_sequence):
     """
     os.environ['VERBOSE'] = 'true'
     generator = Generator(
-        "The microservice is very simple, it does not take anything as input and only outputs the word 'test'",
-        microservice_dir,
-        'gpt-3.5-turbo',
+        SCENARIOS['level_0']['description'],
+        str(microservice_dir),
+        SCENARIOS['level_0']['model'],
         # self_healing=False,
     )
     assert generator.generate() == 0
 
 
-@pytest.mark.parametrize('mock_input_sequence', [['y']], indirect=True)
+@pytest.mark.parametrize('mock_input_sequence', [SCENARIOS['level_1']['inputs']], indirect=True)
 def test_generation_level_1(microservice_dir, mock_input_sequence):
     """
     Requirements:
@@ -41,16 +42,15 @@ def test_generation_level_1(microservice_dir, mock_input_sequence):
     """
     os.environ['VERBOSE'] = 'true'
     generator = Generator(
-        '''Input is a tweet that contains passive aggressive language. The output is the positive version of that tweet.''',
+        SCENARIOS['level_1']['description'],
         str(microservice_dir),
-        'gpt-3.5-turbo',
+        SCENARIOS['level_1']['model'],
         # self_healing=False,
     )
     assert generator.generate() == 0
 
 
-@pytest.mark.parametrize('mock_input_sequence', [['y', 'https://www.africau.edu/images/default/sample.pdf']],
-                         indirect=True)
+@pytest.mark.parametrize('mock_input_sequence', [SCENARIOS['level_2']['inputs']], indirect=True)
 def test_generation_level_2(microservice_dir, mock_input_sequence):
     """
     Requirements:
@@ -63,16 +63,15 @@ def test_generation_level_2(microservice_dir, mock_input_sequence):
     """
     os.environ['VERBOSE'] = 'true'
     generator = Generator(
-        "The input is a PDF and the output the summarized text.",
+        SCENARIOS['level_2']['description'],
         str(microservice_dir),
-        'gpt-3.5-turbo',
+        SCENARIOS['level_2']['model'],
         # self_healing=False,
     )
     assert generator.generate() == 0
 
 
-@pytest.mark.parametrize('mock_input_sequence', [
-    ['y', 'https://upload.wikimedia.org/wikipedia/commons/4/47/PNG_transparency_demonstration_1.png']], indirect=True)
+@pytest.mark.parametrize('mock_input_sequence', [SCENARIOS['level_2_svg']['inputs']], indirect=True)
 def test_generation_level_2_svg(microservice_dir, mock_input_sequence):
     """
     Requirements:
@@ -85,15 +84,15 @@ def test_generation_level_2_svg(microservice_dir, mock_input_sequence):
     """
     os.environ['VERBOSE'] = 'true'
     generator = Generator(
-        "Get a png as input and return a vectorized version as svg.",
+        SCENARIOS['level_2_svg']['description'],
         str(microservice_dir),
-        'gpt-3.5-turbo',
+        SCENARIOS['level_2_svg']['model'],
         # self_healing=False,
     )
     assert generator.generate() == 0
 
 
-@pytest.mark.parametrize('mock_input_sequence', [['y', 'ticker = yf.Ticker(symbol); data = ticker.history(start=start_date, end=end_date); [row[\'Close\'] for row in data.to_dict(\'records\')]']], indirect=True)
+@pytest.mark.parametrize('mock_input_sequence', [SCENARIOS['level_3']['inputs']], indirect=True)
 def test_generation_level_3(microservice_dir, mock_input_sequence):
     """
     Requirements:
@@ -106,15 +105,9 @@ def test_generation_level_3(microservice_dir, mock_input_sequence):
     """
     os.environ['VERBOSE'] = 'true'
     generator = Generator(
-        f'''The input is a stock symbol (e.g., AAPL for Apple Inc.). 
-1. Fetch stock data (open, high, low, close, volume) for the past 30 days using a financial data API Yahoo Finance.
-2. Calculate the average closing price over the 30 days.
-3. Generate a brief summary of the company's stock performance over the past 30 days, including the average closing price and the company name.
-4. Return the summary as a string.
-Example input: 'AAPL'
-''',
+        SCENARIOS['level_3']['description'],
         str(microservice_dir),
-        'gpt-3.5-turbo',
+        SCENARIOS['level_3']['model'],
         # self_healing=False,
     )
     assert generator.generate() == 0
@@ -172,17 +165,13 @@ Example input: 'AAPL'
 #     assert generator.generate() == 0
 
 
-@pytest.mark.parametrize('mock_input_sequence', [['y']], indirect=True)
+@pytest.mark.parametrize('mock_input_sequence', [SCENARIOS['level_5_company_logos']['inputs']], indirect=True)
 def test_generation_level_5_company_logos(microservice_dir, mock_input_sequence):
     os.environ['VERBOSE'] = 'true'
     generator = Generator(
-        f'''\
-Given a list of email addresses, get all unique company names from them.
-For all companies, get the company logo.
-All logos need to be arranged on a square.
-The square is returned as png.''',
+        SCENARIOS['level_5_company_logos']['description'],
         str(microservice_dir),
-        'gpt-3.5-turbo',
+        SCENARIOS['level_5_company_logos']['model'],
         # self_healing=False,
     )
     assert generator.generate() == 0
@@ -0,0 +1,31 @@
+import os
+
+from dev_gpt.apis.gpt import GPTSession
+from dev_gpt.options.generate.generator import Generator
+from dev_gpt.utils.io import get_microservice_path
+
+
+def test_resume_restores_state_and_removes_incomplete_versions(microservice_dir, tmpdir, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', os.path.join(str(tmpdir), 'cache'))
+    monkeypatch.setattr(GPTSession, 'is_gpt4_available', staticmethod(lambda: False))
+    generator = Generator('task', microservice_dir, model='gpt-3.5-turbo', llm_cache=False, fix_knowledge_base=False)
+    os.makedirs(microservice_dir)
+    generator.microservice_specification.test = 'test'
+    generator.microservice_name = 'MyMicroservice1'
+    generator.packages_list = [['pillow'], ['opencv']]
+    generator.num_approach = 0
+    generator.previous_errors = ['error']
+    for version in [1, 2, 3]:
+        os.makedirs(get_microservice_path(microservice_dir, 'MyMicroservice1', ['pillow'], 0, version))
+    generator.cur_microservice_path = get_microservice_path(microservice_dir, 'MyMicroservice1', ['pillow'], 0, 2)
+    generator.save_checkpoint('debugging')
+
+    resumed = Generator(None, microservice_dir, model='gpt-3.5-turbo', llm_cache=False, fix_knowledge_base=False, resume=True)
+    resumed.load_checkpoint()
+    assert resumed.stage == 'debugging'
+    assert resumed.microservice_specification.task == 'task'
+    assert resumed.packages_list == [['pillow'], ['opencv']]
+    assert resumed.previous_errors == ['error']
+    # v3 was written after the last checkpoint and is generated again
+    approach_path = os.path.dirname(resumed.cur_microservice_path)
+    assert sorted(os.listdir(approach_path)) == ['v1', 'v2']
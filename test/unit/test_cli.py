@@ -0,0 +1,31 @@
+import os
+
+from click.testing import CliRunner
+
+from dev_gpt.cli import main
+from dev_gpt.constants import PYPI_RELEASE_DATE_CUTOFF
+from dev_gpt.options.generate import generator
+
+
+class FakeGenerator:
+    kwargs = None
+
+    def __init__(self, description, **kwargs):
+        FakeGenerator.kwargs = kwargs
+
+    def generate(self):
+        pass
+
+
+def generate(tmpdir, *args, env=None):
+    path = os.path.join(str(tmpdir), 'microservice')
+    result = CliRunner().invoke(main, ['generate', '--description', 'task', '--path', path, *args], env=env)
+    assert result.exit_code == 0, result.output
+    return FakeGenerator.kwargs
+
+
+def test_pypi_cutoff_is_passed_to_the_generator(tmpdir, monkeypatch):
+    monkeypatch.setattr(generator, 'Generator', FakeGenerator)
+    assert generate(tmpdir)['pypi_cutoff'] == PYPI_RELEASE_DATE_CUTOFF
+    assert generate(tmpdir, '--pypi-cutoff', '2023-04-01')['pypi_cutoff'] == '2023-04-01'
+    assert generate(tmpdir, env={'DEV_GPT_PYPI_CUTOFF': '2022-01-15'})['pypi_cutoff'] == '2022-01-15'
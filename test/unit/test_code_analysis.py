@@ -0,0 +1,72 @@
+from dev_gpt.options.generate.code_analysis import add_missing_imports, get_unbound_names
+
+
+def test_get_unbound_names():
+    code = '''
+import json
+from typing import List as L
+
+
+class A:
+    x = 1
+    y = [x for _ in range(3)]
+
+    def method(self, values: L[int] = DEFAULT):
+        return x + values + [v for v in values if (last := v)] + [last]
+
+
+def func(input_json_dict_string: str) -> str:
+    try:
+        data = json.loads(input_json_dict_string)
+    except ValueError as e:
+        raise RuntimeError(e)
+    text = "BeautifulSoup(base64)"  # io.BytesIO in a comment
+    return helper(data) + text + str(__file__)
+
+
+def helper(data):
+    global counter
+    counter = 1
+    return np.array(data) + undefined_name
+'''
+    unbound_names = get_unbound_names(code)
+    assert [unbound_name.name for unbound_name in unbound_names] == ['DEFAULT', 'np', 'undefined_name', 'x']
+    assert unbound_names[1].attributes == {'array'}
+    assert unbound_names[1].line_numbers == [26]
+    assert get_unbound_names('def broken(:') == []
+    assert get_unbound_names('from os.path import *\njoin(a, b)') == []
+
+
+def test_add_missing_imports():
+    code = '''"""Resizes an image."""
+# the image is expected as base64
+from __future__ import annotations
+import json
+
+
+def func(input_json_dict_string: str) -> str:
+    image = Image.open(BytesIO(base64.b64decode(json.loads(input_json_dict_string)['image'])))
+    created = datetime.now()
+    return json.dumps({'size': list(np.array(image).shape), 'config': yaml.dump({}), 'created': str(created)})
+'''
+    assert add_missing_imports(code) == '''"""Resizes an image."""
+# the image is expected as base64
+from __future__ import annotations
+from PIL import Image
+from datetime import datetime
+from io import BytesIO
+import base64
+import numpy as np
+import yaml
+import json
+
+
+def func(input_json_dict_string: str) -> str:
+    image = Image.open(BytesIO(base64.b64decode(json.loads(input_json_dict_string)['image'])))
+    created = datetime.now()
+    return json.dumps({'size': list(np.array(image).shape), 'config': yaml.dump({}), 'created': str(created)})
+'''
+    assert add_missing_imports(add_missing_imports(code)) == add_missing_imports(code)
+    assert add_missing_imports('print(datetime.date.today())') == 'import datetime\nprint(datetime.date.today())'
+    assert add_missing_imports('buffer = io.BytesIO()') == 'import io\nbuffer = io.BytesIO()'
+    assert add_missing_imports('print(unknown_name)') == 'print(unknown_name)'
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import threading
+import time
+
+from langchain.schema import AIMessage, SystemMessage
+
+from dev_gpt.apis import gpt
+from dev_gpt.apis.gpt import ConcurrencyLimiter, _GPTConversation, ask_gpt_async, GPTSession
+from dev_gpt.options.generate.conversation_logger import ConversationLogger
+
+
+class FakeChatOpenAI:
+    """Answers after a short delay and records how many requests are in flight at the same time."""
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+
+    def __init__(self, **kwargs):
+        pass
+
+    @classmethod
+    def _enter(cls):
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+
+    @classmethod
+    def _exit(cls):
+        with cls.lock:
+            cls.in_flight -= 1
+
+    def __call__(self, messages):
+        self._enter()
+        time.sleep(0.1)
+        self._exit()
+        return AIMessage(content=f'answer to {messages[-1].content}')
+
+    async def agenerate(self, messages_list):
+        self._enter()
+        await asyncio.sleep(0.1)
+        self._exit()
+        message = AIMessage(content=f'answer to {messages_list[0][-1].content}')
+        return Generations([[Generation(message)]])
+
+
+class Generation:
+    def __init__(self, message):
+        self.message = message
+
+
+class Generations:
+    def __init__(self, generations):
+        self.generations = generations
+
+
+def use_fake_chat(monkeypatch):
+    monkeypatch.setenv('VERBOSE', 'false')
+    monkeypatch.setattr(gpt, 'ChatOpenAI', FakeChatOpenAI)
+    monkeypatch.setattr(FakeChatOpenAI, 'max_in_flight', 0)
+
+
+def test_conversations_of_parallel_threads_respect_the_concurrency_limit(tmpdir, monkeypatch):
+    use_fake_chat(monkeypatch)
+    concurrency_limiter = ConcurrencyLimiter(2)
+    conversation_logger = ConversationLogger(os.path.join(str(tmpdir), 'log.jsonl'))
+    answers = []
+
+    def chat(i):
+        conversation = _GPTConversation(
+            'gpt-3.5-turbo', lambda *args, **kwargs: None, [SystemMessage(content='system')], False, False,
+            conversation_logger, concurrency_limiter=concurrency_limiter
+        )
+        answers.append(conversation.chat(f'question {i}'))
+
+    threads = [threading.Thread(target=chat, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(answers) == [f'answer to question {i}' for i in range(6)]
+    assert FakeChatOpenAI.max_in_flight == 2
+
+
+def test_async_questions_respect_the_concurrency_limit(tmpdir, monkeypatch):
+    use_fake_chat(monkeypatch)
+    monkeypatch.setattr(GPTSession, 'is_gpt4_available', staticmethod(lambda: False))
+    monkeypatch.setattr(GPTSession, '_instance', None)
+    monkeypatch.setattr(GPTSession, '_initialized', False)
+    session = GPTSession(os.path.join(str(tmpdir), 'log.jsonl'), model='gpt-3.5-turbo', llm_cache=False, max_concurrency=3)
+
+    async def ask_all():
+        return await asyncio.gather(*[ask_gpt_async('question {i}', i=i) for i in range(9)])
+
+    start = time.perf_counter()
+    assert asyncio.run(ask_all()) == [f'answer to question {i}' for i in range(9)]
+    # 9 requests of 0.1 seconds with 3 at a time
+    assert 0.3 <= time.perf_counter() - start < 0.6
+    assert FakeChatOpenAI.max_in_flight == 3
+    assert session.prompt_tokens_so_far > 0
+    session.conversation_logger.close()
+    with open(os.path.join(str(tmpdir), 'log.jsonl')) as f:
+        assert len(f.readlines()) == 9
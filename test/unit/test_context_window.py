@@ -0,0 +1,59 @@
+import pytest
+from langchain.schema import SystemMessage, HumanMessage, AIMessage
+
+from dev_gpt.apis.context_window import ContextWindowManager, shorten_text, ContextWindowExceededException
+from dev_gpt.apis.tokens import count_message_tokens, count_tokens
+
+
+def test_shorten_text_keeps_start_and_end():
+    text = '\n'.join(f'line {i}' for i in range(1000))
+    shortened = shorten_text(text, 100, 'gpt-4')
+    assert shortened.startswith('line 0\n')
+    assert shortened.endswith('\nline 999')
+    assert 'lines omitted' in shortened
+    assert count_tokens(shortened, 'gpt-4') <= 110
+
+
+def test_short_conversation_is_not_changed():
+    manager = ContextWindowManager('gpt-4')
+    messages = [SystemMessage(content='system'), HumanMessage(content='hi')]
+    assert manager.fit(messages) is messages
+    assert manager.tokens_saved == 0
+
+
+def test_long_conversation_fits_into_context_window():
+    manager = ContextWindowManager('gpt-3.5-turbo')
+    code = '\n'.join(f'x_{i} = {i}' for i in range(2000))
+    messages = [SystemMessage(content=f'system\n```python\n{code[:4000]}\n```')]
+    for i in range(5):
+        messages.append(HumanMessage(content=f'question {i}\n```python\n{code}\n```'))
+        messages.append(AIMessage(content=f'answer {i}'))
+    messages.append(HumanMessage(content='latest question'))
+    fitted = manager.fit(messages)
+    assert count_message_tokens(fitted, 'gpt-3.5-turbo') <= manager.max_prompt_tokens
+    assert fitted[0].content == messages[0].content
+    assert fitted[-1].content == 'latest question'
+    assert manager.tokens_saved == count_message_tokens(messages, 'gpt-3.5-turbo') - count_message_tokens(fitted, 'gpt-3.5-turbo')
+
+
+def test_huge_last_message_is_shortened():
+    manager = ContextWindowManager('gpt-3.5-turbo')
+    code = '\n'.join(f'x_{i} = {i}' for i in range(3000))
+    error = '\n'.join(f'error line {i}' for i in range(3000))
+    prompt = f'Here are the files:\n**microservice.py**\n```python\n{code}\n```\n\nThe error is:\n{error}\nFix the error.'
+    messages = [SystemMessage(content='system'), HumanMessage(content=prompt)]
+    fitted = manager.fit(messages)
+    assert count_message_tokens(fitted, 'gpt-3.5-turbo') <= manager.max_prompt_tokens
+    assert fitted[0].content == 'system'
+    content = fitted[-1].content
+    assert content.startswith('Here are the files:\n**microservice.py**\n```python\nx_0 = 0\n')
+    assert 'lines omitted' in content
+    assert content.endswith('error line 2999\nFix the error.')
+
+
+def test_system_message_which_does_not_fit_raises():
+    manager = ContextWindowManager('gpt-3.5-turbo')
+    too_long = '\n'.join(f'x_{i} = {i}' for i in range(5000))
+    messages = [SystemMessage(content=too_long), HumanMessage(content='question')]
+    with pytest.raises(ContextWindowExceededException):
+        manager.fit(messages)
@@ -0,0 +1,71 @@
+import json
+
+from langchain.schema import SystemMessage, HumanMessage, AIMessage
+
+from dev_gpt.options.generate.conversation_logger import ConversationLogger, read_log
+
+
+def test_shared_prefixes_are_logged_once_and_legacy_log_is_complete(tmpdir):
+    log_file_path = str(tmpdir.join('log.jsonl'))
+    logger = ConversationLogger(log_file_path)
+    system = SystemMessage(content='You are a helpful assistant.')
+    question = HumanMessage(content='What is 1+1?')
+    answer = AIMessage(content='2')
+    logger.log([system, question], answer)
+    logger.log([system, question, answer, HumanMessage(content='And 2+2?')], AIMessage(content='4'))
+    logger.close()
+
+    with open(log_file_path) as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == 2
+    assert lines[0]['parent'] is None
+    assert [m['content'] for m in lines[1]['messages']] == ['2', 'And 2+2?']
+
+    logger.write_legacy_log()
+    with open(str(tmpdir.join('log.json'))) as f:
+        legacy_log_content = f.read()
+    legacy_log = json.loads(legacy_log_content)
+    assert legacy_log_content == json.dumps(legacy_log, indent=2)
+    assert [m['content'] for m in legacy_log[1]['prompt']] == [
+        'You are a helpful assistant.', 'What is 1+1?', '2', 'And 2+2?'
+    ]
+    assert legacy_log[0]['response'] == f'{answer}'
+
+
+def test_resumed_logger_continues_the_prefix_chain(tmpdir):
+    log_file_path = str(tmpdir.join('log.jsonl'))
+    system = SystemMessage(content='You are a helpful assistant.')
+    logger = ConversationLogger(log_file_path)
+    logger.log([system, HumanMessage(content='a')], AIMessage(content='b'))
+    logger.close()
+
+    resumed_logger = ConversationLogger(log_file_path)
+    resumed_logger.log([system, HumanMessage(content='c')], AIMessage(content='d'))
+    resumed_logger.close()
+    with open(log_file_path) as f:
+        last_line = json.loads(f.readlines()[-1])
+    assert last_line['parent'] is not None
+    assert [m['content'] for m in last_line['messages']] == ['c']
+
+
+def test_entries_depending_on_a_corrupt_line_are_skipped(tmpdir):
+    log_file_path = str(tmpdir.join('log.jsonl'))
+    system = SystemMessage(content='You are a helpful assistant.')
+    logger = ConversationLogger(log_file_path)
+    logger.log([system, HumanMessage(content='a')], AIMessage(content='b'))
+    logger.log([system, HumanMessage(content='a'), AIMessage(content='b'), HumanMessage(content='c')], AIMessage(content='d'))
+    logger.log([system, HumanMessage(content='e')], AIMessage(content='f'))
+    logger.close()
+    with open(log_file_path) as f:
+        lines = f.readlines()
+    lines[0] = lines[0][:20] + '\n'
+    with open(log_file_path, 'w') as f:
+        f.writelines(lines)
+
+    # both later entries refer to prefixes of the corrupt first line, at least to its system message
+    assert [entry['response'] for entry in read_log(log_file_path)] == []
+    resumed_logger = ConversationLogger(log_file_path)
+    resumed_logger.log([system, HumanMessage(content='g')], AIMessage(content='h'))
+    resumed_logger.close()
+    entries = list(read_log(log_file_path))
+    assert [[m['content'] for m in entry['prompt']] for entry in entries] == [['You are a helpful assistant.', 'g']]
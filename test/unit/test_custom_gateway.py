@@ -0,0 +1,37 @@
+import socket
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from dev_gpt.options.generate.static_files.gateway.custom_gateway import wait_for, is_port_open, is_healthy
+
+
+def test_wait_for_returns_as_soon_as_the_port_is_open():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        port = s.getsockname()[1]
+        threading.Timer(0.2, s.listen).start()
+        start = time.perf_counter()
+        assert wait_for(lambda: is_port_open(port), timeout=5)
+        assert time.perf_counter() - start < 1
+    assert not wait_for(lambda: is_port_open(port), timeout=0.2)
+
+
+def test_is_healthy():
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200 if self.path == '/playground/healthz' else 404)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('localhost', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        assert is_healthy(f'http://localhost:{server.server_port}/playground/healthz')
+        assert not is_healthy(f'http://localhost:{server.server_port}/healthz')
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert not is_healthy(f'http://localhost:{server.server_port}/playground/healthz')
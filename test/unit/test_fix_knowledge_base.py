@@ -0,0 +1,72 @@
+import os
+
+from dev_gpt.options.generate.fix_knowledge_base import FixKnowledgeBase, get_error_fingerprint, \
+    get_dependency_diff, apply_dependency_diff
+
+DOCKERFILE = '''FROM jinaai/dev-gpt:0.0.6
+
+RUN apt-get install --no-install-recommends -y {packages}
+
+RUN pytest test_microservice.py
+'''
+
+
+def write_microservice(microservice_path, packages, requirements, code='def func(x): return x'):
+    os.makedirs(microservice_path)
+    for file_name, content in [
+        ('Dockerfile', DOCKERFILE.format(packages=packages)),
+        ('requirements.txt', requirements),
+        ('microservice.py', code),
+        ('test_microservice.py', 'from .microservice import func'),
+    ]:
+        with open(os.path.join(microservice_path, file_name), 'w') as f:
+            f.write(content)
+
+
+def test_error_fingerprint():
+    assert get_error_fingerprint(
+        '#12 [7/8] RUN pytest test_microservice.py\n/app/microservice.py:4: in <module>\nFileNotFoundError: pdftotext not found in /usr/bin/x'
+    ) == get_error_fingerprint(
+        '#11 [6/7] RUN pytest test_microservice.py\n/workdir/microservice.py:12: in <module>\nFileNotFoundError: pdftotext not found in /usr/local/bin/x'
+    )
+    assert get_error_fingerprint('ModuleNotFoundError: No module named cv2') \
+        != get_error_fingerprint('ModuleNotFoundError: No module named PIL')
+
+
+def test_dependency_diff_round_trip(tmpdir):
+    write_microservice(str(tmpdir.join('v1')), '', 'jina==3.15.1.dev14\ndocarray==0.30.0\npdfminer')
+    write_microservice(str(tmpdir.join('v2')), 'poppler-utils', 'jina==3.15.1.dev14\ndocarray==0.21.0\npdftotext')
+    diff = get_dependency_diff(str(tmpdir.join('v1')), str(tmpdir.join('v2')))
+    assert diff == {
+        'apt_get_packages': ['poppler-utils'],
+        'added_requirements': ['docarray==0.21.0', 'pdftotext'],
+        'removed_requirements': ['pdfminer'],
+    }
+
+    # another microservice with the same error
+    other_path = str(tmpdir.join('other'))
+    write_microservice(other_path, 'ffmpeg', 'docarray==0.30.0\nrequests\npdfminer', code='def func(y): return y')
+    apply_dependency_diff(diff, other_path)
+    with open(os.path.join(other_path, 'Dockerfile')) as f:
+        assert 'RUN apt-get install --no-install-recommends -y ffmpeg poppler-utils\n' in f.read()
+    with open(os.path.join(other_path, 'requirements.txt')) as f:
+        assert f.read() == 'docarray==0.21.0\nrequests\npdftotext'
+
+    write_microservice(str(tmpdir.join('v3')), 'poppler-utils', 'jina==3.15.1.dev14\ndocarray==0.21.0\npdftotext', code='def func(x): return 1')
+    assert get_dependency_diff(str(tmpdir.join('v2')), str(tmpdir.join('v3'))) is None
+
+
+def test_fix_knowledge_base(tmpdir):
+    db_path = str(tmpdir.join('fixes.sqlite'))
+    diff = {'apt_get_packages': ['ffmpeg'], 'added_requirements': [], 'removed_requirements': []}
+    knowledge_base = FixKnowledgeBase(db_path)
+    assert knowledge_base.lookup('fingerprint') is None
+    knowledge_base.add_fix('fingerprint', diff, 120)
+
+    # a later run
+    knowledge_base = FixKnowledgeBase(db_path)
+    assert knowledge_base.lookup('fingerprint') == diff
+    knowledge_base.record_outcome('fingerprint', resolved=False)
+    assert knowledge_base.lookup('fingerprint') is None
+    assert knowledge_base.get_report() == \
+        'Fix knowledge base: 1 of 2 errors resolved with proven fixes (50%), saved about 120s'
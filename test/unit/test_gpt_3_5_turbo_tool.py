@@ -0,0 +1,77 @@
+import importlib
+import os
+
+import openai
+
+from dev_gpt.options.generate.static_files.microservice import gpt_3_5_turbo
+from dev_gpt.options.generate.static_files.microservice.gpt_3_5_turbo import GPT_3_5_Turbo
+
+
+class Response:
+    def __init__(self, content):
+        self.choices = [{'message': {'content': content}}]
+
+
+def test_identical_prompts_are_cached(monkeypatch, tmpdir):
+    calls = []
+
+    def create(model, messages, request_timeout):
+        calls.append(messages[1]['content'])
+        return Response(f'answer to {messages[1]["content"]}')
+
+    monkeypatch.setattr(openai.ChatCompletion, 'create', create)
+    monkeypatch.setattr(gpt_3_5_turbo, '_cache', gpt_3_5_turbo._ResponseCache())
+    assert GPT_3_5_Turbo('You are a test')('a') == 'answer to a'
+    assert GPT_3_5_Turbo('You are a test')('a') == 'answer to a'
+    # the cache is disabled by default
+    assert calls == ['a', 'a']
+
+    gpt = GPT_3_5_Turbo('You are a test', cache_size=8, cache_dir=str(tmpdir))
+    assert gpt('a') == 'answer to a'
+    assert gpt('a') == 'answer to a'
+    assert GPT_3_5_Turbo('Another system string', cache_size=8)('a') == 'answer to a'
+    assert calls == ['a', 'a', 'a', 'a']
+
+    # the responses on disk survive a restart and are kept in memory once read
+    monkeypatch.setattr(gpt_3_5_turbo, '_cache', gpt_3_5_turbo._ResponseCache())
+    assert GPT_3_5_Turbo('You are a test', cache_size=8, cache_dir=str(tmpdir))('a') == 'answer to a'
+    for file_name in os.listdir(str(tmpdir)):
+        os.remove(os.path.join(str(tmpdir), file_name))
+    assert GPT_3_5_Turbo('You are a test', cache_size=8, cache_dir=str(tmpdir))('a') == 'answer to a'
+    assert calls == ['a', 'a', 'a', 'a']
+
+
+def test_transient_errors_are_retried(monkeypatch):
+    calls = []
+
+    def create(model, messages, request_timeout):
+        calls.append(request_timeout)
+        if len(calls) < 3:
+            raise openai.error.RateLimitError('rate limit')
+        return Response('answer')
+
+    monkeypatch.setattr(openai.ChatCompletion, 'create', create)
+    monkeypatch.setattr(gpt_3_5_turbo.time, 'sleep', lambda seconds: None)
+    assert GPT_3_5_Turbo(timeout=5, cache_size=0)('a') == 'answer'
+    assert calls == [5, 5, 5]
+
+    calls.clear()
+    try:
+        GPT_3_5_Turbo(max_retries=1, cache_size=0)('a')
+        assert False
+    except openai.error.RateLimitError:
+        pass
+    assert len(calls) == 2
+
+
+def test_import_keeps_an_existing_requests_session(monkeypatch):
+    def create_session():
+        pass
+
+    monkeypatch.setattr(openai, 'requestssession', create_session)
+    importlib.reload(gpt_3_5_turbo)
+    assert openai.requestssession is create_session
+
+    monkeypatch.setattr(openai, 'requestssession', None)
+    importlib.reload(gpt_3_5_turbo)
+    assert openai.requestssession is gpt_3_5_turbo._session
@@ -0,0 +1,46 @@
+import os
+import sys
+
+from dev_gpt.apis.import_names import reconcile_requirements_txt, get_distribution_name, get_stdlib_module_names
+
+
+def test_import_name_index():
+    assert get_distribution_name('cv2') == 'opencv-python'
+    assert get_distribution_name('PIL') == 'pillow'
+    assert get_distribution_name('yaml') == 'pyyaml'
+    assert get_distribution_name('bs4') == 'beautifulsoup4'
+    assert get_distribution_name('not_a_known_module') is None
+
+
+def test_stdlib_module_names_without_sys_stdlib_module_names(monkeypatch):
+    # Python < 3.10
+    monkeypatch.delattr(sys, 'stdlib_module_names', raising=False)
+    get_stdlib_module_names.cache_clear()
+    try:
+        assert {'base64', 'io', 'json', 'asyncio', 'distutils'} <= get_stdlib_module_names()
+        assert 'numpy' not in get_stdlib_module_names()
+    finally:
+        get_stdlib_module_names.cache_clear()
+
+
+def test_reconcile_requirements_txt(tmpdir):
+    microservice_path = str(tmpdir)
+    with open(os.path.join(microservice_path, 'microservice.py'), 'w') as f:
+        f.write('import json\nimport cv2\nfrom PIL import Image\nimport numpy as np\nfrom .helper import x\nimport helper\n')
+    with open(os.path.join(microservice_path, 'test_microservice.py'), 'w') as f:
+        f.write('import yaml\nfrom jina import Executor\nfrom microservice import func\n')
+    with open(os.path.join(microservice_path, 'helper.py'), 'w') as f:
+        f.write('x = 1\n')
+    with open(os.path.join(microservice_path, 'requirements.txt'), 'w') as f:
+        f.write('jina==3.15.1.dev14\nPIL~=8.0\nnumpy==1.21.0\n\n')
+
+    changes = reconcile_requirements_txt(microservice_path)
+
+    assert changes == [
+        'replaced PIL with pillow',
+        'added opencv-python for import cv2',
+        'added pyyaml for import yaml',
+    ]
+    with open(os.path.join(microservice_path, 'requirements.txt')) as f:
+        assert f.read() == 'jina==3.15.1.dev14\npillow\nnumpy==1.21.0\nopencv-python\npyyaml'
+    assert reconcile_requirements_txt(microservice_path) == []
@@ -0,0 +1,87 @@
+import asyncio
+import importlib
+import json
+import os
+import shutil
+import time
+
+from jina import Document, DocumentArray
+
+import dev_gpt.options.generate.static_files.microservice as static_microservice_files
+
+
+def create_executor(tmpdir, monkeypatch, microservice_content, **kwargs):
+    package_name = f'generated_microservice_{tmpdir.basename}'
+    package_path = os.path.join(str(tmpdir), package_name)
+    os.makedirs(package_path)
+    shutil.copy(os.path.join(os.path.dirname(static_microservice_files.__file__), 'jina_wrapper.py'), package_path)
+    for file_name, content in [('__init__.py', ''), ('microservice.py', microservice_content)]:
+        with open(os.path.join(package_path, file_name), 'w') as f:
+            f.write(content)
+    monkeypatch.syspath_prepend(str(tmpdir))
+    return importlib.import_module(f'{package_name}.jina_wrapper').DevGPTExecutor(**kwargs)
+
+
+def run_endpoint(executor, texts):
+    return asyncio.run(executor.endpoint(docs=DocumentArray([Document(text=text) for text in texts])))
+
+
+def test_docs_are_processed_concurrently_and_in_order(tmpdir, monkeypatch):
+    executor = create_executor(tmpdir, monkeypatch, '''\
+import time
+
+def func(input_json_dict_string: str) -> str:
+    time.sleep(0.2)
+    if input_json_dict_string == 'fail':
+        raise ValueError('invalid input')
+    return input_json_dict_string.upper()
+''', max_concurrency=8)
+    start = time.perf_counter()
+    docs = run_endpoint(executor, ['a', 'fail'] + [str(i) for i in range(6)])
+    assert time.perf_counter() - start < 1
+    assert docs[0].text == 'A'
+    assert json.loads(docs[1].text) == {'error': 'ValueError: invalid input'}
+    assert docs.texts[2:] == [str(i) for i in range(6)]
+
+
+def test_coroutine_func(tmpdir, monkeypatch):
+    executor = create_executor(tmpdir, monkeypatch, '''\
+import asyncio
+
+async def func(input_json_dict_string: str) -> str:
+    await asyncio.sleep(0.2)
+    return input_json_dict_string * 2
+''', max_concurrency=2)
+    start = time.perf_counter()
+    docs = run_endpoint(executor, ['a', 'b', 'c', 'd'])
+    assert 0.4 <= time.perf_counter() - start < 0.8
+    assert docs.texts == ['aa', 'bb', 'cc', 'dd']
+
+
+def test_results_are_cached_and_shared_via_cache_dir(tmpdir, monkeypatch):
+    microservice_content = '''\
+def func(input_json_dict_string: str) -> str:
+    if input_json_dict_string == 'fail':
+        raise ValueError('invalid input')
+    return input_json_dict_string.upper()
+'''
+    cache_dir = os.path.join(str(tmpdir), 'cache')
+    executor = create_executor(tmpdir.mkdir('replica_1'), monkeypatch, microservice_content, cache=True, cache_dir=cache_dir)
+    assert run_endpoint(executor, ['a', 'fail']).texts[0] == 'A'
+    assert run_endpoint(executor, ['a', 'fail']).texts[0] == 'A'
+    assert json.loads(executor.cache_stats()[0].text) == {'enabled': True, 'hits': 1, 'misses': 3, 'size': 1}
+
+    other_replica = create_executor(tmpdir.mkdir('replica_2'), monkeypatch, microservice_content, cache=True, cache_dir=cache_dir)
+    assert run_endpoint(other_replica, ['a']).texts == ['A']
+    assert json.loads(other_replica.cache_stats()[0].text) == {'enabled': True, 'hits': 1, 'misses': 0, 'size': 1}
+
+
+def test_cached_results_expire(tmpdir, monkeypatch):
+    executor = create_executor(tmpdir, monkeypatch, '''\
+def func(input_json_dict_string: str) -> str:
+    return input_json_dict_string
+''', cache=True, cache_ttl_seconds=0.1)
+    run_endpoint(executor, ['a'])
+    time.sleep(0.2)
+    run_endpoint(executor, ['a'])
+    assert json.loads(executor.cache_stats()[0].text) == {'enabled': True, 'hits': 0, 'misses': 2, 'size': 1}
@@ -0,0 +1,28 @@
+import os
+
+from langchain.schema import SystemMessage, HumanMessage
+
+from dev_gpt.apis.gpt import LLMCache
+
+
+def test_llm_cache_hit_and_miss(tmpdir):
+    cache = LLMCache(str(tmpdir))
+    messages = [SystemMessage(content='system'), HumanMessage(content='prompt')]
+    assert cache.get('gpt-4', messages) is None
+    cache.put('gpt-4', messages, 'response')
+    assert cache.get('gpt-4', messages) == 'response'
+    assert cache.get('gpt-3.5-turbo', messages) is None
+    assert cache.get('gpt-4', [HumanMessage(content='prompt')]) is None
+
+
+def test_llm_cache_evicts_least_recently_used(tmpdir):
+    cache = LLMCache(str(tmpdir), max_size_bytes=300)
+    for i in range(3):
+        cache.put('gpt-4', [HumanMessage(content=f'prompt {i}')], 'x' * 50)
+        entry_path = cache._get_entry_path(cache.get_key('gpt-4', [HumanMessage(content=f'prompt {i}')]))
+        os.utime(entry_path, (i, i))
+    cache.get('gpt-4', [HumanMessage(content='prompt 0')])  # touching an entry makes it the most recently used
+    cache.put('gpt-4', [HumanMessage(content='prompt 3')], 'x' * 50)
+    assert cache.get('gpt-4', [HumanMessage(content='prompt 0')]) == 'x' * 50
+    assert cache.get('gpt-4', [HumanMessage(content='prompt 1')]) is None
+    assert cache.get('gpt-4', [HumanMessage(content='prompt 3')]) == 'x' * 50
@@ -0,0 +1,94 @@
+import os
+import re
+import stat
+import threading
+import time
+
+from dev_gpt.apis import local_build
+
+
+def test_virtualenv_build_log_has_build_log_format(tmpdir, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir.mkdir('cache')))
+    microservice_path = tmpdir.mkdir('microservice')
+    microservice_path.join('requirements.txt').write('jina==3.15.1.dev14\n')
+    microservice_path.join('test_microservice.py').write('def test_fails():\n    assert False\n')
+
+    def fake_run(command, cwd=None, env=None):
+        if 'pytest' in command:
+            return 1, 'E       assert False'
+        return 0, 'Successfully installed'
+
+    monkeypatch.setattr(local_build, 'is_docker_running', lambda: False)
+    monkeypatch.setattr(local_build, '_run', fake_run)
+    log = local_build.build_locally(str(microservice_path))
+
+    step_lines = [line for line in log.split('\n') if re.match(r'^#\d+ \[[ \d]+/[ \d]+\]', line)]
+    assert step_lines[-1] == '#2 [2/2] RUN pytest test_microservice.py'
+    assert log.split(step_lines[-1])[-1].strip().startswith('E       assert False')
+    # the build happens in a copy, the microservice folder stays clean
+    assert sorted(os.listdir(microservice_path)) == ['requirements.txt', 'test_microservice.py']
+
+
+def test_successful_virtualenv_build_returns_empty_log(tmpdir, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir.mkdir('cache')))
+    microservice_path = tmpdir.mkdir('microservice')
+    microservice_path.join('requirements.txt').write('')
+    monkeypatch.setattr(local_build, 'is_docker_running', lambda: False)
+    monkeypatch.setattr(local_build, '_run', lambda command, cwd=None, env=None: (0, 'ok'))
+    assert local_build.build_locally(str(microservice_path)) == ''
+
+
+def test_docker_build_passes_the_api_keys_as_secret(tmpdir, monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', "sk-it's-secret")
+    microservice_path = tmpdir.mkdir('microservice')
+    microservice_path.join('Dockerfile').write('FROM jinaai/dev-gpt:0.0.6\nRUN pytest test_microservice.py\n')
+    commands = []
+
+    def fake_run(command, cwd=None, env=None):
+        commands.append(command)
+        if command[:2] == ['docker', 'build']:
+            build_path = command[-1]
+            with open(os.path.join(build_path, 'Dockerfile')) as f:
+                assert f.read().split('\n')[1] == \
+                       'RUN --mount=type=secret,id=build_env . /run/secrets/build_env && pytest test_microservice.py'
+            secret_path = command[command.index('--secret') + 1].split('src=')[1]
+            assert os.path.dirname(secret_path) == os.path.dirname(build_path)
+            assert not os.stat(secret_path).st_mode & (stat.S_IRWXG | stat.S_IRWXO)
+            with open(secret_path) as f:
+                assert "export OPENAI_API_KEY='sk-it'\"'\"'s-secret'\n" in f.read()
+        return 0, ''
+
+    monkeypatch.setattr(local_build, 'is_docker_running', lambda: True)
+    monkeypatch.setattr(local_build, '_run', fake_run)
+    assert local_build.build_locally(str(microservice_path)) == ''
+    build_command = commands[0]
+    assert build_command[:3] == ['docker', 'build', '--progress=plain']
+    assert build_command[3] == '--secret' and build_command[4].startswith('id=build_env,src=')
+    assert '--build-arg' not in build_command
+    assert not any('sk-it' in argument for command in commands for argument in command)
+    assert commands[1] == ['docker', 'image', 'rm', '-f', 'dev-gpt-local-build']
+
+
+def test_parallel_builds_install_the_shared_virtualenv_once(tmpdir, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir.mkdir('cache')))
+    installations = []
+
+    def fake_run(command, cwd=None, env=None):
+        if 'install' in command:
+            installations.append(command)
+            time.sleep(0.1)
+        return 0, 'ok'
+
+    monkeypatch.setattr(local_build, 'is_docker_running', lambda: False)
+    monkeypatch.setattr(local_build, '_run', fake_run)
+    microservice_paths = []
+    for i in range(4):
+        microservice_path = tmpdir.mkdir(f'approach_{i}')
+        microservice_path.join('requirements.txt').write('numpy\n')
+        microservice_paths.append(str(microservice_path))
+    threads = [threading.Thread(target=local_build.build_locally, args=(path,)) for path in microservice_paths]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(installations) == 1
@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+
+import pytest
+
+from dev_gpt.apis.gpt import GPTSession, BudgetExceededException
+from dev_gpt.options.generate.generator import Generator
+
+
+def create_generator(microservice_dir, tmpdir, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', os.path.join(str(tmpdir), 'cache'))
+    monkeypatch.setattr(GPTSession, 'is_gpt4_available', staticmethod(lambda: False))
+    generator = Generator(
+        'task', microservice_dir, model='gpt-3.5-turbo', llm_cache=False, fix_knowledge_base=False,
+        parallel_approaches=3
+    )
+    generator.microservice_name = 'MyMicroservice1'
+    return generator
+
+
+def test_failing_and_slow_approaches_do_not_block_the_winner(microservice_dir, tmpdir, monkeypatch):
+    generator = create_generator(microservice_dir, tmpdir, monkeypatch)
+    slow_build_finished = threading.Event()
+
+    def run_approach(approach, num_approach, packages):
+        approach.cur_microservice_path = f'{num_approach}_{packages[0]}/v1'
+        if packages == ['pillow']:
+            raise ValueError('the generated code is invalid')
+        if packages == ['opencv']:
+            # a build which takes longer than the winning approach
+            time.sleep(2)
+            slow_build_finished.set()
+            return approach
+        time.sleep(0.1)
+        return approach
+
+    monkeypatch.setattr(Generator, 'run_approach', run_approach)
+    monkeypatch.setattr(Generator, 'generate_playground', lambda self: None)
+    monkeypatch.setattr(Generator, 'save_checkpoint', lambda self, stage: None)
+    start = time.perf_counter()
+    assert generator.generate_approaches_in_parallel([['pillow'], ['opencv'], ['imageio']]) == 0
+    assert time.perf_counter() - start < 1
+    assert not slow_build_finished.is_set()
+    assert generator.cur_microservice_path == '2_imageio/v1'
+    assert generator.push_name == 'MyMicroservice1Approach2'
+    assert generator.get_push_name() == 'MyMicroservice1Approach2'
+
+
+def test_exceeded_budget_stops_all_approaches(microservice_dir, tmpdir, monkeypatch):
+    generator = create_generator(microservice_dir, tmpdir, monkeypatch)
+    cancelled = []
+
+    def run_approach(approach, num_approach, packages):
+        if packages == ['pillow']:
+            raise BudgetExceededException('The next request would exceed the token budget.')
+        while not approach.cancel_event.wait(0.01):
+            pass
+        cancelled.append(packages)
+        approach.raise_if_cancelled()
+
+    monkeypatch.setattr(Generator, 'run_approach', run_approach)
+    with pytest.raises(BudgetExceededException):
+        generator.generate_approaches_in_parallel([['pillow'], ['opencv'], ['imageio']])
+    time.sleep(0.1)
+    assert sorted(cancelled) == [['imageio'], ['opencv']]
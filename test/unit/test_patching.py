@@ -0,0 +1,60 @@
+import pytest
+
+from dev_gpt.options.generate.patching import parse_search_replace_blocks, apply_search_replace, apply_patches, \
+    PatchFailedException
+
+MICROSERVICE = '''import json
+
+
+def func(input_json_dict_string: str) -> str:
+    input_json_dict = json.loads(input_json_dict_string)
+    text = input_json_dict['text']
+    return json.dumps({'length': len(text)})
+'''
+
+
+def test_parse_search_replace_blocks():
+    response = '''The text is read from the wrong key.
+**microservice.py**
+```
+<<<<<<< SEARCH
+    text = input_json_dict['text']
+=======
+    text = input_json_dict['input_text']
+>>>>>>> REPLACE
+```
+
+**requirements.txt**
+```
+<<<<<<< SEARCH
+=======
+numpy
+>>>>>>> REPLACE
+```'''
+    assert parse_search_replace_blocks(response) == {
+        'microservice.py': [("    text = input_json_dict['text']\n", "    text = input_json_dict['input_text']\n")],
+        'requirements.txt': [('', 'numpy\n')],
+    }
+
+
+def test_apply_search_replace():
+    assert apply_search_replace(MICROSERVICE, "    text = input_json_dict['text']\n", "    text = input_json_dict['input_text']\n") \
+        == MICROSERVICE.replace("['text']", "['input_text']")
+    # wrong indentation and small mistakes in the copied lines
+    assert apply_search_replace(
+        MICROSERVICE,
+        "text = input_json_dict['txt']\nreturn json.dumps({'length': len(text)})",
+        "text = input_json_dict['text'].strip()\nreturn json.dumps({'length': len(text)})",
+    ) == MICROSERVICE.replace("['text']", "['text'].strip()")
+    assert apply_search_replace('jina', '', 'numpy\n') == 'jina\nnumpy\n'
+    with pytest.raises(PatchFailedException):
+        apply_search_replace(MICROSERVICE, 'import base64\nimport io\n', 'import io\n')
+
+
+def test_apply_patches():
+    assert apply_patches(
+        {'microservice.py': MICROSERVICE, 'requirements.txt': 'jina'},
+        {'microservice.py': [('import json\n', 'import json\nimport re\n')]},
+    ) == {'microservice.py': MICROSERVICE.replace('import json\n', 'import json\nimport re\n')}
+    with pytest.raises(PatchFailedException):
+        apply_patches({'microservice.py': MICROSERVICE}, {'Dockerfile': [('', 'RUN ls')]})
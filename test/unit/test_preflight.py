@@ -0,0 +1,48 @@
+import os
+
+from dev_gpt.apis.jina_cloud import process_error_message
+from dev_gpt.options.generate.preflight import run_preflight_checks
+
+
+def write_microservice(microservice_path, microservice_code, test_code):
+    with open(os.path.join(microservice_path, 'microservice.py'), 'w') as f:
+        f.write(microservice_code)
+    with open(os.path.join(microservice_path, 'test_microservice.py'), 'w') as f:
+        f.write(test_code)
+
+
+def test_preflight_checks_pass(tmpdir):
+    write_microservice(
+        str(tmpdir),
+        'import json\n\n\ndef func(input_json_dict_string: str) -> str:\n    return json.dumps(json.loads(input_json_dict_string))\n',
+        'from .microservice import func\n\n\ndef test_func():\n    assert func(\'{}\') == \'{}\'\n',
+    )
+    assert run_preflight_checks(str(tmpdir)) == ''
+
+
+def test_preflight_checks_pass_for_async_func(tmpdir):
+    write_microservice(
+        str(tmpdir),
+        'import asyncio\n\n\nasync def func(input_json_dict_string: str) -> str:\n    await asyncio.sleep(0)\n    return input_json_dict_string\n',
+        'import asyncio\n\nfrom .microservice import func\n\n\ndef test_func():\n    assert asyncio.run(func(\'{}\')) == \'{}\'\n',
+    )
+    assert run_preflight_checks(str(tmpdir)) == ''
+
+
+def test_preflight_checks_fail(tmpdir):
+    write_microservice(
+        str(tmpdir),
+        'def func(text: dict, other) -> str:\n    return np.array(text)\n',
+        'from microservice import run\n\ndef test_func(:\n    pass\n',
+    )
+    log = run_preflight_checks(str(tmpdir))
+    assert log.split('\n') == [
+        '#1 [1/1] RUN preflight checks on microservice.py test_microservice.py',
+        "microservice.py:2: undefined name 'np'",
+        'microservice.py:1: func has the wrong signature, it must be defined as `def func(input_json_dict_string: str) -> str`',
+        '  File "test_microservice.py", line 3',
+        '    def test_func(:',
+        'SyntaxError: invalid syntax',
+        'exited on non-zero code: 1',
+    ]
+    assert process_error_message(log) == log
@@ -0,0 +1,140 @@
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+from dev_gpt.apis import pypi
+from dev_gpt.apis.pypi import PyPIClient, ReleaseIndex
+
+PROJECT = {
+    'urls': [{'filename': 'gtts-2.2.3.tar.gz'}],
+    'releases': {
+        '2.2.3': [{'upload_time': '2021-06-17T10:00:00'}],
+        '2.3.0': [{'upload_time': '2022-10-14T10:00:00'}],
+        '2.3.1': [],
+    },
+}
+
+
+@pytest.fixture
+def pypi_server(monkeypatch):
+    requests_received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_received.append((self.path, self.headers.get('If-None-Match')))
+            if self.path != '/pypi/gtts/json':
+                self.send_response(404)
+                self.end_headers()
+                return
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = json.dumps(PROJECT).encode('utf-8')
+            self.send_response(200)
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(pypi, 'PYPI_URL', f'http://127.0.0.1:{server.server_address[1]}')
+    yield requests_received
+    server.shutdown()
+    server.server_close()
+
+
+def test_project_is_fetched_once_and_revalidated_with_etag(pypi_server, tmpdir):
+    client = PyPIClient(cache_dir=str(tmpdir))
+    client.prefetch(['gTTS', 'gtts', 'g_tts_not_existing'])
+    assert client.is_package_on_pypi('gtts') is True
+    assert client.is_package_on_pypi('gtts', '2.2.3') is True
+    assert client.is_package_on_pypi('gtts', '2.2.3.0') is True
+    assert client.is_package_on_pypi('gtts', '2.3.1') is False  # no files
+    assert client.is_package_on_pypi('g-tts-not-existing') is False
+    assert sorted(path for path, _ in pypi_server) == ['/pypi/g-tts-not-existing/json', '/pypi/gtts/json']
+
+    # a new process revalidates the cached metadata instead of downloading it again
+    new_client = PyPIClient(cache_dir=str(tmpdir))
+    assert new_client.get_project('gtts') == PROJECT
+    assert pypi_server[-1] == ('/pypi/gtts/json', '"v1"')
+
+
+def test_release_index_returns_latest_version_before_cutoff():
+    release_index = ReleaseIndex.from_releases({
+        '1.0.0': [{'upload_time': '2020-01-01T00:00:00'}],
+        '2.0.0': [{'upload_time': '2021-03-01T00:00:00'}],
+        # a bugfix release of the old major version after the new major version
+        '1.0.1': [{'upload_time': '2021-09-30T23:59:59'}],
+        '2.1.0rc1': [{'upload_time': '2021-10-01T00:00:00'}],
+        '3.0.0': [],
+    })
+    assert release_index.get_latest_version('2019-01-01') is None
+    assert release_index.get_latest_version('2021-01-01') == '1.0.0'
+    assert release_index.get_latest_version('2021-10-01') == '2.0.0'
+    assert release_index.get_latest_version('2022-01-01') == '2.1.0rc1'
+
+
+def test_release_index_is_cached_per_etag(pypi_server, tmpdir):
+    assert PyPIClient(cache_dir=str(tmpdir)).get_release_index('gtts').get_latest_version('2021-10-01') == '2.2.3'
+    assert tmpdir.join('gtts.index.json').exists()
+    assert PyPIClient(cache_dir=str(tmpdir)).get_release_index('gtts').versions == ['2.2.3', '2.3.0']
+
+
+def test_only_missing_projects_are_remembered_as_not_on_pypi(monkeypatch, tmpdir):
+    status_codes = [429, 503, 503, 503, 503, 200]
+    requests_received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_received.append(self.path)
+            status_code = status_codes.pop(0)
+            body = json.dumps(PROJECT).encode('utf-8') if status_code == 200 else b''
+            self.send_response(status_code)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(pypi, 'PYPI_URL', f'http://127.0.0.1:{server.server_address[1]}')
+    monkeypatch.setattr(pypi, 'PYPI_MAX_RETRIES', 3)
+    try:
+        client = PyPIClient(cache_dir=str(tmpdir))
+        # the rate limit is retried, the server errors exceed the retries
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.get_project('gtts')
+        assert len(requests_received) == 4
+        # the error is not remembered
+        assert client.get_project('gtts') == PROJECT
+        assert len(requests_received) == 6
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_unavailable_pypi_is_treated_as_not_found(monkeypatch, tmpdir):
+    def get(url, headers, timeout):
+        response = requests.Response()
+        response.status_code = 503
+        response.url = url
+        return response
+
+    monkeypatch.setattr(pypi, 'PYPI_MAX_RETRIES', 1)
+    monkeypatch.setattr(pypi.time, 'sleep', lambda seconds: None)
+    client = PyPIClient(cache_dir=str(tmpdir))
+    monkeypatch.setattr(client.session, 'get', get)
+    client.prefetch(['gtts', 'numpy'])
+    assert client.is_package_on_pypi('gtts') is False
+    assert client.get_release_index('gtts') is None
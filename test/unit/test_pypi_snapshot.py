@@ -0,0 +1,30 @@
+from dev_gpt.apis.pypi_snapshot import write_snapshot, PyPISnapshot
+
+
+def test_snapshot_answers_lookups_without_network(tmpdir):
+    snapshot_path = str(tmpdir.join('pypi.snapshot'))
+    projects = {
+        f'package_{i}': {
+            'urls': [{'filename': f'package_{i}-1.0.tar.gz'}],
+            'releases': {
+                '0.9': [{'upload_time': '2020-05-01T00:00:00', 'yanked': True}],
+                '1.0': [{'upload_time': '2021-05-01T00:00:00', 'yanked': False}],
+                '2.0': [{'upload_time': '2022-05-01T00:00:00'}],
+                '3.0': [],
+            },
+        }
+        for i in range(100)
+    }
+    projects['no-files'] = {'urls': [], 'releases': {'0.1': []}}
+    write_snapshot(snapshot_path, projects)
+
+    snapshot = PyPISnapshot(snapshot_path)
+    assert snapshot.num_packages == 101
+    assert snapshot.is_package_on_pypi('Package-42') is True
+    assert snapshot.is_package_on_pypi('package_42', '1.0.0') is True
+    assert snapshot.is_package_on_pypi('package_42', '3.0') is False
+    assert snapshot.is_package_on_pypi('no-files') is False
+    assert snapshot.is_package_on_pypi('not-in-snapshot') is False
+    assert snapshot.get_release_index('not-in-snapshot') is None
+    assert snapshot.get_release_index('package_7').get_latest_version('2021-10-01') == '1.0'
+    assert snapshot.get_releases('package_7')[0] == ('0.9', '2020-05-01T00:00:00', True, True)
@@ -0,0 +1,72 @@
+import json
+
+import requests
+
+from dev_gpt.apis import rate_limiter as rate_limiter_module
+from dev_gpt.apis.rate_limiter import RateLimiter, parse_duration, get_retry_after_seconds, \
+    update_rate_limits_from_response
+
+
+class _ErrorWithHeaders(Exception):
+    def __init__(self, headers):
+        super().__init__()
+        self.headers = headers
+
+
+def test_parse_duration():
+    assert parse_duration('20ms') == 0.02
+    assert parse_duration('1s') == 1
+    assert parse_duration('6m0s') == 360
+    assert parse_duration('1.5') == 1.5
+    assert parse_duration(None) is None
+
+
+def test_retry_after_hint():
+    assert get_retry_after_seconds({'Retry-After': '3'}) == 3
+    assert get_retry_after_seconds({'retry-after-ms': '250'}) == 0.25
+    assert get_retry_after_seconds({
+        'x-ratelimit-remaining-tokens': '0',
+        'x-ratelimit-reset-tokens': '1m30s',
+        'x-ratelimit-remaining-requests': '10',
+        'x-ratelimit-reset-requests': '5s',
+    }) == 90
+    assert get_retry_after_seconds({}) is None
+
+
+def test_backoff_without_hint_grows_exponentially():
+    rate_limiter = RateLimiter(100, 10_000)
+    for attempt in range(4):
+        backoff = rate_limiter.get_backoff_seconds(attempt, Exception())
+        assert 2 ** attempt / 2 <= backoff <= 2 ** attempt
+
+
+def test_backoff_uses_retry_after():
+    rate_limiter = RateLimiter(100, 10_000)
+    assert rate_limiter.get_backoff_seconds(0, _ErrorWithHeaders({'Retry-After': '0.2'})) == 0.2
+    assert rate_limiter._reserve(1) > 0  # all requests wait until the hint expired
+
+
+def test_limits_are_learned_from_headers():
+    rate_limiter = RateLimiter(100, 10_000)
+    assert rate_limiter._reserve(5_000) == 0
+    rate_limiter.update_from_headers({'x-ratelimit-limit-tokens': '6000', 'x-ratelimit-remaining-tokens': '1000'})
+    wait_seconds = rate_limiter._reserve(4_000)
+    assert 29 < wait_seconds <= 30  # 3000 missing tokens at 100 tokens per second
+
+
+def test_limits_are_learned_from_successful_responses(monkeypatch):
+    monkeypatch.setattr(rate_limiter_module, '_rate_limiters', {})
+    request = requests.Request(
+        'POST', 'https://api.openai.com/v1/chat/completions', data=json.dumps({'model': 'gpt-4', 'messages': []})
+    ).prepare()
+    response = requests.Response()
+    response.status_code = 200
+    response.request = request
+    response.headers['x-ratelimit-limit-requests'] = '20'
+    response.headers['x-ratelimit-remaining-requests'] = '0'
+    update_rate_limits_from_response(response)
+    assert 2.9 < rate_limiter_module.get_rate_limiter('gpt-4')._reserve(1) <= 3  # 1 request per 3 seconds
+
+    # responses of requests without a model, e.g. the download of a file, are ignored
+    response.request = requests.Request('GET', 'https://api.openai.com/v1/models').prepare()
+    update_rate_limits_from_response(response)
@@ -1,3 +1,8 @@
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from dev_gpt.options.generate.static_files.microservice import google_custom_search
 from dev_gpt.options.generate.static_files.microservice.google_custom_search import search_web, search_images
 
 
@@ -11,3 +16,49 @@ def test_image_search():
     results = search_images("jina", 10)
     assert len(results) >= 1
     assert results[0].startswith("http")
+
+
+def test_image_links_are_checked_concurrently(monkeypatch):
+    class Handler(BaseHTTPRequestHandler):
+        def do_HEAD(self):
+            time.sleep(0.5)
+            self.send_response(404 if self.path.startswith('/missing') else 200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}'
+    links = [f'{url}/missing/0.png'] + [f'{url}/image/{i}.png' for i in range(9)]
+    monkeypatch.setattr(google_custom_search, 'google_search', lambda *args, **kwargs: {'items': [{'link': link} for link in links]})
+    try:
+        start = time.perf_counter()
+        assert search_images('jina', 3) == links[1:4]
+        assert time.perf_counter() - start < 2
+    finally:
+        server.shutdown()
+
+
+def test_search_results_are_cached(monkeypatch):
+    calls = []
+
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {'items': [{'snippet': 'Jina AI'}]}
+
+    def get(url, params, timeout):
+        calls.append(params['q'])
+        return Response()
+
+    monkeypatch.setenv('GOOGLE_API_KEY', 'key')
+    monkeypatch.setenv('GOOGLE_CSE_ID', 'cse')
+    monkeypatch.setattr(google_custom_search, '_cache', {})
+    monkeypatch.setattr(google_custom_search._session, 'get', get)
+    assert search_web('cached query', 1) == ['Jina AI']
+    assert search_web('cached query', 1) == ['Jina AI']
+    assert calls == ['cached query']
@@ -0,0 +1,18 @@
+from dev_gpt.options.generate.similarity import SimilarityIndex, normalize_text
+
+
+def test_normalize_text():
+    assert normalize_text('Error in /app/microservice.py line 23 at 0x7f3a') \
+        == normalize_text('Error in /workdir/microservice.py line 5 at 0x1b2c')
+
+
+def test_similarity_index():
+    previous_errors = [
+        'AssertionError in test_microservice.py line 23: expected the output to contain the key "summary"',
+        'ModuleNotFoundError: No module named cv2 in /app/microservice.py line 4',
+    ]
+    index = SimilarityIndex(previous_errors, similar_threshold=0.75, different_threshold=0.35)
+    assert index.is_similar('ModuleNotFoundError: No module named cv2 in /workdir/microservice.py line 5') is True
+    assert index.is_similar('KeyError: image in microservice.py line 10 when accessing the input json') is False
+    assert index.is_similar('ModuleNotFoundError: No module named PIL in /app/microservice.py line 4') is None
+    assert SimilarityIndex([], 0.75, 0.35).is_similar('any error') is False
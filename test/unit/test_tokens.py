@@ -0,0 +1,26 @@
+from langchain.schema import SystemMessage, HumanMessage
+
+from dev_gpt.apis.gpt import GPTSession, BudgetExceededException
+from dev_gpt.apis.tokens import count_tokens, count_message_tokens
+
+
+def test_count_message_tokens_includes_message_overhead():
+    messages = [SystemMessage(content='You are a helpful assistant.'), HumanMessage(content='Say hello.')]
+    content_tokens = sum(count_tokens(message.content, 'gpt-4') for message in messages)
+    role_tokens = count_tokens('system', 'gpt-4') + count_tokens('user', 'gpt-4')
+    # 3 tokens per message and 3 tokens to prime the reply
+    assert count_message_tokens(messages, 'gpt-4') == content_tokens + role_tokens + 2 * 3 + 3
+    assert count_tokens('', 'gpt-4') == 0
+
+
+def test_budget_callback(init_gpt):
+    session = GPTSession._instance
+    session.max_tokens_budget = session.prompt_tokens_so_far + session.completion_tokens_so_far + 100
+    session.budget_callback(100)
+    try:
+        session.budget_callback(101)
+        assert False, 'budget should be exceeded'
+    except BudgetExceededException:
+        pass
+    finally:
+        session.max_tokens_budget = None
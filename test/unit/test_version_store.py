@@ -0,0 +1,54 @@
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+
+from dev_gpt.options import get_latest_version_path, get_executor_name
+from dev_gpt.utils.io import persist_file
+from dev_gpt.utils.version_store import VersionStore
+
+
+def test_versions_share_unchanged_files(tmpdir):
+    root_path = str(tmpdir)
+    store = VersionStore(root_path)
+    v1 = os.path.join(root_path, 'MyExecutor', '0_numpy', 'v1')
+    v2 = os.path.join(root_path, 'MyExecutor', '0_numpy', 'v2')
+    os.makedirs(v1)
+    persist_file('def func(x): return x', os.path.join(v1, 'microservice.py'))
+    persist_file('numpy', os.path.join(v1, 'requirements.txt'))
+
+    store.create_version(v1, v2)
+    persist_file('numpy~=1.21.0', os.path.join(v2, 'requirements.txt'))
+
+    assert os.path.samefile(os.path.join(v1, 'microservice.py'), os.path.join(v2, 'microservice.py'))
+    # the shared files can not be written in place
+    assert not os.stat(os.path.join(v2, 'microservice.py')).st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+    with open(os.path.join(v1, 'requirements.txt')) as f:
+        assert f.read() == 'numpy'
+    with open(os.path.join(v2, 'requirements.txt')) as f:
+        assert f.read() == 'numpy~=1.21.0'
+
+    os.makedirs(os.path.join(v2, 'gateway'))
+    persist_file('import streamlit', os.path.join(v2, 'gateway', 'app.py'))
+    store.set_latest_version(v2)
+    # the final version can be edited without changing the other versions
+    assert not os.path.samefile(os.path.join(v1, 'microservice.py'), os.path.join(v2, 'microservice.py'))
+    with open(os.path.join(v2, 'microservice.py'), 'a') as f:
+        f.write('\n# edited')
+    with open(os.path.join(v1, 'microservice.py')) as f:
+        assert f.read() == 'def func(x): return x'
+    # the directory names would point to another version
+    os.makedirs(os.path.join(root_path, 'MyExecutor', '1_pandas', 'v10'))
+    assert get_latest_version_path(root_path) == v2
+    assert get_executor_name(root_path) == 'MyExecutor'
+
+    # the executor of a parallel approach is pushed under the name in its config.yml
+    persist_file('jtype: MyExecutorApproach0\npy_modules:\n  - microservice.py\n', os.path.join(v2, 'config.yml'))
+    assert get_executor_name(root_path) == 'MyExecutorApproach0'
+
+
+def test_parallel_writes_of_the_same_file(tmpdir):
+    file_path = os.path.join(str(tmpdir), 'microservice.py')
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda i: persist_file(f'# version {i}', file_path), range(64)))
+    assert os.listdir(str(tmpdir)) == ['microservice.py']
+    assert os.stat(file_path).st_mode & stat.S_IWUSR